@@ -2,10 +2,17 @@ import streamlit as st
 from pathlib import Path
 import pandas as pd
 import shutil
+import time
 
-from pipeline_search import run_search_pipeline
-from pipeline_validation import run_full_validation_pipeline
+from pipeline_search import (
+    search, search_page, count_matches, fuzzy_search, errors_by_document,
+    VALID_COLUMNS, FTS_COLUMNS, FUZZY_COLUMNS
+)
 from pipeline_images import run_image_pipeline
+from handoff import INTERMEDIATE_DIR, VALIDATION_FILE, handoff_path, read_frame
+from doc_catalog import clear_catalog
+from layout_cache import clear_layout_cache
+import jobs
 
 
 st.set_page_config(
@@ -24,6 +31,9 @@ PDF_INPUT_DIR.mkdir(exist_ok=True)
 PIPELINE_DIR = BASE_DIR / "images_pipeline"
 PIPELINE_DIR.mkdir(exist_ok=True)
 
+# seconds between refreshes of a running job's progress
+POLL_SECONDS = 1.0
+
 
 # ==========================================================
 # CLEAR WORKSPACE
@@ -60,24 +70,30 @@ def clear_selected_outputs():
         BASE_DIR / "images_stamp",
         BASE_DIR / "debug_crops",
         BASE_DIR / "revision_extraction",
-        BASE_DIR / "rev_crops"
+        BASE_DIR / "rev_crops",
+        BASE_DIR / "render_cache",
+        INTERMEDIATE_DIR
     ]
 
     for folder in debug_folders:
         if folder.exists():
             shutil.rmtree(folder, ignore_errors=True)
 
-    # 5. Delete SQLite database
-    from sqlalchemy import create_engine, text
+    # 5. Forget cached extractions (next run extracts every drawing again)
+    clear_catalog(BASE_DIR / "doc_catalog.db")
+    clear_layout_cache()
 
-    db_file = BASE_DIR / "metadata.db"
+    # 6. Delete SQLite database
+    from sqlalchemy import text
+    from db import DB_PATH, get_engine
 
-    if db_file.exists():
+    if DB_PATH.exists():
         try:
-            engine = create_engine(f"sqlite:///{db_file}")
-            with engine.connect() as conn:
+            with get_engine().begin() as conn:
                 conn.execute(text("DROP TABLE IF EXISTS validation_file"))
-            engine.dispose()
+                conn.execute(text("DROP TABLE IF EXISTS validation_errors"))
+                conn.execute(text("DROP TABLE IF EXISTS validation_fts"))
+                conn.execute(text("DROP TABLE IF EXISTS validation_fuzzy"))
         except Exception as e:
             print("Failed to clear SQLite table:", e)
 
@@ -112,38 +128,28 @@ if uploaded_pdfs:
     save_uploaded_pdfs(uploaded_pdfs)
     st.sidebar.success(f"{len(uploaded_pdfs)} PDFs loaded")
 
-if st.sidebar.button("Clear Workspace"):
+# a queued / running job reads pdf_input and writes the tables being cleared
+jobs.recover_stale()
+job_active = jobs.active_job() is not None
+
+if st.sidebar.button(
+    "Clear Workspace",
+    disabled=job_active,
+    help="Not available while a validation job is running" if job_active else None
+):
     clear_selected_outputs()
     st.session_state.pop("validation_df", None)
     st.session_state.pop("validation_file", None)
 
+    for key in ("search_filters", "search_fuzzy", "search_total", "search_cursors", "search_page"):
+        st.session_state.pop(key, None)
+
     # 🔥 Reset uploader widget
     st.session_state["uploader_key"] += 1
 
     st.sidebar.success("Workspace Cleared")
     st.rerun()
 
-
-VALID_COLUMNS = [
-    "Image",
-    "LEVERANTOR_1","LEVERANTOR_2",
-    "SKAPAD_AV","GRANSKAD_AV","GODKAND_AV",
-    "DATUM",
-    "AVDELNING","UPPDRAGSNUMMER","LEVERANS_ANDRINGS_PM",
-    "KONSTRUKTIONSNUMMER",
-    "TITLE",
-    "BESKRIVNING_ROW_1","BESKRIVNING_ROW_2",
-    "BESKRIVNING_ROW_3","BESKRIVNING_ROW_4",
-    "SKALA","FORMAT",
-    "RITNINGSNUMMER_FORVALTNING","RITNINGSNUMMER_PROJEKT",
-    "TEKNIKOMRADE",
-    "GRANSKNINGSSTATUS_SYFTE","HANDLINGSTYP","ANLAGGNINGSTYP",
-    "KILOMETER_METER",
-    "BANDEL","BLAD","NASTA_BLAD",
-    "ANDR",
-    "FINAL_REV"
-]
-
 action = st.sidebar.radio(
     "Choose operation",
     [
@@ -160,25 +166,53 @@ if action == "Validate Drawings":
 
     st.subheader("Drawing Validation")
 
-    if st.button("Run Full Validation Pipeline"):
+    resume_run = st.checkbox(
+        "Resume previous run",
+        help="Continue an interrupted run; documents that were already extracted are reused"
+    )
 
-        with st.spinner("Running validation pipeline..."):
-            try:
-                result_file = run_full_validation_pipeline(
-                    PROJECT_DIR=BASE_DIR,
-                    auto_clean=False
-                )
+    # the pipeline runs as a background job (jobs.py); this page only polls it
+    jobs.recover_stale()
+    active = jobs.active_job()
 
-                st.success("Validation Complete")
+    if st.button("Run Full Validation Pipeline", disabled=active is not None):
+        st.session_state["job_id"] = jobs.submit_validation(BASE_DIR, auto_clean=False, resume=resume_run)
+        st.rerun()
 
-                df_result = pd.read_excel(result_file, dtype=str, keep_default_na=False)
-                df_result = df_result[[c for c in VALID_COLUMNS if c in df_result.columns]]
+    # after a refresh the session is new: show the latest job instead
+    job = jobs.get_job(st.session_state["job_id"]) if "job_id" in st.session_state else jobs.latest_job()
 
-                st.session_state["validation_df"] = df_result
-                st.session_state["validation_file"] = result_file
+    if job is not None:
 
-            except Exception as e:
-                st.error(f"Pipeline Error: {str(e)}")
+        stages = jobs.job_stages(job["id"])
+
+        if job["status"] in jobs.ACTIVE:
+
+            current = next((s for s in stages if s["status"] == jobs.RUNNING), None)
+            label = f"Job {job['id']}: {job['status']}"
+            if current:
+                label += f" – {current['stage']} ({current['done']}/{current['total']})"
+
+            st.progress(jobs.job_fraction(stages), text=label)
+            st.dataframe(pd.DataFrame(stages), use_container_width=True, hide_index=True)
+
+            time.sleep(POLL_SECONDS)
+            st.rerun()
+
+        elif job["status"] == jobs.FAILED:
+            st.error(f"Pipeline Error (job {job['id']}): {job['error']}")
+
+        elif st.session_state.get("validation_job") != job["id"] and handoff_path(VALIDATION_FILE).exists():
+
+            # pick up the finished job's results once (unless cleared since)
+            st.success("Validation Complete")
+
+            df_result = read_frame(handoff_path(VALIDATION_FILE))
+            df_result = df_result[[c for c in VALID_COLUMNS if c in df_result.columns]]
+
+            st.session_state["validation_df"] = df_result
+            st.session_state["validation_file"] = job["result"]
+            st.session_state["validation_job"] = job["id"]
     # ✅ SHOW RESULT ALWAYS
     if "validation_df" in st.session_state:
 
@@ -247,25 +281,100 @@ elif action == "Search Metadata":
 
     st.subheader("Metadata Search")
 
-    df_check = run_search_pipeline("1=1", top_n=5)
+    df_check = search(top_n=5)
 
     if df_check.empty:
         st.warning("No validated metadata found")
         st.stop()
 
+    PAGE_SIZE = 50
+
+    SEARCH_MODES = {
+        "equals": "=",
+        "starts with": "starts_with",
+        "contains": "contains",
+        "words (text search)": "match",
+        "similar (OCR-tolerant)": "fuzzy",
+    }
+
     column = st.selectbox("Choose column", VALID_COLUMNS)
+
+    modes = [
+        m for m, op in SEARCH_MODES.items()
+        if (op != "match" or column in FTS_COLUMNS) and (op != "fuzzy" or column in FUZZY_COLUMNS)
+    ]
+    mode = st.selectbox("Match", modes)
+
     value  = st.text_input("Enter value")
+    only_errors = st.checkbox("Only drawings where this column failed validation")
 
     if st.button("Search"):
 
-        safe_value = value.replace("'", "''")
-        where_clause = f"{column} = '{safe_value}'"
+        filters = []
+        fuzzy = None
+
+        if SEARCH_MODES[mode] == "fuzzy":
+            # ranked by similarity instead of paged
+            fuzzy = (column, value)
+        elif value or not only_errors:
+            filters.append((column, SEARCH_MODES[mode], value))
+
+        if only_errors:
+            filters.append((column, "has_error", None))
 
-        df = run_search_pipeline(where_clause, top_n=200)
+        try:
+            total = count_matches(filters) if fuzzy is None else None
+        except ValueError as e:
+            st.warning(str(e))
+            st.stop()
+
+        # only the query and the page cursors are kept, not the rows;
+        # search_cursors[i] is the `after` cursor of page i
+        st.session_state["search_filters"] = filters
+        st.session_state["search_fuzzy"] = fuzzy
+        st.session_state["search_total"] = total
+        st.session_state["search_cursors"] = [None]
+        st.session_state["search_page"] = 0
+
+    if "search_filters" in st.session_state:
+
+        page = st.session_state["search_page"]
+        cursors = st.session_state["search_cursors"]
+        total = st.session_state["search_total"]
+        fuzzy = st.session_state.get("search_fuzzy")
+
+        if fuzzy:
+            try:
+                df = fuzzy_search(*fuzzy, filters=st.session_state["search_filters"], top_n=PAGE_SIZE)
+            except ValueError as e:
+                st.warning(str(e))
+                st.stop()
+            next_cursor = None
+        else:
+            df, next_cursor = search_page(st.session_state["search_filters"], after=cursors[page], page_size=PAGE_SIZE)
 
         if df.empty:
             st.warning("No matching drawings")
         else:
-            df = df[[c for c in VALID_COLUMNS if c in df.columns]]
-            st.success(f"Found {len(df)} drawings")
+            # which fields failed, per drawing
+            errs = errors_by_document(df["Image"])
+            df["VALIDATION_ERRORS"] = df["Image"].map(dict(zip(errs["document"], errs["errors"]))).fillna("")
+
+            if fuzzy:
+                st.success(f"{len(df)} most similar drawings")
+                st.dataframe(df, use_container_width=True)
+                st.stop()
+
+            first = page * PAGE_SIZE + 1
+            st.success(f"Found {total} drawings, showing {first}–{first + len(df) - 1}")
             st.dataframe(df, use_container_width=True)
+
+            def go_to(new_page, cursor=None):
+                if new_page == len(st.session_state["search_cursors"]):
+                    st.session_state["search_cursors"].append(cursor)
+                st.session_state["search_page"] = new_page
+
+            prev_col, next_col = st.columns(2)
+
+            prev_col.button("Previous", disabled=page == 0, on_click=go_to, args=(page - 1,))
+            next_col.button("Next", disabled=next_cursor is None, on_click=go_to, args=(page + 1, next_cursor))
@@ -0,0 +1,129 @@
+# STEP 3 CLEANING BENCHMARK
+#
+# Runs the column-wise engine and the old row-wise loop on the same
+# synthetic raw_extraction table, checks that both give identical output
+# and prints the timings.
+#
+#   python -m benchmarks.cleaning --rows 10000
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from step3_cleaning import clean_frame, clean_frame_rowwise, CLEANER_CACHE
+
+
+# ==========================================================
+# SYNTHETIC RAW EXTRACTION (OCR-STYLE NOISE, REPEATED VALUES)
+# ==========================================================
+SAMPLES = {
+    "LEVERANTOR_1": ["LEVERANTÖR TYRÉNS", "EVERANTOR SWECO CIVIL AB", "AF INFRASTRUCTURE AB", "NCO", "", "Norconsult"],
+    "LEVERANTOR_2": ["- TYRENS", "1 BERGAB", "TRAFIKVERKET", "", "amberg"],
+    "SKAPAD_AV": ["J ANDERSSON", "IKLARSSON, TYRÉNS JEB", "M.SVENSSON / P.NILSSON", "TYRÉNSI PHN", ""],
+    "GRANSKAD_AV": ["A BERG", "KLUNDGREN", "- E.HOLM", ""],
+    "GODKAND_AV": ["L.ERIKSSON", "B KARLSSON", "TYRENS / MBM", ""],
+    "TITLE": ["VASTLANKEN\nSTATION CENTRALEN", "VÄSTLANKEN  PLAN", "- SEKTION A-A", ""],
+    "ANDR": ["A.1", "41", "4", "_1", "B", "", "2"],
+    "TEKNIKOMRADE": ["BRO", "GEO TEKNIK", "el-1", ""],
+    "GRANSKNINGSSTATUS_SYFTE": ["GODKAND", "FÖR GRANSKNING", "FORFRAGNINGS UNDERLAG", "ANNAT"],
+    "HANDLINGSTYP": ["ritning", "PM ", "Beskrivning"],
+    "ANLAGGNINGSTYP": ["tunnel", "BRO", ""],
+    "LEVERANS_ANDRINGS_PM": ["PM 2021-03", "ABC", "LEVERANS 12", ""],
+    "KILOMETER_METER": ["~ 123+456", "1123 4 567", "12/345,5 - 12/400", "KM ?", ""],
+    "SKALA": ["1:100", "1:1001500", "11001500", "1-50, 1.200", "1500", ""],
+    "FORMAT": ["AI", "A L", "41", "A3", "A 1"],
+    "BESKRIVNING_ROW_1": ["PLAN, SEKTION", "DETALJ #2", ""],
+    "BESKRIVNING_ROW_2": ["KM 12+300 - 12+400", "", "ÖVERSIKT (DEL 1)"],
+    "BESKRIVNING_ROW_3": ["", "ARMERING; TYP B"],
+    "BESKRIVNING_ROW_4": ["BLAD 1/3", "SEKTION A/B", ""],
+    "DATUM": ["2021-03-04", " 2022-11-30 ", ""],
+    "BANDEL": ["611", "611 ", ""],
+}
+
+
+def make_frame(n_rows, seed=0):
+
+    rng = random.Random(seed)
+    rows = []
+
+    for i in range(n_rows):
+
+        doc = f"BBP05-{i % 90:02d}-{i % 700:03d}-{1000 + i % 400:04d}-0_0-{i % 3000:04d}"
+        row = {"Image": f"{doc}_stamp.png"}
+
+        # mostly the right drawing number, sometimes a one-character OCR slip
+        rnp = doc if rng.random() < 0.8 else doc.replace("0", "O", 1)
+        row["RITNINGSNUMMER_PROJEKT"] = rng.choice([rnp, f"I{rnp}", rnp.replace("-", " - ")])
+
+        row["BLAD"] = rng.choice([f"{i % 120:03d}", "O12", "1 2", "l05", "", "7"])
+
+        for col, values in SAMPLES.items():
+            row[col] = rng.choice(values)
+
+        rows.append(row)
+
+    return pd.DataFrame(rows).astype(str)
+
+
+# ==========================================================
+# MAIN
+# ==========================================================
+def run(n_rows, out_json=None):
+
+    df = make_frame(n_rows)
+
+    t0 = time.perf_counter()
+    rowwise = clean_frame_rowwise(df)
+    t_rowwise = time.perf_counter() - t0
+
+    CLEANER_CACHE.clear()
+
+    t0 = time.perf_counter()
+    columnwise = clean_frame(df)
+    t_columnwise = time.perf_counter() - t0
+
+    # second pass: the memo already holds every (column, value)
+    t0 = time.perf_counter()
+    clean_frame(df)
+    t_warm = time.perf_counter() - t0
+
+    identical = rowwise.astype(object).equals(columnwise.astype(object))
+
+    result = {
+        "rows": n_rows,
+        "rowwise_seconds": t_rowwise,
+        "columnwise_seconds": t_columnwise,
+        "speedup": t_rowwise / t_columnwise,
+        "columnwise_warm_seconds": t_warm,
+        "cache": CLEANER_CACHE.stats(),
+        "identical": identical,
+    }
+
+    print(f"\n{n_rows} rows")
+    print(f"row-wise    : {t_rowwise:8.3f} s")
+    print(f"column-wise : {t_columnwise:8.3f} s  ({result['speedup']:.1f}x)")
+    print(f"warm memo   : {t_warm:8.3f} s")
+    print(f"memo        : hit rate {result['cache']['hit_rate']:.1%}, {result['cache']['size']} entries")
+    print(f"identical   : {identical}")
+
+    if out_json:
+        Path(out_json).write_text(json.dumps(result, indent=2))
+
+    if not identical:
+        raise SystemExit("Column-wise output differs from the row-wise reference")
+
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Step 3 cleaning benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    run(args.rows, args.json)
@@ -0,0 +1,98 @@
+# HAND-OFF FORMAT BENCHMARK
+#
+# Time to write + read one intermediate table as Excel (the old hand-off)
+# vs Parquet (handoff.py), on a synthetic frame shaped like raw_extraction.
+#
+#   python -m benchmarks.handoff --rows 100 1000 10000
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from handoff import write_frame, read_frame
+
+COLUMNS = 32
+
+
+# ==========================================================
+# SYNTHETIC TABLE
+# ==========================================================
+def make_frame(n_rows):
+
+    data = {"Image": [f"DOC-{i:05d}-{i % 120:03d}_stamp.png" for i in range(n_rows)]}
+
+    for c in range(COLUMNS - 1):
+        data[f"COL_{c:02d}"] = [f"VALUE {c} {i % 97}" for i in range(n_rows)]
+
+    return pd.DataFrame(data)
+
+
+# ==========================================================
+# TIMERS
+# ==========================================================
+def time_excel(df, path):
+
+    t0 = time.perf_counter()
+    df.to_excel(path, index=False)
+    pd.read_excel(path, dtype=str, keep_default_na=False)
+
+    return time.perf_counter() - t0
+
+def time_parquet(df, path):
+
+    t0 = time.perf_counter()
+    write_frame(df, path)
+    read_frame(path)
+
+    return time.perf_counter() - t0
+
+
+# ==========================================================
+# MAIN
+# ==========================================================
+def run(sizes, out_json=None):
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        tmp = Path(tmp)
+
+        for n in sizes:
+
+            df = make_frame(n)
+
+            xlsx = time_excel(df, tmp / "hop.xlsx")
+            pq   = time_parquet(df, tmp / "hop.parquet")
+
+            results.append({
+                "rows": n,
+                "excel_seconds": xlsx,
+                "parquet_seconds": pq,
+                "excel_bytes": (tmp / "hop.xlsx").stat().st_size,
+                "parquet_bytes": (tmp / "hop.parquet").stat().st_size,
+            })
+
+    print(f"\n{'rows':>8}{'xlsx s':>10}{'parquet s':>12}{'speedup':>9}")
+    for r in results:
+        print(f"{r['rows']:>8}{r['excel_seconds']:>10.3f}{r['parquet_seconds']:>12.3f}"
+              f"{r['excel_seconds'] / r['parquet_seconds']:>9.1f}")
+
+    if out_json:
+        Path(out_json).write_text(json.dumps(results, indent=2))
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Excel vs Parquet hand-off benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    run(args.rows, args.json)
@@ -0,0 +1,131 @@
+# STEP 2 OCR EQUIVALENCE BENCHMARK (CPU)
+#
+# Runs per-crop readtext() and the padded readtext_batched() path on the
+# same YOLO crops, assembles the rows both ways, prints the timings and
+# every field where the two rows differ.
+#
+#   python -m benchmarks.ocr_batch --images images_stamp --limit 50
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import step2_extract
+from step2_extract import (
+    get_model, get_reader, load_stamp, detect_batch, collect_crops, ocr_rows,
+    make_batches, list_images, YOLO_BATCH_SIZE
+)
+
+
+# ==========================================================
+# CROPS (SAME JOBS FOR BOTH PATHS)
+# ==========================================================
+def load_jobs(img_paths):
+
+    LABELS = list(get_model().names.values())
+    per_stamp = []
+
+    for batch in make_batches(img_paths, YOLO_BATCH_SIZE):
+
+        loaded = [load_stamp(p) for p in batch]
+        all_boxes = detect_batch([bgr for bgr, _ in loaded], verbose=False)
+
+        for img_path, (_, pil_img), boxes in zip(batch, loaded, all_boxes):
+            per_stamp.append(collect_crops(img_path, pil_img, boxes, LABELS))
+
+    return LABELS, per_stamp
+
+
+# ==========================================================
+# COMPARISON
+# ==========================================================
+def field_diffs(reference, candidate):
+
+    # [(image, label, reference text, candidate text)] for every differing field
+    diffs = []
+
+    for ref, cand in zip(reference, candidate):
+        for label, value in ref.items():
+            if cand.get(label, "") != value:
+                diffs.append((ref["Image"], label, value, cand.get(label, "")))
+
+    return diffs
+
+
+# ==========================================================
+# MAIN
+# ==========================================================
+def run(image_dir, limit=None, out_json=None):
+
+    img_paths = sorted(list_images(Path(image_dir)))[:limit]
+
+    if not img_paths:
+        raise SystemExit(f"No images in {image_dir}")
+
+    # crops only, no debug PNGs
+    step2_extract.SAVE_DEBUG_CROPS = False
+
+    LABELS, per_stamp = load_jobs(img_paths)
+    n_crops = sum(len(jobs) for jobs in per_stamp)
+
+    # warm-up (reader load + first inference)
+    get_reader()
+    ocr_rows(img_paths[:1], per_stamp[:1], LABELS, batched=False)
+
+    t0 = time.perf_counter()
+    single = ocr_rows(img_paths, per_stamp, LABELS, batched=False)
+    single_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batched = ocr_rows(img_paths, per_stamp, LABELS, batched=True)
+    batched_s = time.perf_counter() - t0
+
+    diffs = field_diffs(single, batched)
+    n_fields = len(single) * len(LABELS)
+
+    by_label = {}
+    for _, label, _, _ in diffs:
+        by_label[label] = by_label.get(label, 0) + 1
+
+    print(f"\n{len(img_paths)} stamps, {n_crops} crops, bucket={step2_extract.OCR_SIZE_BUCKET}px")
+    print(f"{'mode':<10}{'seconds':>10}{'crops/s':>10}")
+    print(f"{'per_crop':<10}{single_s:>10.2f}{n_crops / single_s:>10.2f}")
+    print(f"{'batched':<10}{batched_s:>10.2f}{n_crops / batched_s:>10.2f}")
+    print(f"\nfields differing: {len(diffs)} / {n_fields}")
+
+    for label, count in sorted(by_label.items(), key=lambda kv: -kv[1]):
+        print(f"  {label:<28}{count:>5}")
+
+    for image, label, ref, cand in diffs[:20]:
+        print(f"  {image} {label}: {ref!r} → {cand!r}")
+
+    result = {
+        "stamps": len(img_paths),
+        "crops": n_crops,
+        "per_crop_seconds": single_s,
+        "batched_seconds": batched_s,
+        "fields": n_fields,
+        "fields_differing": len(diffs),
+        "differing_by_label": by_label,
+        "diffs": [
+            {"image": image, "label": label, "per_crop": ref, "batched": cand}
+            for image, label, ref, cand in diffs
+        ],
+    }
+
+    if out_json:
+        Path(out_json).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Per-crop vs batched EasyOCR equivalence benchmark")
+    parser.add_argument("--images", default=str(step2_extract.image_dir))
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    run(args.images, args.limit, args.json)
@@ -0,0 +1,201 @@
+# END-TO-END PIPELINE BENCHMARK (OFFLINE, SYNTHETIC PDFS)
+#
+# For each batch size: generates that many synthetic drawings
+# (benchmarks/synthetic_pdfs.py) in a throw-away project folder, runs
+# run_full_validation_pipeline() on them with metrics on and turns the
+# recorded spans (metrics.py) into throughput and latency per step.
+#
+#   python -m benchmarks.run_pipeline --docs 10 100 1000 --json bench.json
+#
+# Latency is per document: render and revision OCR are timed per drawing,
+# detection and label OCR per batch (split evenly over its stamps), and the
+# whole-table steps (clean, compare, validate, sql) are their time / docs.
+# The JSON carries the git commit, so results of two commits can be diffed.
+
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+import metrics
+from benchmarks.synthetic_pdfs import make_batch
+from db import get_engine, dispose_engines
+from render_cache import CACHE_DIR, file_sha256
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# report step → the spans it is made of
+STEPS = {
+    "render":       ["render_stamp", "render_rev"],
+    "detect":       ["yolo"],
+    "ocr_labels":   ["ocr_total"],
+    "ocr_revision": ["rev_doc"],
+    "clean":        ["stage:step3"],
+    "compare":      ["stage:step6"],
+    "validate":     ["stage:step7"],
+    "sql":          ["stage:sql"],
+}
+
+
+# ==========================================================
+# SPANS → PER-STEP NUMBERS
+# ==========================================================
+def span_name(rec):
+    return f"stage:{rec.get('label')}" if rec["stage"] == "stage" else rec["stage"]
+
+def doc_key(name):
+    # "X.pdf", "X_stamp.png", "X_p001.png" → "X"
+    stem = Path(name).stem
+    return stem.rsplit("_", 1)[0] if stem.endswith(("_stamp", "_p001")) else stem
+
+def step_numbers(records, names, n_docs):
+
+    seconds = 0.0
+    per_doc = defaultdict(float)
+    shares = []
+
+    for rec in records:
+
+        if span_name(rec) not in names:
+            continue
+
+        seconds += rec["seconds"]
+
+        if rec.get("doc"):
+            per_doc[doc_key(rec["doc"])] += rec["seconds"]
+        elif rec.get("images"):
+            shares += [rec["seconds"] / rec["images"]] * rec["images"]
+        else:
+            shares += [rec["seconds"] / n_docs] * n_docs
+
+    samples = list(per_doc.values()) or shares
+
+    if not samples:
+        return None
+
+    ms = np.array(samples) * 1000
+
+    return {
+        "seconds": round(seconds, 3),
+        "docs_per_sec": round(n_docs / seconds, 2) if seconds else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+    }
+
+
+# ==========================================================
+# ONE BATCH
+# ==========================================================
+def run_batch(n_docs, clip_gray=False, workers=1, seed=0):
+
+    from pipeline_validation import run_full_validation_pipeline
+
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as tmp:
+
+        project = Path(tmp)
+
+        # a fresh tag per run: new file hashes, so nothing comes from the
+        # render cache or the document catalog of an earlier run
+        pdfs = make_batch(project / "pdf_input", n_docs, seed=seed, run_tag=uuid.uuid4().hex)
+
+        db_path = project / "metadata.db"
+        bind = get_engine(db_path)
+
+        try:
+            t0 = time.perf_counter()
+
+            metrics.start_run(project / "intermediate" / "metrics.jsonl")
+            run_full_validation_pipeline(
+                PROJECT_DIR=project,
+                clip_gray=clip_gray,
+                incremental=False,
+                workers=workers,
+                resume=False,
+                bind=bind,
+            )
+
+            wall = time.perf_counter() - t0
+            records = metrics.load_records().to_dict(orient="records")
+
+        finally:
+            dispose_engines()
+
+            # this run's renders are never hit again
+            for pdf in pdfs:
+                for npy in CACHE_DIR.glob(f"{file_sha256(pdf)}_*.npy"):
+                    npy.unlink()
+
+    steps = {}
+    for step, names in STEPS.items():
+        numbers = step_numbers(records, names, n_docs)
+        if numbers:
+            steps[step] = numbers
+
+    return {
+        "docs": n_docs,
+        "wall_seconds": round(wall, 3),
+        "docs_per_sec": round(n_docs / wall, 2),
+        # largest single span's RSS growth, and the highest process
+        # high-water mark (per process: workers are counted separately)
+        "max_rss_delta_mb": max((r.get("rss_delta_mb") or 0 for r in records), default=None),
+        "process_peak_rss_mb": max((r.get("process_peak_rss_mb") or 0 for r in records), default=None),
+        "steps": steps,
+    }
+
+
+# ==========================================================
+# MAIN
+# ==========================================================
+def git_commit():
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes, clip_gray=False, workers=1, seed=0, out_json=None):
+
+    batches = [run_batch(n, clip_gray=clip_gray, workers=workers, seed=seed) for n in sizes]
+
+    print(f"\nclip_gray={clip_gray} workers={workers}")
+    print(f"{'docs':>6}  {'step':<14}{'seconds':>10}{'docs/s':>9}{'p50 ms':>10}{'p95 ms':>10}")
+
+    for b in batches:
+        for step, s in b["steps"].items():
+            print(f"{b['docs']:>6}  {step:<14}{s['seconds']:>10.2f}{s['docs_per_sec'] or 0:>9.2f}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}")
+        print(f"{b['docs']:>6}  {'TOTAL (wall)':<14}{b['wall_seconds']:>10.2f}{b['docs_per_sec']:>9.2f}")
+
+    result = {
+        "commit": git_commit(),
+        "clip_gray": clip_gray,
+        "workers": workers,
+        "seed": seed,
+        "batches": batches,
+    }
+
+    if out_json:
+        Path(out_json).write_text(json.dumps(result, indent=2))
+
+    return result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic PDFs")
+    parser.add_argument("--docs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--clip-gray", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    run(args.docs, clip_gray=args.clip_gray, workers=args.workers, seed=args.seed, out_json=args.json)
@@ -0,0 +1,195 @@
+# METADATA SEARCH LATENCY BENCHMARK
+#
+# Loads N synthetic drawings into a throw-away SQLite file through the normal
+# load path (indexes + FTS5) and times typical Search-page queries.
+#
+#   python -m benchmarks.search --rows 100000
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from db import get_engine, read_engine, dispose_engines
+from pipeline_search import search, search_page, count_matches, fuzzy_search, VALID_COLUMNS
+from pipeline_sql import update_sql_table, update_errors_table
+
+WORDS = ["PLAN", "SEKTION", "DETALJ", "ARMERING", "VÄSTLÄNKEN", "STATION", "TUNNEL", "BRO", "ÖVERSIKT", "FASAD"]
+
+
+# ==========================================================
+# SYNTHETIC DATA
+# ==========================================================
+def make_frame(n_rows, seed=0):
+
+    rng = random.Random(seed)
+    rows = []
+
+    for i in range(n_rows):
+
+        doc = f"BBP05-{i % 90:02d}-{i % 700:03d}-{1000 + i % 400:04d}-0_0-{i:06d}"
+        row = {c: "" for c in VALID_COLUMNS}
+
+        row.update({
+            "Image": f"{doc}_stamp.png",
+            "RITNINGSNUMMER_PROJEKT": doc,
+            "LEVERANTOR_1": rng.choice(["TYRÉNS", "SWECO", "NCC", "NORCONSULT"]),
+            "SKAPAD_AV": rng.choice(["J.ANDERSSON", "K.LARSSON", "M.SVENSSON"]),
+            "TEKNIKOMRADE": rng.choice(["BRO", "GEO", "EL", "VA"]),
+            "FORMAT": rng.choice(["A1", "A3"]),
+            "BLAD": f"{i % 120:03d}",
+            "TITLE": " ".join(rng.sample(WORDS, 3)),
+            "BESKRIVNING_ROW_1": " ".join(rng.sample(WORDS, 2)),
+            "BESKRIVNING_ROW_2": f"KM {i % 50}+{i % 1000:03d}",
+        })
+
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+QUERIES = {
+    "equals (indexed)":        [("RITNINGSNUMMER_PROJEKT", "=", "BBP05-10-010-1010-0_0-000010")],
+    "starts_with (indexed)":   [("Image", "starts_with", "BBP05-42-")],
+    "equals, low selectivity": [("TEKNIKOMRADE", "=", "BRO")],
+    "FTS word":                [("TITLE", "match", "tunnel")],
+    "FTS prefix, 2 words":     [("TITLE", "match", "väst stat")],
+    "FTS + equals":            [("BESKRIVNING_ROW_1", "match", "armering"), ("FORMAT", "=", "A1")],
+    "has_error":               [("BLAD", "has_error", None)],
+    "contains (scan)":         [("SKAPAD_AV", "contains", "LARS")],
+}
+
+# OCR-style misspellings of values in make_frame()
+FUZZY_QUERIES = {
+    "fuzzy drawing no (O/0, B/8)": ("RITNINGSNUMMER_PROJEKT", "B8P05-1O-O1O-1O1O-0_0-0000l0"),
+    "fuzzy drawing no (1 edit)":   ("RITNINGSNUMMER_PROJEKT", "BBP05 10 011 1010 00 000010"),
+    "fuzzy name":                  ("SKAPAD_AV", "K LARS5ON"),
+    "fuzzy title":                 ("TITLE", "vastlanken tunel"),
+}
+
+
+# ==========================================================
+# PAGINATION (KEYSET): PAGE 1 VS DEEP PAGES
+# ==========================================================
+def time_pages(filters, bind, page_size=50, checkpoints=(1, 10, 100, 1000)):
+
+    timings = {}
+    cursor = None
+    page = 0
+
+    while True:
+
+        t0 = time.perf_counter()
+        df, next_cursor = search_page(filters, after=cursor, page_size=page_size, bind=bind)
+        elapsed = (time.perf_counter() - t0) * 1000
+
+        page += 1
+        if page in checkpoints:
+            timings[page] = elapsed
+
+        if next_cursor is None or page >= max(checkpoints):
+            break
+
+        cursor = next_cursor
+
+    t0 = time.perf_counter()
+    total = count_matches(filters, bind=bind)
+    timings["count"] = (time.perf_counter() - t0) * 1000
+    timings["total"] = total
+    timings["pages_walked"] = page
+
+    return timings
+
+
+# ==========================================================
+# MAIN
+# ==========================================================
+def run(n_rows, repeat=20, out_json=None):
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        db_path = Path(tmp) / "bench.db"
+        bind = get_engine(db_path)
+
+        df = make_frame(n_rows)
+
+        t0 = time.perf_counter()
+        update_sql_table(df, bind=bind)
+        errors = pd.DataFrame({
+            "document": df["Image"].iloc[::50],
+            "column": "BLAD",
+            "rule": "PATTERN",
+        })
+        update_errors_table(errors, documents=df["Image"], bind=bind)
+        load_seconds = time.perf_counter() - t0
+
+        reader = read_engine(db_path)
+
+        results = {"rows": n_rows, "load_seconds": load_seconds, "queries": {}}
+
+        for name, filters in QUERIES.items():
+
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                found = search(filters, top_n=200, bind=reader)
+                times.append((time.perf_counter() - t0) * 1000)
+
+            results["queries"][name] = {
+                "hits": len(found),
+                "median_ms": statistics.median(times),
+                "max_ms": max(times),
+            }
+
+        for name, (column, value) in FUZZY_QUERIES.items():
+
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                found = fuzzy_search(column, value, top_n=50, bind=reader)
+                times.append((time.perf_counter() - t0) * 1000)
+
+            results["queries"][name] = {
+                "hits": len(found),
+                "median_ms": statistics.median(times),
+                "max_ms": max(times),
+                "best": found[column].iloc[0] if len(found) else None,
+            }
+
+        results["pages"] = {
+            "all rows": time_pages([], reader),
+            "equals, low selectivity": time_pages(QUERIES["equals, low selectivity"], reader),
+        }
+
+        dispose_engines()
+
+    print(f"\n{n_rows} rows, load {load_seconds:.1f} s")
+    print(f"{'query':<30}{'hits':>6}{'median ms':>11}{'max ms':>9}")
+    for name, r in results["queries"].items():
+        print(f"{name:<30}{r['hits']:>6}{r['median_ms']:>11.1f}{r['max_ms']:>9.1f}  {r.get('best') or ''}")
+
+    print(f"\n{'paging (ms per page)':<30}{'p1':>7}{'p10':>7}{'p100':>7}{'p1000':>7}{'count':>7}{'total':>8}")
+    for name, r in results["pages"].items():
+        cells = "".join(f"{r[p]:>7.1f}" if p in r else f"{'-':>7}" for p in (1, 10, 100, 1000, "count"))
+        print(f"{name:<30}{cells}{r['total']:>8}")
+
+    if out_json:
+        Path(out_json).write_text(json.dumps(results, indent=2))
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Metadata search latency benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    run(args.rows, args.repeat, args.json)
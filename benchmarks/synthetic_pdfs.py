@@ -0,0 +1,201 @@
+# SYNTHETIC DRAWING PDFS
+#
+# Builds BIM-style A1 drawings with PyMuPDF for the offline pipeline
+# benchmark: an empty sheet with a frame, the title block exactly where
+# crop_stamp() / STAMP_28_RECT cut it out (Swedish field labels, one value
+# per cell) and a revision table inside step5's FIXED search window.
+#
+#   python -m benchmarks.synthetic_pdfs --out synthetic_pdfs --docs 100
+
+import argparse
+import random
+from pathlib import Path
+
+import fitz
+
+from render_cache import STAMP_28_RECT, fractional_rect
+
+# A1 landscape in points
+A1_SIZE = (2384, 1684)
+
+# step5's FIXED window (LEFT / TOP / RIGHT / BOTTOM_FRACTION_DEFAULT)
+REV_TABLE_RECT = (0.72, 0.79, 0.86, 0.88)
+
+FONT = "helv"
+LABEL_SIZE = 4.5
+VALUE_SIZE = 7
+
+SUPPLIERS = ["TYRÉNS AB", "SWECO CIVIL AB", "NCC SVERIGE AB", "NORCONSULT AB", "AF INFRASTRUCTURE AB"]
+PEOPLE    = ["J.ANDERSSON", "K.LARSSON", "M.SVENSSON", "P.NILSSON", "E.HOLM", "A.BERG"]
+WORDS     = ["PLAN", "SEKTION", "DETALJ", "ARMERING", "VÄSTLÄNKEN", "STATION", "TUNNEL", "BRO", "ÖVERSIKT", "FASAD"]
+CHANGES   = ["REVIDERAD ENL. GRANSKNING", "NY UTGÅVA", "KOMPLETTERAD", "ÄNDRAD HÖJD", "TILLÄGG DETALJ"]
+
+# title block grid: (row, col, col_span, label, field); 5 rows x 4 columns
+TITLE_BLOCK = [
+    (0, 0, 2, "LEVERANTÖR",              "LEVERANTOR_1"),
+    (0, 2, 2, "LEVERANTÖR",              "LEVERANTOR_2"),
+    (1, 0, 1, "SKAPAD AV",               "SKAPAD_AV"),
+    (1, 1, 1, "GRANSKAD AV",             "GRANSKAD_AV"),
+    (1, 2, 1, "GODKÄND AV",              "GODKAND_AV"),
+    (1, 3, 1, "DATUM",                   "DATUM"),
+    (2, 0, 2, "TITEL",                   "TITLE"),
+    (2, 2, 1, "UPPDRAGSNUMMER",          "UPPDRAGSNUMMER"),
+    (2, 3, 1, "GRANSKNINGSSTATUS/SYFTE", "GRANSKNINGSSTATUS_SYFTE"),
+    (3, 0, 2, "BESKRIVNING",             "BESKRIVNING_ROW_1"),
+    (3, 2, 1, "TEKNIKOMRÅDE",            "TEKNIKOMRADE"),
+    (3, 3, 1, "HANDLINGSTYP",            "HANDLINGSTYP"),
+    (4, 0, 2, "RITNINGSNUMMER PROJEKT",  "RITNINGSNUMMER_PROJEKT"),
+    (4, 2, 1, "SKALA / FORMAT",          "SKALA"),
+    (4, 3, 1, "BLAD",                    "BLAD"),
+]
+
+ROWS, COLS = 5, 4
+
+
+# ==========================================================
+# FIELD VALUES
+# ==========================================================
+def make_fields(i, rng):
+
+    doc = f"BBP05-{i % 90:02d}-{i % 700:03d}-{1000 + i % 400:04d}-0_0-{i:06d}"
+
+    return {
+        "LEVERANTOR_1": rng.choice(SUPPLIERS),
+        "LEVERANTOR_2": "TRAFIKVERKET",
+        "SKAPAD_AV": rng.choice(PEOPLE),
+        "GRANSKAD_AV": rng.choice(PEOPLE),
+        "GODKAND_AV": rng.choice(PEOPLE),
+        "DATUM": f"20{rng.randint(18, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "TITLE": " ".join(rng.sample(WORDS, 3)),
+        "UPPDRAGSNUMMER": f"{rng.randint(100000, 999999)}",
+        "GRANSKNINGSSTATUS_SYFTE": rng.choice(["GODKÄND", "FÖR GRANSKNING", "FÖRFRÅGNINGSUNDERLAG"]),
+        "BESKRIVNING_ROW_1": f"KM {i % 50}+{i % 1000:03d}",
+        "TEKNIKOMRADE": rng.choice(["BRO", "GEO", "EL", "VA"]),
+        "HANDLINGSTYP": rng.choice(["RITNING", "PM"]),
+        "RITNINGSNUMMER_PROJEKT": doc,
+        "SKALA": f"1:{rng.choice([50, 100, 200, 500])} / {rng.choice(['A1', 'A3'])}",
+        "BLAD": f"{i % 120:03d}",
+    }
+
+def make_revisions(rng):
+
+    # oldest first, like the printed tables; the last row is the current one
+    revisions = []
+    letter = "A"
+
+    for n in range(rng.randint(1, 4)):
+        year = 2020 + n
+        revisions.append((
+            f"{letter}.{n + 1}" if rng.random() < 0.5 else letter,
+            f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            rng.choice(CHANGES),
+            rng.choice(PEOPLE),
+        ))
+        letter = chr(ord(letter) + 1)
+
+    return revisions
+
+
+# ==========================================================
+# DRAWING
+# ==========================================================
+def draw_title_block(page, fields):
+
+    rect = fractional_rect(page.rect, STAMP_28_RECT)
+    cell_w = rect.width / COLS
+    cell_h = rect.height / ROWS
+
+    page.draw_rect(rect, width=1.2)
+
+    for row, col, span, label, field in TITLE_BLOCK:
+
+        cell = fitz.Rect(
+            rect.x0 + col * cell_w, rect.y0 + row * cell_h,
+            rect.x0 + (col + span) * cell_w, rect.y0 + (row + 1) * cell_h
+        )
+        page.draw_rect(cell, width=0.5)
+
+        page.insert_text((cell.x0 + 2, cell.y0 + LABEL_SIZE + 1.5), label, fontname=FONT, fontsize=LABEL_SIZE)
+        page.insert_text((cell.x0 + 3, cell.y1 - 4), fields[field], fontname=FONT, fontsize=VALUE_SIZE)
+
+def draw_revision_table(page, revisions):
+
+    rect = fractional_rect(page.rect, REV_TABLE_RECT)
+
+    # drawn bottom-up from the window's lower edge: header row, then the
+    # revisions, newest on top
+    row_h = VALUE_SIZE * 2.2
+    col_x = [0.0, 0.12, 0.30, 0.85, 1.0]
+    header = ["REV", "DATUM", "ÄNDRINGEN AVSER", "SIGN"]
+
+    y1 = rect.y1
+
+    for cells in [header] + [list(r) for r in revisions]:
+
+        y0 = y1 - row_h
+
+        for c, text in enumerate(cells):
+            x0 = rect.x0 + rect.width * col_x[c]
+            x1 = rect.x0 + rect.width * col_x[c + 1]
+            page.draw_rect(fitz.Rect(x0, y0, x1, y1), width=0.5)
+            page.insert_text((x0 + 3, y1 - 4), text, fontname=FONT, fontsize=VALUE_SIZE)
+
+        y1 = y0
+
+def make_pdf(path, fields, revisions, run_tag=""):
+
+    doc = fitz.open()
+
+    try:
+        page = doc.new_page(width=A1_SIZE[0], height=A1_SIZE[1])
+
+        # drawing frame and some linework, so the page isn't blank
+        page.draw_rect(page.rect + (20, 20, -20, -20), width=2)
+        for k in range(1, 8):
+            x = page.rect.width * k / 10
+            page.draw_line((x, 80), (x, page.rect.height * 0.7), width=0.3)
+
+        draw_title_block(page, fields)
+        draw_revision_table(page, revisions)
+
+        # run_tag changes the file bytes (and so the render-cache key)
+        # without touching the drawing
+        doc.set_metadata({"title": fields["RITNINGSNUMMER_PROJEKT"], "subject": run_tag})
+        doc.save(path, deflate=True)
+
+    finally:
+        doc.close()
+
+
+# ==========================================================
+# BATCH
+# ==========================================================
+def make_batch(out_dir, n_docs, seed=0, run_tag=""):
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    rng = random.Random(seed)
+    paths = []
+
+    for i in range(n_docs):
+
+        fields = make_fields(i, rng)
+        path = out_dir / f"{fields['RITNINGSNUMMER_PROJEKT']}.pdf"
+
+        make_pdf(path, fields, make_revisions(rng), run_tag)
+        paths.append(path)
+
+    return paths
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Generate synthetic drawing PDFs")
+    parser.add_argument("--out", default="synthetic_pdfs")
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = make_batch(args.out, args.docs, seed=args.seed)
+    print(f"{len(paths)} PDFs written to {args.out}")
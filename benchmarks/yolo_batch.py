@@ -0,0 +1,85 @@
+# YOLO BATCH-SIZE BENCHMARK (CPU)
+#
+# Measures stamp detection throughput (images/sec) for several batch sizes,
+# against the old one-path-per-call baseline.
+#
+#   python -m benchmarks.yolo_batch --images images_stamp --sizes 1 2 4 8 16
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import step2_extract
+from step2_extract import get_model, load_stamp, detect_batch, make_batches, list_images, YOLO_CONF
+
+
+# ==========================================================
+# TIMERS
+# ==========================================================
+def time_per_path(img_paths):
+
+    # legacy path: model(str(path)) per image, decode included
+    model = get_model()
+
+    t0 = time.perf_counter()
+    for p in img_paths:
+        model(str(p), conf=YOLO_CONF, verbose=False)
+
+    return time.perf_counter() - t0
+
+def time_batched(images, batch_size):
+
+    t0 = time.perf_counter()
+    for batch in make_batches(images, batch_size):
+        detect_batch(batch, verbose=False)
+
+    return time.perf_counter() - t0
+
+
+# ==========================================================
+# MAIN
+# ==========================================================
+def run(image_dir, sizes, repeat=1, out_json=None):
+
+    img_paths = list_images(Path(image_dir))
+
+    if not img_paths:
+        raise SystemExit(f"No images in {image_dir}")
+
+    images = [load_stamp(p)[0] for p in img_paths]
+    n = len(images) * repeat
+
+    # warm-up (model load + first inference)
+    detect_batch(images[:1], verbose=False)
+
+    results = []
+
+    elapsed = sum(time_per_path(img_paths) for _ in range(repeat))
+    results.append({"mode": "per_path", "batch_size": 1, "seconds": elapsed, "images_per_sec": n / elapsed})
+
+    for bs in sizes:
+        elapsed = sum(time_batched(images, bs) for _ in range(repeat))
+        results.append({"mode": "batched", "batch_size": bs, "seconds": elapsed, "images_per_sec": n / elapsed})
+
+    print(f"\n{len(images)} images x {repeat} repeat(s), conf={YOLO_CONF}")
+    print(f"{'mode':<10}{'batch':>7}{'seconds':>10}{'img/s':>9}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['batch_size']:>7}{r['seconds']:>10.2f}{r['images_per_sec']:>9.2f}")
+
+    if out_json:
+        Path(out_json).write_text(json.dumps(results, indent=2))
+
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="YOLO batch-size benchmark")
+    parser.add_argument("--images", default=str(step2_extract.image_dir))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    run(args.images, args.sizes, args.repeat, args.json)
@@ -0,0 +1,242 @@
+# APPEND-ONLY CHECKPOINT LOG
+#
+# The extraction steps append one JSON line per finished document and fsync
+# it, so progress survives a crash without rewriting the whole table every
+# few images. The Parquet hand-off is materialized once, at the end.
+#
+# Resume mode (RESUME_RUN=1 or resume=True) reads these logs back and only
+# processes the documents that are missing; the run manifest records which
+# whole stages already completed.
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+# Read from the environment so the subprocess runner picks it up as well.
+RESUME_RUN = os.environ.get("RESUME_RUN", "0") == "1"
+
+MANIFEST_NAME = "run_manifest.json"
+
+# source PDF's sha256 on each log line, so a PDF replaced under the same
+# name is not resumed from its old rows
+HASH_FIELD = "_sha256"
+
+# ==========================================================
+# PATHS
+# ==========================================================
+def checkpoint_path(out_path):
+
+    # raw_extraction.parquet -> raw_extraction.jsonl (same folder)
+    return Path(out_path).with_suffix(".jsonl")
+
+# ==========================================================
+# WRITE
+# ==========================================================
+def open_checkpoint(path, fresh=True):
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    return open(path, "w" if fresh else "a", encoding="utf-8")
+
+def append_row(fh, row, sha256=None):
+
+    if sha256:
+        row = {**row, HASH_FIELD: sha256}
+
+    fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+    fh.flush()
+    os.fsync(fh.fileno())
+
+# ==========================================================
+# READ
+# ==========================================================
+def read_checkpoint(path):
+
+    path = Path(path)
+    rows = []
+
+    if not path.exists():
+        return rows
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+
+            line = line.strip()
+
+            if not line:
+                continue
+
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # last line cut off by a crash mid-write
+                break
+
+    return rows
+
+def finished_rows(path, key, names, hashes=None):
+
+    # rows already in the log for the given document names, last one wins;
+    # with hashes (name -> source PDF sha256) rows of another PDF version
+    # don't count
+    names = set(names)
+    done = {}
+
+    for row in read_checkpoint(path):
+
+        name = row.get(key)
+        sha = row.pop(HASH_FIELD, None)
+
+        if name not in names:
+            continue
+
+        if hashes is not None and sha != hashes.get(name):
+            done.pop(name, None)
+            continue
+
+        done[name] = row
+
+    return done
+
+def drop_rows(path, key, names):
+
+    # rewrites the log without the given documents (their PDF changed)
+    path = Path(path)
+    names = set(names)
+
+    if not path.exists() or not names:
+        return
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for row in read_checkpoint(path):
+            if row.get(key) not in names:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    os.replace(tmp_path, path)
+
+# ==========================================================
+# PER-DOCUMENT IMAGE OUTPUTS
+# ==========================================================
+def write_image_atomic(path, img):
+
+    # a crash mid-write must not leave a truncated PNG that resume would
+    # treat as finished
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    ok, buf = cv2.imencode(path.suffix, img)
+
+    if not ok:
+        raise ValueError(f"Could not encode image: {path}")
+
+    buf.tofile(str(tmp_path))
+    os.replace(tmp_path, path)
+
+# ==========================================================
+# RUN MANIFEST (WHOLE STAGES)
+# ==========================================================
+def pdf_stat(path):
+
+    st = Path(path).stat()
+    return [st.st_size, st.st_mtime_ns]
+
+def pdf_changed(manifest, pdf_file, stat, hashes):
+
+    # same size and mtime: unchanged (the document catalog's shortcut);
+    # otherwise compare content hashes when both sides have one
+    if manifest.get("pdf_stats", {}).get(pdf_file) == stat:
+        return False
+
+    old = manifest.get("pdf_hashes", {}).get(pdf_file)
+
+    if hashes and old:
+        return old != hashes[pdf_file]
+
+    return True
+
+def load_manifest(run_dir, pdf_files, pdf_folder, resume=RESUME_RUN, hashes=None):
+
+    # returns (manifest, resumed, changed). A manifest is only reused for
+    # the same set of input PDFs and only while its run is unfinished.
+    # changed: PDFs replaced since the manifest was written; their
+    # per-document outputs must be redone, and every whole stage with them.
+    # The PDFs are only stat'ed here; hashes ({pdf: sha256}) are passed in
+    # when the caller already has them (document catalog).
+    path = Path(run_dir) / MANIFEST_NAME
+    pdf_files = sorted(pdf_files)
+    stats = {f: pdf_stat(Path(pdf_folder) / f) for f in pdf_files}
+
+    manifest = None
+
+    if resume and path.exists():
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            manifest = None
+
+        if manifest and manifest.get("pdf_files") != pdf_files:
+            print("RESUME: input PDFs changed, starting a fresh run")
+            manifest = None
+
+        elif manifest and manifest.get("complete"):
+            print("RESUME: previous run finished, starting a fresh run")
+            manifest = None
+
+    if manifest is None:
+        manifest = {"pdf_files": pdf_files, "pdf_stats": stats, "pdf_hashes": hashes or {}, "stages": {}}
+        save_manifest(run_dir, manifest)
+        return manifest, False, []
+
+    changed = [f for f in pdf_files if pdf_changed(manifest, f, stats[f], hashes)]
+
+    if changed:
+        print(f"RESUME: {len(changed)} PDF(s) replaced since the interrupted run, redoing them and all whole stages")
+        manifest["stages"] = {}
+
+    if changed or manifest.get("pdf_stats") != stats:
+        manifest["pdf_stats"] = stats
+        manifest["pdf_hashes"] = hashes or {}
+        save_manifest(run_dir, manifest)
+
+    print(f"RESUME: stages already done: {', '.join(manifest['stages']) or 'none'}")
+
+    return manifest, True, changed
+
+def save_manifest(run_dir, manifest):
+
+    path = Path(run_dir) / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def stage_done(manifest, stage):
+    return stage in manifest["stages"]
+
+def mark_stage(run_dir, manifest, stage):
+
+    manifest["stages"][stage] = datetime.now().isoformat(timespec="seconds")
+    save_manifest(run_dir, manifest)
+
+def complete_manifest(run_dir):
+
+    # the run finished: a later resume starts fresh instead of skipping
+    # every stage
+    path = Path(run_dir) / MANIFEST_NAME
+
+    if not path.exists():
+        return
+
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    manifest["complete"] = datetime.now().isoformat(timespec="seconds")
+    save_manifest(run_dir, manifest)
@@ -0,0 +1,116 @@
+# SHARED SQLITE ENGINES
+#
+# One pooled engine per database file and mode, shared by the pipeline, the
+# search module and the Streamlit app. Every new connection gets the same
+# pragmas: WAL (readers don't block the writer), synchronous=NORMAL (safe
+# with WAL, no fsync per commit), a larger page cache, memory-mapped reads
+# and in-memory temp tables for the search sorts.
+
+import os
+import sqlite3
+from pathlib import Path
+from sqlalchemy import create_engine, event
+
+# ==========================================================
+# BASE PATH (STREAMLIT SAFE)
+# ==========================================================
+BASE_DIR = Path(__file__).resolve().parent
+
+DB_PATH = BASE_DIR / "metadata.db"
+
+# ==========================================================
+# TUNING (ENV OVERRIDABLE)
+# ==========================================================
+CACHE_SIZE_MB = int(os.environ.get("SQLITE_CACHE_MB", "64"))
+MMAP_SIZE_MB  = int(os.environ.get("SQLITE_MMAP_MB", "256"))
+BUSY_TIMEOUT  = 30  # seconds a writer waits for the lock
+
+READ_PRAGMAS = {
+    "cache_size": -CACHE_SIZE_MB * 1024,  # negative → KiB
+    "mmap_size": MMAP_SIZE_MB * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+WRITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    **READ_PRAGMAS,
+}
+
+# (path, read_only) -> Engine
+_engines = {}
+
+# ==========================================================
+# PRAGMAS
+# ==========================================================
+def apply_pragmas(dbapi_conn, pragmas):
+
+    cur = dbapi_conn.cursor()
+    for name, value in pragmas.items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+# ==========================================================
+# ENGINES
+# ==========================================================
+def get_engine(db_path=DB_PATH, read_only=False):
+
+    # read_only: connections opened with mode=ro, for the Search page; they
+    # can never take the write lock, so they never wait on a running load
+    db_path = Path(db_path).resolve()
+    key = (str(db_path), read_only)
+
+    if key in _engines:
+        return _engines[key]
+
+    if read_only:
+        url = f"sqlite:///file:{db_path}?mode=ro&uri=true"
+        pragmas = READ_PRAGMAS
+    else:
+        url = f"sqlite:///{db_path}"
+        pragmas = WRITE_PRAGMAS
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": BUSY_TIMEOUT},
+    )
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_conn, _record):
+        apply_pragmas(dbapi_conn, pragmas)
+
+    _engines[key] = engine
+
+    return engine
+
+def read_engine(db_path=DB_PATH):
+    return get_engine(db_path, read_only=True)
+
+def dispose_engines():
+
+    # close pooled connections, e.g. before the database file is deleted
+    for engine in _engines.values():
+        engine.dispose()
+
+    _engines.clear()
+
+def delete_database(db_path=DB_PATH):
+
+    dispose_engines()
+
+    db_path = Path(db_path)
+    for path in (db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")):
+        if path.exists():
+            path.unlink()
+
+# ==========================================================
+# PLAIN SQLITE3 (DOC CATALOG)
+# ==========================================================
+def connect(db_path):
+
+    # sqlite3 connection with the write pragmas, for modules that don't use
+    # SQLAlchemy
+    conn = sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT)
+    apply_pragmas(conn, WRITE_PRAGMAS)
+
+    return conn
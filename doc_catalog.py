@@ -0,0 +1,159 @@
+# DOCUMENT CATALOG (INCREMENTAL PROCESSING)
+#
+# Per-document stage outputs keyed by the SHA-256 of the PDF. A file that was
+# already extracted is recognised by its (path, size, mtime) without reading it
+# again, and its cached rows are reused instead of re-running YOLO / OCR.
+#
+# Every output is stored with the version of the stage that produced it
+# (stage_version: the step's CATALOG_VERSION plus the hash of its model
+# file). A retrained best.pt or a bumped CATALOG_VERSION makes the old rows
+# misses, so those documents are extracted again.
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+from render_cache import file_sha256
+from db import connect
+
+# ==========================================================
+# BASE PATH (STREAMLIT SAFE)
+# ==========================================================
+BASE_DIR = Path(__file__).resolve().parent
+
+CATALOG_DB = BASE_DIR / "doc_catalog.db"
+
+# stage names used by the pipeline
+STAGE_EXTRACT  = "step2_extract"
+STAGE_REVISION = "step5_revision"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_index (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256   TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS documents (
+    sha256     TEXT PRIMARY KEY,
+    pdf_name   TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stage_outputs (
+    sha256     TEXT NOT NULL,
+    stage      TEXT NOT NULL,
+    version    TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (sha256, stage, version)
+);
+"""
+
+# ==========================================================
+# CONNECT
+# ==========================================================
+def open_catalog(db_path=CATALOG_DB):
+
+    # WAL / synchronous=NORMAL: one commit per hashed file stays cheap
+    conn = connect(db_path)
+
+    # catalogs from before the version column: their rows can't be trusted
+    # to match the current model, start the outputs over
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(stage_outputs)")]
+    if columns and "version" not in columns:
+        conn.execute("DROP TABLE stage_outputs")
+
+    conn.executescript(SCHEMA)
+
+    return conn
+
+def clear_catalog(db_path=CATALOG_DB):
+
+    # forces a full re-extraction on the next run
+    db_path = Path(db_path)
+    for path in (db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")):
+        path.unlink(missing_ok=True)
+
+# ==========================================================
+# STAGE VERSION
+# ==========================================================
+def stage_version(code_version, model_path=None):
+
+    # code_version: the step's CATALOG_VERSION; model_path: the weights its
+    # outputs depend on (hashed once per process, see file_sha256)
+    version = f"v{code_version}"
+
+    if model_path is not None:
+        version += f"-{file_sha256(model_path)[:16]}"
+
+    return version
+
+# ==========================================================
+# HASHING (STAT SHORTCUT)
+# ==========================================================
+def hash_pdf(conn, pdf_path):
+
+    pdf_path = Path(pdf_path).resolve()
+    st = pdf_path.stat()
+
+    row = conn.execute(
+        "SELECT size, mtime_ns, sha256 FROM file_index WHERE path = ?",
+        (str(pdf_path),)
+    ).fetchone()
+
+    if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+        return row[2]
+
+    sha = file_sha256(pdf_path)
+
+    conn.execute(
+        "INSERT OR REPLACE INTO file_index (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+        (str(pdf_path), st.st_size, st.st_mtime_ns, sha)
+    )
+    conn.commit()
+
+    return sha
+
+# ==========================================================
+# STAGE OUTPUTS
+# ==========================================================
+def load_outputs(conn, stage, hashes, version):
+
+    hashes = list(set(hashes))
+    found = {}
+
+    # stay well below SQLite's bound-parameter limit
+    for i in range(0, len(hashes), 500):
+
+        chunk = hashes[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+
+        for sha, payload in conn.execute(
+            f"SELECT sha256, payload FROM stage_outputs WHERE stage = ? AND version = ? AND sha256 IN ({marks})",
+            [stage, version, *chunk]
+        ):
+            found[sha] = json.loads(payload)
+
+    return found
+
+def save_outputs(conn, stage, outputs, pdf_names, version):
+
+    # outputs: {sha256: row dict}, pdf_names: {sha256: pdf file name};
+    # rows of older versions of these documents are dropped
+    now = datetime.now().isoformat(timespec="seconds")
+
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO documents (sha256, pdf_name, updated_at) VALUES (?, ?, ?)",
+            [(sha, pdf_names[sha], now) for sha in outputs]
+        )
+        conn.executemany(
+            "DELETE FROM stage_outputs WHERE sha256 = ? AND stage = ? AND version != ?",
+            [(sha, stage, version) for sha in outputs]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO stage_outputs (sha256, stage, version, payload, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [(sha, stage, version, json.dumps(row, ensure_ascii=False), now) for sha, row in outputs.items()]
+        )
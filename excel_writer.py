@@ -0,0 +1,79 @@
+# STYLED EXCEL EXPORT (SINGLE PASS)
+#
+# Streams a DataFrame into a write-only workbook and fills the cells flagged
+# in a boolean mask red on the way. Replaces the "to_excel → load_workbook →
+# fill → save" round trip; nothing is read back.
+
+import pandas as pd
+from pathlib import Path
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+RED_FILL = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
+
+# same look as the pandas to_excel header
+THIN = Side(style="thin")
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+HEADER_ALIGN = Alignment(horizontal="center", vertical="top")
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+def cell_value(v):
+
+    # NaN / None / "" → empty cell, as pandas writes them
+    if v is None or v == "":
+        return None
+
+    if isinstance(v, float) and pd.isna(v):
+        return None
+
+    return v
+
+# ==========================================================
+# WRITE
+# ==========================================================
+def write_styled_excel(df: pd.DataFrame, out_path, mask: pd.DataFrame = None, fill=RED_FILL, sheet_name="Sheet1"):
+
+    # mask: boolean frame with df's shape (positional), True → filled cell
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+
+    header = []
+    for name in df.columns:
+        cell = WriteOnlyCell(ws, value=str(name))
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGN
+        header.append(cell)
+
+    ws.append(header)
+
+    flags = mask.to_numpy(dtype=bool) if mask is not None else None
+
+    for i, values in enumerate(df.itertuples(index=False, name=None)):
+
+        if flags is None or not flags[i].any():
+            ws.append([cell_value(v) for v in values])
+            continue
+
+        row = []
+        for j, v in enumerate(values):
+            v = cell_value(v)
+            if flags[i, j]:
+                cell = WriteOnlyCell(ws, value=v)
+                cell.fill = fill
+                row.append(cell)
+            else:
+                row.append(v)
+
+        ws.append(row)
+
+    wb.save(out_path)
+
+    return out_path
@@ -0,0 +1,57 @@
+# INTERMEDIATE HAND-OFF STORE
+#
+# Steps pass their tables to each other as Parquet files (columnar, typed,
+# no openpyxl round trip). Excel is only written for the final export.
+# Every read/write prints its duration so hop cost stays visible.
+
+import time
+import pandas as pd
+from pathlib import Path
+
+# ==========================================================
+# BASE PATH (STREAMLIT SAFE)
+# ==========================================================
+BASE_DIR = Path(__file__).resolve().parent
+
+INTERMEDIATE_DIR = BASE_DIR / "intermediate"
+
+RAW_EXTRACTION      = "raw_extraction"
+CLEANING_FILE       = "cleaning_file"
+REVISION_EXTRACTION = "revision_extraction"
+RAW_VALIDATED       = "raw_validated"
+VALIDATION_FILE     = "validation_file"
+VALIDATION_ERRORS   = "validation_errors"
+
+# ==========================================================
+# PATHS
+# ==========================================================
+def handoff_path(name, base_dir=INTERMEDIATE_DIR):
+    return Path(base_dir) / f"{name}.parquet"
+
+# ==========================================================
+# WRITE / READ
+# ==========================================================
+def write_frame(df: pd.DataFrame, path):
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    df.to_parquet(path, index=False)
+    ms = (time.perf_counter() - t0) * 1000
+
+    print(f"HANDOFF WRITE {path.name}: {len(df)} rows in {ms:.1f} ms")
+
+    return path
+
+def read_frame(path) -> pd.DataFrame:
+
+    path = Path(path)
+
+    t0 = time.perf_counter()
+    df = pd.read_parquet(path)
+    ms = (time.perf_counter() - t0) * 1000
+
+    print(f"HANDOFF READ  {path.name}: {len(df)} rows in {ms:.1f} ms")
+
+    return df
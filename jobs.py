@@ -0,0 +1,300 @@
+# BACKGROUND PIPELINE JOBS
+#
+# "Run Full Validation Pipeline" submits a job instead of running inside the
+# Streamlit script thread. Jobs run one at a time on a worker thread of the
+# server process (so YOLO / EasyOCR stay loaded between runs) and record
+# their state in jobs.db: queued → running → done / failed, with per-stage
+# and per-document progress. The app only polls these tables, so a rerun or
+# a browser refresh never abandons the work.
+
+import json
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db import connect
+
+# ==========================================================
+# BASE PATH (STREAMLIT SAFE)
+# ==========================================================
+BASE_DIR = Path(__file__).resolve().parent
+
+# own file: Clear Workspace / auto_clean delete metadata.db
+JOBS_DB = BASE_DIR / "jobs.db"
+
+QUEUED  = "queued"
+RUNNING = "running"
+DONE    = "done"
+FAILED  = "failed"
+
+ACTIVE = (QUEUED, RUNNING)
+
+# pipeline stages in run order (the keys the pipeline reports progress under)
+STAGES = [
+    ("step1", "PDF → Stamp Images"),
+    ("step2", "28 Label Extraction"),
+    ("step4", "Convert PDFs for Revision"),
+    ("step5", "Revision Extraction"),
+    ("step3", "Cleaning"),
+    ("step6", "Compare Revision vs Main"),
+    ("step7", "Master Validation"),
+    ("sql",   "Update SQLite"),
+]
+
+# a job whose process stopped beating for this long is marked failed
+HEARTBEAT_SECONDS = 10
+STALE_AFTER = timedelta(seconds=6 * HEARTBEAT_SECONDS)
+
+# per-document progress is written at most this often (stage start / end
+# always)
+PROGRESS_SECONDS = 1.0
+
+# identifies this server process; jobs of another (dead) process are stale
+INSTANCE = uuid.uuid4().hex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind         TEXT NOT NULL,
+    params       TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    stage        TEXT,
+    result       TEXT,
+    error        TEXT,
+    owner        TEXT NOT NULL,
+    created_at   TEXT NOT NULL,
+    started_at   TEXT,
+    finished_at  TEXT,
+    heartbeat_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS job_stages (
+    job_id      INTEGER NOT NULL,
+    stage       TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    done        INTEGER NOT NULL,
+    total       INTEGER NOT NULL,
+    started_at  TEXT NOT NULL,
+    finished_at TEXT,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+# one job at a time: runs share the intermediate/ folder and the models
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-job")
+
+# databases whose schema this process already created (open_jobs), so the
+# DDL runs once per file, not on every connection
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+# ==========================================================
+# DB HELPERS
+# ==========================================================
+def now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def open_jobs(db_path=None):
+
+    # JOBS_DB is looked up per call, so it can be pointed elsewhere
+    db_path = Path(db_path or JOBS_DB).resolve()
+
+    conn = connect(db_path)
+    conn.row_factory = lambda cur, row: {d[0]: v for d, v in zip(cur.description, row)}
+
+    if str(db_path) not in _schema_ready:
+        with _schema_lock:
+            if str(db_path) not in _schema_ready:
+                conn.executescript(SCHEMA)
+                _schema_ready.add(str(db_path))
+
+    return conn
+
+def execute(sql, params=()):
+
+    # short-lived connection per call: called from the app and the worker thread
+    with closing(open_jobs()) as conn, conn:
+        return conn.execute(sql, params).lastrowid
+
+def query(sql, params=()):
+
+    with closing(open_jobs()) as conn:
+        return conn.execute(sql, params).fetchall()
+
+# ==========================================================
+# PROGRESS (CALLED BY THE PIPELINE)
+# ==========================================================
+class JobProgress:
+
+    # progress(stage, done, total): per-document for the extraction stages,
+    # 0/1 → 1/1 for the whole-table stages
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = set()
+        self.last_write = 0.0
+
+    def __call__(self, stage, done, total):
+
+        status = DONE if done >= total else RUNNING
+        first = stage not in self.started
+
+        # in-between documents: one write per PROGRESS_SECONDS
+        if not first and status != DONE and time.monotonic() - self.last_write < PROGRESS_SECONDS:
+            return
+
+        self.last_write = time.monotonic()
+        ts = now()
+
+        with closing(open_jobs()) as conn, conn:
+
+            if first:
+                conn.execute("""
+                    INSERT OR REPLACE INTO job_stages (job_id, stage, status, done, total, started_at, finished_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (self.job_id, stage, status, done, total, ts, ts if status == DONE else None))
+                self.started.add(stage)
+            else:
+                conn.execute(
+                    "UPDATE job_stages SET status = ?, done = ?, total = ?, finished_at = ? WHERE job_id = ? AND stage = ?",
+                    (status, done, total, ts if status == DONE else None, self.job_id, stage)
+                )
+
+            conn.execute(
+                "UPDATE jobs SET stage = ?, heartbeat_at = ? WHERE id = ?",
+                (stage, ts, self.job_id)
+            )
+
+def beat(job_id, stop):
+
+    # keeps the heartbeat fresh through long stages without progress calls
+    # (model loading, cleaning, Excel export). A failed beat (e.g. database
+    # is locked) is retried on the next one; a dead thread would get the
+    # live job marked failed by recover_stale()
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (now(), job_id))
+        except sqlite3.Error as e:
+            print(f"JOB {job_id}: heartbeat failed: {e}")
+
+# ==========================================================
+# RUN
+# ==========================================================
+def run_validation_job(job_id, project_dir, params):
+
+    from pipeline_validation import run_full_validation_pipeline
+
+    execute(
+        "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+        (RUNNING, now(), now(), job_id)
+    )
+
+    stop = threading.Event()
+    threading.Thread(target=beat, args=(job_id, stop), daemon=True).start()
+
+    try:
+        result = run_full_validation_pipeline(
+            PROJECT_DIR=Path(project_dir),
+            progress=JobProgress(job_id),
+            **params
+        )
+
+        execute(
+            "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+            (DONE, str(result), now(), job_id)
+        )
+
+    except Exception as e:
+
+        traceback.print_exc()
+
+        execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (FAILED, f"{type(e).__name__}: {e}", now(), job_id)
+        )
+
+    finally:
+        stop.set()
+
+def submit_validation(project_dir, **params):
+
+    # params: keyword arguments for run_full_validation_pipeline (JSON-able)
+    recover_stale()
+
+    ts = now()
+
+    job_id = execute("""
+        INSERT INTO jobs (kind, params, status, owner, created_at, heartbeat_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, ("validation", json.dumps(params), QUEUED, INSTANCE, ts, ts))
+
+    _executor.submit(run_validation_job, job_id, str(project_dir), params)
+
+    return job_id
+
+# ==========================================================
+# STALE RECOVERY
+# ==========================================================
+def recover_stale():
+
+    # queued / running jobs of another server process that stopped beating
+    # (server restart, crash) can never finish: mark them failed
+    cutoff = (datetime.now() - STALE_AFTER).isoformat(timespec="seconds")
+
+    execute(f"""
+        UPDATE jobs SET status = ?, finished_at = ?,
+            error = 'Interrupted (server stopped). Run again with "Resume previous run".'
+        WHERE status IN ({",".join("?" * len(ACTIVE))}) AND owner != ? AND heartbeat_at < ?
+    """, (FAILED, now(), *ACTIVE, INSTANCE, cutoff))
+
+# ==========================================================
+# READ (APP)
+# ==========================================================
+def get_job(job_id):
+    rows = query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    return rows[0] if rows else None
+
+def latest_job(kind="validation"):
+    rows = query("SELECT * FROM jobs WHERE kind = ? ORDER BY id DESC LIMIT 1", (kind,))
+    return rows[0] if rows else None
+
+def active_job(kind="validation"):
+
+    rows = query(
+        f"SELECT * FROM jobs WHERE kind = ? AND status IN ({','.join('?' * len(ACTIVE))}) ORDER BY id LIMIT 1",
+        (kind, *ACTIVE)
+    )
+
+    return rows[0] if rows else None
+
+def job_stages(job_id):
+
+    found = {r["stage"]: r for r in query("SELECT * FROM job_stages WHERE job_id = ?", (job_id,))}
+
+    return [
+        {
+            "stage": title,
+            "status": found[key]["status"] if key in found else "pending",
+            "done": found[key]["done"] if key in found else 0,
+            "total": found[key]["total"] if key in found else None,
+        }
+        for key, title in STAGES
+    ]
+
+def job_fraction(stages):
+
+    # overall progress: finished stages + the fraction of the running one
+    total = 0.0
+
+    for s in stages:
+        if s["status"] == DONE:
+            total += 1
+        elif s["total"]:
+            total += s["done"] / s["total"]
+
+    return total / len(stages)
@@ -0,0 +1,220 @@
+# TITLE-BLOCK LAYOUT CACHE (YOLO BOXES PER STAMP TEMPLATE)
+#
+# Most drawings of a delivery share one stamp template, and YOLO finds the
+# same label boxes on every one of them. With LAYOUT_CACHE=1, step2 hashes
+# the ruling lines of each stamp (layout_fingerprint) and keeps the box
+# geometry of the first stamp of every template, as fractions of the stamp
+# size. Later stamps with the same fingerprint go straight to OCR.
+#
+# Every SPOT_CHECK_EVERY-th reuse of a template still runs YOLO; if the
+# boxes no longer match the cached ones (new model, template revision) the
+# entry is replaced by the fresh detection.
+#
+# Entries are stored in layout_cache.json, tagged with the model file they
+# came from; a different best.pt starts an empty cache.
+
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# ==========================================================
+# BASE PATH (STREAMLIT SAFE)
+# ==========================================================
+BASE_DIR = Path(__file__).resolve().parent
+
+CACHE_FILE = BASE_DIR / "layout_cache.json"
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+# Read from the environment so the subprocess runner and the worker
+# processes pick it up as well.
+LAYOUT_CACHE = os.environ.get("LAYOUT_CACHE", "0") == "1"
+SPOT_CHECK_EVERY = int(os.environ.get("LAYOUT_SPOT_CHECK", "25"))
+
+if SPOT_CHECK_EVERY < 1:
+    raise ValueError(f"LAYOUT_SPOT_CHECK must be >= 1 (1 = check every reuse), got {SPOT_CHECK_EVERY}")
+
+# fingerprint: stamp scaled to this width, line positions rounded to 1/100
+FP_WIDTH = 800
+FP_GRID = 100
+DARK = 200          # gray values below this count as ink
+MIN_LINE_FRAC = 8   # a ruling line is at least 1/8 of the stamp's width / height
+
+# spot check: every cached box must overlap a fresh one of its label this much
+MIN_IOU = 0.7
+
+# fingerprint -> {"boxes": [[label, fx1, fy1, fx2, fy2], ...], "uses": n}
+_layouts = None
+
+# ==========================================================
+# FINGERPRINT (RULING LINES)
+# ==========================================================
+def line_positions(mask, size):
+
+    # centers of the runs of True in a 1-D mask, on the FP_GRID
+    idx = np.flatnonzero(mask)
+
+    if idx.size == 0:
+        return []
+
+    runs = np.split(idx, np.flatnonzero(np.diff(idx) > 1) + 1)
+
+    return sorted({round(float(r.mean()) / size * FP_GRID) for r in runs})
+
+def layout_fingerprint(img):
+
+    # long horizontal / vertical strokes only: text is too short to survive
+    # the opening, so stamps that differ only in their values hash the same.
+    # None when no ruling lines are found (never cached).
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+    h, w = gray.shape
+    small_h = max(1, round(h * FP_WIDTH / w))
+
+    small = cv2.resize(gray, (FP_WIDTH, small_h), interpolation=cv2.INTER_AREA)
+    ink = (small < DARK).astype(np.uint8)
+
+    horiz = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (FP_WIDTH // MIN_LINE_FRAC, 1)))
+    vert  = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(1, small_h // MIN_LINE_FRAC))))
+
+    ys = line_positions(horiz.any(axis=1), small_h)
+    xs = line_positions(vert.any(axis=0), FP_WIDTH)
+
+    if not ys and not xs:
+        return None
+
+    return hashlib.sha1(json.dumps([ys, xs]).encode()).hexdigest()[:16]
+
+# ==========================================================
+# BOXES <-> STORED GEOMETRY
+# ==========================================================
+def to_geometry(boxes, w, h):
+    return [[label, x1 / w, y1 / h, x2 / w, y2 / h] for _, label, x1, y1, x2, y2 in boxes]
+
+def from_geometry(geometry, w, h):
+
+    # same shape as step2's boxes_from_result(): (index, label, x1, y1, x2, y2)
+    return [
+        (i, label, int(round(fx1 * w)), int(round(fy1 * h)), int(round(fx2 * w)), int(round(fy2 * h)))
+        for i, (label, fx1, fy1, fx2, fy2) in enumerate(geometry)
+    ]
+
+def box_iou(a, b):
+
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+
+    return inter / union if union > 0 else 0.0
+
+def same_layout(cached, fresh):
+
+    # same labels, same counts, and every cached box still where YOLO puts it
+    if Counter(g[0] for g in cached) != Counter(g[0] for g in fresh):
+        return False
+
+    for label, *rect in cached:
+        if max(box_iou(rect, f[1:]) for f in fresh if f[0] == label) < MIN_IOU:
+            return False
+
+    return True
+
+# ==========================================================
+# PERSISTENCE
+# ==========================================================
+def model_tag(model_path):
+
+    st = Path(model_path).stat()
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+def load_layouts(model_path, cache_file=None):
+
+    global _layouts
+
+    if _layouts is None:
+
+        _layouts = {}
+
+        try:
+            data = json.loads(Path(cache_file or CACHE_FILE).read_text(encoding="utf-8"))
+            if data.get("model") == model_tag(model_path):
+                _layouts = {fp: {"boxes": g, "uses": 0} for fp, g in data["layouts"].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    return _layouts
+
+def save_layouts(model_path, cache_file=None):
+
+    # merged with what other worker processes saved in the meantime; the
+    # last writer wins per fingerprint, which at worst costs one extra YOLO run
+    cache_file = Path(cache_file or CACHE_FILE)
+    tag = model_tag(model_path)
+
+    stored = {}
+    try:
+        data = json.loads(cache_file.read_text(encoding="utf-8"))
+        if data.get("model") == tag:
+            stored = data["layouts"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    stored.update({fp: entry["boxes"] for fp, entry in _layouts.items()})
+
+    tmp = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"model": tag, "layouts": stored}), encoding="utf-8")
+    os.replace(tmp, cache_file)
+
+# ==========================================================
+# LOOKUP / STORE (CALLED BY STEP2)
+# ==========================================================
+def cached_boxes(fp, w, h, model_path):
+
+    # → (boxes, spot_check): boxes None on a miss; spot_check True when this
+    # reuse should be confirmed by a full detection
+    if fp is None:
+        return None, False
+
+    entry = load_layouts(model_path).get(fp)
+
+    if entry is None:
+        return None, False
+
+    entry["uses"] += 1
+
+    return from_geometry(entry["boxes"], w, h), entry["uses"] % SPOT_CHECK_EVERY == 0
+
+def store_boxes(fp, boxes, w, h, model_path):
+
+    # first detection of a template, or a spot check: returns False when the
+    # fresh boxes disagree with the cached ones (the entry is replaced)
+    if fp is None or not boxes:
+        return True
+
+    layouts = load_layouts(model_path)
+    fresh = to_geometry(boxes, w, h)
+    entry = layouts.get(fp)
+
+    if entry is not None and same_layout(entry["boxes"], fresh):
+        return True
+
+    layouts[fp] = {"boxes": fresh, "uses": 0}
+    save_layouts(model_path)
+
+    return entry is None
+
+def clear_layout_cache(cache_file=None):
+
+    # the file and this process's copy, or the next save writes it back
+    global _layouts
+
+    _layouts = None
+    Path(cache_file or CACHE_FILE).unlink(missing_ok=True)
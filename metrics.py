@@ -0,0 +1,247 @@
+# PIPELINE METRICS (TIMING SPANS)
+#
+#   with span("ocr", doc=name, label=label) as s:
+#       ...
+#       s["crop_h"], s["crop_w"] = crop.shape[:2]
+#
+# Each span appends one JSON line to the run's metrics file: stage, the
+# caller's fields (doc, label, counts, sizes), duration and memory:
+#
+#   rss_mb               current RSS when the span ends (Linux only)
+#   rss_delta_mb         RSS growth over the span: what this document /
+#                        batch added (Linux only)
+#   process_peak_rss_mb  the process's high-water mark so far. It never goes
+#                        down, so after the largest sheet every later span
+#                        shows the same value; not a per-document number.
+#
+# Worker processes and the subprocess runner append to the same file.
+# report() prints p50 / p95 per stage and label after a run.
+#
+# Disabled (PIPELINE_METRICS=0, the default) span() hands back one shared
+# no-op context, so instrumented code costs a function call and nothing else.
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Windows: no peak RSS
+    resource = None
+
+# current RSS: /proc/self/statm (resident pages, 2nd field) on Linux
+STATM = Path("/proc/self/statm")
+PAGE_MB = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024) if hasattr(os, "sysconf") else None
+
+# ==========================================================
+# BASE PATH (STREAMLIT SAFE)
+# ==========================================================
+BASE_DIR = Path(__file__).resolve().parent
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+# Read from the environment so the subprocess runner and the worker
+# processes pick it up as well.
+METRICS_ENABLED = os.environ.get("PIPELINE_METRICS", "0") == "1"
+METRICS_FILE = Path(os.environ.get("PIPELINE_METRICS_FILE", BASE_DIR / "intermediate" / "metrics.jsonl"))
+
+SUMMARY_NAME = "metrics_summary.json"
+
+# yielded by disabled spans; whatever callers put in it is ignored
+_NOOP = nullcontext({})
+
+_lock = threading.Lock()
+_fh = None
+_fh_path = None
+
+# ==========================================================
+# ENABLE / NEW RUN
+# ==========================================================
+def start_run(path=None):
+
+    # turns metrics on for this process and its children, and starts an
+    # empty metrics file for the run
+    global METRICS_ENABLED, METRICS_FILE
+
+    METRICS_ENABLED = True
+    METRICS_FILE = Path(path) if path else METRICS_FILE
+
+    METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    METRICS_FILE.write_text("", encoding="utf-8")
+
+    os.environ["PIPELINE_METRICS"] = "1"
+    os.environ["PIPELINE_METRICS_FILE"] = str(METRICS_FILE)
+
+    return METRICS_FILE
+
+# ==========================================================
+# RECORDING
+# ==========================================================
+def rss_mb():
+
+    # None where /proc isn't available (macOS, Windows)
+    if PAGE_MB is None:
+        return None
+
+    try:
+        return round(int(STATM.read_text().split()[1]) * PAGE_MB, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def process_peak_rss_mb():
+
+    # high-water mark of the whole process, not of the current span
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # bytes on macOS, KiB on Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def write_record(rec):
+
+    global _fh, _fh_path
+
+    line = json.dumps(rec, ensure_ascii=False, default=str) + "\n"
+
+    with _lock:
+
+        if _fh is None or _fh_path != METRICS_FILE:
+            if _fh is not None:
+                _fh.close()
+            METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            _fh = open(METRICS_FILE, "a", encoding="utf-8")
+            _fh_path = METRICS_FILE
+
+        # one short line per write, flushed at once: appends from several
+        # processes don't interleave
+        _fh.write(line)
+        _fh.flush()
+
+def record(stage, seconds, **fields):
+
+    # for timings measured elsewhere (e.g. one OCR batch split per crop)
+    if not METRICS_ENABLED:
+        return
+
+    write_record({
+        "stage": stage, **fields,
+        "seconds": seconds, "rss_mb": rss_mb(), "process_peak_rss_mb": process_peak_rss_mb(),
+        "pid": os.getpid(), "ts": time.time(),
+    })
+
+@contextmanager
+def _span(stage, fields):
+
+    rec = {"stage": stage, **fields}
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+
+    try:
+        yield rec
+
+    except Exception as e:
+        rec["error"] = type(e).__name__
+        raise
+
+    finally:
+        rec["seconds"] = time.perf_counter() - t0
+        rec["rss_mb"] = rss_mb()
+        rec["rss_delta_mb"] = round(rec["rss_mb"] - rss0, 1) if rss0 is not None and rec["rss_mb"] is not None else None
+        rec["process_peak_rss_mb"] = process_peak_rss_mb()
+        rec["pid"] = os.getpid()
+        rec["ts"] = time.time()
+        write_record(rec)
+
+def span(stage, **fields):
+
+    if not METRICS_ENABLED:
+        return _NOOP
+
+    return _span(stage, fields)
+
+# ==========================================================
+# SUMMARY REPORT
+# ==========================================================
+def load_records(path=None):
+
+    import pandas as pd
+
+    path = Path(path) if path else METRICS_FILE
+
+    if not path.exists():
+        return pd.DataFrame()
+
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # a line cut off by a crash
+                continue
+
+    return pd.DataFrame(rows)
+
+def summarize(path=None):
+
+    # one row per (stage, label): count, total, p50 / p95 / max in ms, the
+    # largest RSS growth of a single span and the process high-water mark
+    import pandas as pd
+
+    df = load_records(path)
+
+    if df.empty:
+        return pd.DataFrame()
+
+    if "label" not in df.columns:
+        df["label"] = ""
+
+    df["label"] = df["label"].fillna("").astype(str)
+    df["ms"] = df["seconds"] * 1000
+
+    # metrics files from other platforms / older runs lack some memory fields
+    for col in ("rss_delta_mb", "process_peak_rss_mb"):
+        if col not in df.columns:
+            df[col] = None
+
+    summary = df.groupby(["stage", "label"], sort=False).agg(
+        count=("ms", "size"),
+        total_s=("seconds", "sum"),
+        p50_ms=("ms", lambda s: s.quantile(0.50)),
+        p95_ms=("ms", lambda s: s.quantile(0.95)),
+        max_ms=("ms", "max"),
+        max_rss_delta_mb=("rss_delta_mb", "max"),
+        process_peak_rss_mb=("process_peak_rss_mb", "max"),
+    ).reset_index()
+
+    return summary.round(2)
+
+def report(path=None):
+
+    path = Path(path) if path else METRICS_FILE
+    summary = summarize(path)
+
+    if summary.empty:
+        print("METRICS: no spans recorded")
+        return summary
+
+    print("\nMETRICS (per stage / label)")
+    print(summary.to_string(index=False))
+
+    out = path.with_name(SUMMARY_NAME)
+    out.write_text(json.dumps(summary.to_dict(orient="records"), indent=2), encoding="utf-8")
+    print("Metrics summary saved:", out)
+
+    return summary
+
+
+if __name__ == "__main__":
+    report(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,28 +1,15 @@
 import os
 import cv2
-import numpy as np
-import fitz
 from pathlib import Path
 
+from render_cache import render_page, render_region, release_page, STAMP_28_RECT, STAMP_REV_RECT
+
 
 # ==========================================================
-# PDF → IMAGE
+# PDF → IMAGE (SHARED RENDER CACHE)
 # ==========================================================
 def pdf_to_image(pdf_path, dpi=300):
-
-    doc = fitz.open(pdf_path)
-    page = doc.load_page(0)
-
-    pix = page.get_pixmap(dpi=dpi)
-
-    img = np.frombuffer(pix.samples, dtype=np.uint8)
-    img = img.reshape(pix.height, pix.width, pix.n)
-
-    if pix.n == 4:
-        img = img[:, :, :3]
-
-    doc.close()
-    return img
+    return render_page(pdf_path, page=0, dpi=dpi)
 
 
 # ==========================================================
@@ -55,10 +42,21 @@ def crop_stamp_rev(img):
     return img[y_start:y_end, x_start:x_end]
 
 
+# ==========================================================
+# CLIP + GRAYSCALE (ONLY THE TWO STAMP REGIONS ARE RENDERED)
+# ==========================================================
+def render_stamps_clipped(pdf_path, dpi=300):
+
+    stamp_28  = render_region(pdf_path, STAMP_28_RECT, dpi=dpi, gray=True)
+    stamp_rev = render_region(pdf_path, STAMP_REV_RECT, dpi=dpi, gray=True)
+
+    return stamp_28, stamp_rev
+
+
 # ==========================================================
 # MAIN PIPELINE FUNCTION
 # ==========================================================
-def run_image_pipeline(PDF_FOLDER, OUTPUT_DIR):
+def run_image_pipeline(PDF_FOLDER, OUTPUT_DIR, clip_gray=False):
 
     PDF_FOLDER = Path(PDF_FOLDER)
     OUTPUT_DIR = Path(OUTPUT_DIR)
@@ -80,10 +78,13 @@ def run_image_pipeline(PDF_FOLDER, OUTPUT_DIR):
 
         try:
 
-            img = pdf_to_image(pdf_path, dpi=300)
+            if clip_gray:
+                stamp_28, stamp_rev = render_stamps_clipped(pdf_path, dpi=300)
+            else:
+                img = pdf_to_image(pdf_path, dpi=300)
 
-            stamp_28 = crop_stamp_28(img)
-            stamp_rev = crop_stamp_rev(img)
+                stamp_28 = crop_stamp_28(img)
+                stamp_rev = crop_stamp_rev(img)
 
             if stamp_28.size == 0 or stamp_rev.size == 0:
                 print("WARNING: Empty crop detected →", pdf_file)
@@ -105,6 +106,8 @@ def run_image_pipeline(PDF_FOLDER, OUTPUT_DIR):
         except Exception as e:
             print(f"ERROR processing {pdf_file}: {e}")
 
+    release_page()
+
     print("\nIMAGE PIPELINE COMPLETE")
 
     return OUTPUT_DIR
\ No newline at end of file
@@ -1,50 +1,473 @@
-from sqlalchemy import create_engine
-from pathlib import Path
+from sqlalchemy import text
+import re
 import pandas as pd
 
+from db import DB_PATH, read_engine
+
 
 # ==========================================================
 # SQLITE CONFIG (LOCAL DB)
 # ==========================================================
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "metadata.db"
-
 TABLE = "validation_file"
+ERRORS_TABLE = "validation_errors"
+FTS_TABLE = "validation_fts"
+FUZZY_TABLE = "validation_fuzzy"
 
-engine = create_engine(f"sqlite:///{DB_PATH}")
+# read-only pooled connections (see db.py)
+engine = read_engine()
 
 
 # ==========================================================
-# SQL INJECTION PROTECTION (UNCHANGED)
+# SEARCHABLE COLUMNS
 # ==========================================================
-FORBIDDEN_SQL = [";", "--", "DROP", "DELETE", "INSERT", "UPDATE"]
+VALID_COLUMNS = [
+    "Image",
+    "LEVERANTOR_1","LEVERANTOR_2",
+    "SKAPAD_AV","GRANSKAD_AV","GODKAND_AV",
+    "DATUM",
+    "AVDELNING","UPPDRAGSNUMMER","LEVERANS_ANDRINGS_PM",
+    "KONSTRUKTIONSNUMMER",
+    "TITLE",
+    "BESKRIVNING_ROW_1","BESKRIVNING_ROW_2",
+    "BESKRIVNING_ROW_3","BESKRIVNING_ROW_4",
+    "SKALA","FORMAT",
+    "RITNINGSNUMMER_FORVALTNING","RITNINGSNUMMER_PROJEKT",
+    "TEKNIKOMRADE",
+    "GRANSKNINGSSTATUS_SYFTE","HANDLINGSTYP","ANLAGGNINGSTYP",
+    "KILOMETER_METER",
+    "BANDEL","BLAD","NASTA_BLAD",
+    "ANDR",
+    "FINAL_REV"
+]
+
+# free text → FTS5 (word / prefix search); the rest get a B-tree index
+FTS_COLUMNS = [
+    "TITLE",
+    "BESKRIVNING_ROW_1","BESKRIVNING_ROW_2",
+    "BESKRIVNING_ROW_3","BESKRIVNING_ROW_4",
+]
+
+INDEXED_COLUMNS = [c for c in VALID_COLUMNS if c not in FTS_COLUMNS]
+
+# OCR-noisy fields → trigram index (fuzzy search, ranked by similarity)
+FUZZY_COLUMNS = [
+    "RITNINGSNUMMER_PROJEKT","RITNINGSNUMMER_FORVALTNING",
+    "SKAPAD_AV","GRANSKAD_AV","GODKAND_AV",
+    "TITLE",
+]
+
+# characters the OCR mixes up are folded to one form, in the index (see
+# pipeline_sql) and in the query, so "B8P05-1O" finds "BBP05-10";
+# separators and Swedish diacritics are dropped the same way
+CONFUSABLES = {
+    "O": "0", "o": "0", "Q": "0", "q": "0", "Ö": "0", "ö": "0",
+    "I": "1", "i": "1", "l": "1", "L": "1", "|": "1",
+    "S": "5", "s": "5",
+    "B": "8", "b": "8",
+    "Z": "2", "z": "2",
+    "Ä": "a", "ä": "a", "Å": "a", "å": "a", "É": "e", "é": "e",
+    " ": "", ".": "", ",": "", "-": "", "_": "", "/": "",
+}
+
+CONFUSABLE_TABLE = str.maketrans(CONFUSABLES)
+
+# edits (after folding) a fuzzy hit may differ by, and the number of
+# candidate rows scored per query
+FUZZY_EDITS = 2
+FUZZY_CANDIDATES = 5000
+MIN_SIMILARITY = 0.3
+
+COMPARE_OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+
+OPERATORS = COMPARE_OPERATORS + ("starts_with", "contains", "match", "has_error")
 
-def is_safe_clause(clause: str) -> bool:
-    clause_upper = clause.upper()
-    return not any(token in clause_upper for token in FORBIDDEN_SQL)
+# upper bound for a prefix range scan (col >= v AND col < v + MAX_CHAR)
+MAX_CHAR = "\U0010FFFF"
+
+# pages are ordered by the document key (see pipeline_sql); tables loaded
+# before the keyed schema fall back to rowid. On the keyed table rowid is
+# its id INTEGER PRIMARY KEY, the id the FTS / trigram indexes store.
+PAGE_KEY = "DOC_KEY"
+PAGE_SIZE = 50
+
+
+# ==========================================================
+# QUERY BUILDER (BOUND PARAMETERS ONLY)
+# ==========================================================
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def fts_query(column: str, value: str) -> str:
+
+    # every word must match, each as a prefix: "VÄST"* "PLAN"*
+    words = re.findall(r"\w+", value or "")
+
+    if not words:
+        raise ValueError("Text search needs at least one word")
+
+    phrase = " ".join(f'"{w}"*' for w in words)
+
+    return f"{column} : ({phrase})"
+
+def build_filter(column: str, op: str, value, idx: int):
+
+    # returns (sql condition, params) for one (column, operator, value)
+    if column not in VALID_COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator: {op}")
+
+    p = f"p{idx}"
+    col = quote_ident(column)
+
+    if op in COMPARE_OPERATORS:
+        return f"{col} {op} :{p}", {p: value}
+
+    if op == "starts_with":
+        # range scan, so the B-tree index is used (LIKE 'x%' would not be)
+        return f"{col} >= :{p} AND {col} < :{p}_hi", {p: value, f"{p}_hi": f"{value}{MAX_CHAR}"}
+
+    if op == "contains":
+        escaped = str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"{col} LIKE :{p} ESCAPE '\\'", {p: f"%{escaped}%"}
+
+    if op == "match":
+        if column not in FTS_COLUMNS:
+            raise ValueError(f"Text search is only available for: {', '.join(FTS_COLUMNS)}")
+        return (
+            f"rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :{p})",
+            {p: fts_query(column, value)}
+        )
+
+    # has_error: drawings whose <column> failed master validation
+    return (
+        f'Image IN (SELECT document FROM {ERRORS_TABLE} WHERE "column" = :{p})',
+        {p: column}
+    )
+
+def build_where(filters):
+
+    conditions = []
+    params = {}
+
+    for idx, (column, op, value) in enumerate(filters):
+        cond, p = build_filter(column, op, value, idx)
+        conditions.append(cond)
+        params.update(p)
+
+    where = " AND ".join(conditions) if conditions else "1=1"
+
+    return where, params
+
+def build_query(filters, columns, limit):
+
+    where, params = build_where(filters)
+    select = ", ".join(quote_ident(c) for c in columns)
+
+    params["limit"] = int(limit)
+
+    return f"SELECT {select} FROM {TABLE} WHERE {where} LIMIT :limit", params
+
+def build_page_query(filters, columns, key, after, limit):
+
+    # keyset: continue after the last key of the previous page, so every
+    # page is an index seek (OFFSET would scan all skipped rows)
+    where, params = build_where(filters)
+    select = ", ".join(quote_ident(c) for c in columns)
+
+    if after is not None:
+        where = f"({where}) AND {key} > :after"
+        params["after"] = after
+
+    params["limit"] = int(limit)
+
+    return (
+        f"SELECT {key} AS page_key, {select} FROM {TABLE} "
+        f"WHERE {where} ORDER BY {key} LIMIT :limit"
+    ), params
+
+def build_count_query(filters):
+
+    where, params = build_where(filters)
+
+    return f"SELECT COUNT(*) FROM {TABLE} WHERE {where}", params
 
 
 # ==========================================================
 # MAIN SEARCH FUNCTION
 # ==========================================================
-def run_search_pipeline(where_clause: str = "", top_n: int = 50) -> pd.DataFrame:
+def table_columns(conn, table=TABLE):
+    return [row[1] for row in conn.execute(text(f"PRAGMA table_info({quote_ident(table)})"))]
+
+def search(filters=(), top_n: int = 50, bind=None) -> pd.DataFrame:
+
+    # filters: [(column, operator, value), ...] combined with AND
+    if bind is None and not DB_PATH.exists():
+        return pd.DataFrame()
+
+    bind = bind or engine
+
+    try:
+        with bind.connect() as conn:
+
+            existing = table_columns(conn)
+
+            if not existing:
+                return pd.DataFrame()
+
+            columns = [c for c in VALID_COLUMNS if c in existing]
 
-    where_clause = (where_clause or "").strip()
+            sql, params = build_query(filters, columns, top_n)
 
-    if where_clause and not is_safe_clause(where_clause):
-        print("Unsafe SQL blocked")
+            return pd.read_sql(text(sql), conn, params=params)
+
+    except ValueError:
+        raise
+
+    except Exception as e:
+        print("SQL ERROR:", e)
         return pd.DataFrame()
 
+
+# ==========================================================
+# PAGINATED SEARCH
+# ==========================================================
+def page_key(existing):
+    return PAGE_KEY if PAGE_KEY in existing else "rowid"
+
+def search_page(filters=(), after=None, page_size: int = PAGE_SIZE, bind=None):
+
+    # returns (page DataFrame, cursor for the next page or None on the last
+    # page); pass the cursor back as `after`
+    if bind is None and not DB_PATH.exists():
+        return pd.DataFrame(), None
+
+    bind = bind or engine
+
+    try:
+        with bind.connect() as conn:
+
+            existing = table_columns(conn)
+
+            if not existing:
+                return pd.DataFrame(), None
+
+            columns = [c for c in VALID_COLUMNS if c in existing]
+
+            # one extra row tells whether there is a next page
+            sql, params = build_page_query(filters, columns, page_key(existing), after, page_size + 1)
+
+            df = pd.read_sql(text(sql), conn, params=params)
+
+    except ValueError:
+        raise
+
+    except Exception as e:
+        print("SQL ERROR:", e)
+        return pd.DataFrame(), None
+
+    cursor = None
+
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        cursor = df["page_key"].iloc[-1]
+        cursor = cursor.item() if hasattr(cursor, "item") else cursor
+
+    return df.drop(columns="page_key"), cursor
+
+def count_matches(filters=(), bind=None) -> int:
+
+    if bind is None and not DB_PATH.exists():
+        return 0
+
+    bind = bind or engine
+
+    try:
+        with bind.connect() as conn:
+
+            if not table_columns(conn):
+                return 0
+
+            sql, params = build_count_query(filters)
+
+            return conn.execute(text(sql), params).scalar()
+
+    except ValueError:
+        raise
+
+    except Exception as e:
+        print("SQL ERROR:", e)
+        return 0
+
+
+# ==========================================================
+# FUZZY SEARCH (TRIGRAMS)
+# ==========================================================
+def ocr_normalize(value) -> str:
+    return str(value).translate(CONFUSABLE_TABLE).casefold()
+
+def trigrams(value) -> set:
+    s = ocr_normalize(value)
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def query_pieces(value: str) -> list:
+
+    # pigeonhole filter: a value within k edits of the query still contains
+    # at least one of k+1 disjoint pieces of it unchanged, and a piece is a
+    # cheap substring lookup in the trigram index
+    norm = ocr_normalize(value)
+
+    if len(norm) < 3:
+        raise ValueError("Fuzzy search needs at least 3 characters")
+
+    n = min(FUZZY_EDITS, len(norm) // 3 - 1) + 1
+    size = len(norm) // n
+
+    return [norm[i * size:(i + 1) * size] for i in range(n - 1)] + [norm[(n - 1) * size:]]
+
+def fuzzy_query(column: str, pieces) -> str:
+    phrase = " OR ".join('"' + p.replace('"', '""') + '"' for p in pieces)
+    return f"{column} : ({phrase})"
+
+def similarity(query_grams: set, value) -> float:
+
+    # Jaccard similarity of the trigram sets
+    grams = trigrams(value)
+
+    if not grams:
+        return 0.0
+
+    return len(query_grams & grams) / len(query_grams | grams)
+
+def fuzzy_search(column: str, value: str, filters=(), top_n: int = 50, bind=None) -> pd.DataFrame:
+
+    # best matches for `value` in `column`, most similar first, with a
+    # SIMILARITY column (0-1); other filters are ANDed as in search()
+    if column not in FUZZY_COLUMNS:
+        raise ValueError(f"Fuzzy search is only available for: {', '.join(FUZZY_COLUMNS)}")
+
+    pieces = query_pieces(value or "")
+    query_grams = trigrams(value)
+
+    if bind is None and not DB_PATH.exists():
+        return pd.DataFrame()
+
+    bind = bind or engine
+
+    try:
+        with bind.connect() as conn:
+
+            existing = table_columns(conn)
+
+            if not existing:
+                return pd.DataFrame()
+
+            where, params = build_where(filters)
+            params.update({"fuzzy": fuzzy_query(column, pieces), "candidates": FUZZY_CANDIDATES})
+
+            # filtered rows (row_id, value) joined with the FTS hits (id, rank);
+            # each side is a single-table query, so the filters' bare column
+            # names and rowid resolve as in search()
+            matched = f"""
+                FROM (SELECT rowid AS row_id, {quote_ident(column)} AS value FROM {TABLE} WHERE {where}) AS v
+                JOIN (SELECT rowid AS fuzzy_id, rank AS fuzzy_rank FROM {FUZZY_TABLE} WHERE {FUZZY_TABLE} MATCH :fuzzy) AS hits
+                ON hits.fuzzy_id = v.row_id
+            """
+
+            # 1a. few distinct matching values (names, codes): score them all,
+            # the result is exact however many rows share them
+            values = [v for (v,) in conn.execute(
+                text(f"SELECT DISTINCT v.value {matched} LIMIT :candidates + 1"), params
+            )]
+
+            if len(values) <= FUZZY_CANDIDATES:
+
+                scores = {v: similarity(query_grams, v) for v in values if v is not None}
+                top = sorted((v for v in scores if scores[v] >= MIN_SIMILARITY), key=lambda v: -scores[v])[:top_n]
+
+                # the first top_n rows in similarity order (common values
+                # can have thousands of rows)
+                marks = ",".join(f":v{i}" for i in range(len(top)))
+                order = " ".join(f"WHEN :v{i} THEN {i}" for i in range(len(top)))
+
+                candidates = conn.execute(text(f"""
+                    SELECT v.row_id, v.value {matched}
+                    WHERE v.value IN ({marks})
+                    ORDER BY CASE v.value {order} END, v.row_id
+                    LIMIT :top_n
+                """), {**params, "top_n": top_n, **{f"v{i}": v for i, v in enumerate(top)}}).fetchall() if top else []
+
+            # 1b. many distinct values (drawing numbers): best FTS rank first,
+            # so rows sharing more (and rarer) pieces come before rows that
+            # only share a common prefix like "BBP05-"
+            else:
+
+                candidates = conn.execute(
+                    text(f"SELECT v.row_id, v.value {matched} ORDER BY hits.fuzzy_rank LIMIT :candidates"),
+                    params
+                ).fetchall()
+
+                print(f"FUZZY: {len(values) - 1}+ distinct values, scoring the {len(candidates)} best-ranked rows")
+
+                scores = {v: similarity(query_grams, v) for _, v in candidates if v is not None}
+
+            # 2. best rows by similarity of their value
+            best = sorted(
+                ((scores[v], rowid) for rowid, v in candidates if scores.get(v, 0.0) >= MIN_SIMILARITY),
+                key=lambda t: (-t[0], t[1])
+            )[:top_n]
+
+            if not best:
+                return pd.DataFrame()
+
+            # 3. full rows for the top hits only
+            columns = [c for c in VALID_COLUMNS if c in existing]
+            select = ", ".join(quote_ident(c) for c in columns)
+            marks = ",".join(f":r{i}" for i in range(len(best)))
+
+            df = pd.read_sql(
+                text(f"SELECT rowid AS row_id, {select} FROM {TABLE} WHERE rowid IN ({marks})"),
+                conn, params={f"r{i}": rowid for i, (_, rowid) in enumerate(best)}
+            )
+
+    except ValueError:
+        raise
+
+    except Exception as e:
+        print("SQL ERROR:", e)
+        return pd.DataFrame()
+
+    rank = {rowid: (i, score) for i, (score, rowid) in enumerate(best)}
+
+    df["SIMILARITY"] = [round(rank[r][1], 3) for r in df["row_id"]]
+    df = df.iloc[sorted(range(len(df)), key=lambda i: rank[df["row_id"].iat[i]][0])]
+
+    return df.drop(columns="row_id").reset_index(drop=True)
+
+# ==========================================================
+# VALIDATION ERRORS
+# ==========================================================
+def errors_by_document(documents, bind=None) -> pd.DataFrame:
+
+    bind = bind or engine
+    documents = list(documents)
+
+    if not documents or (bind is engine and not DB_PATH.exists()):
+        return pd.DataFrame(columns=["document", "errors"])
+
     try:
+        marks = ",".join(f":d{i}" for i in range(len(documents)))
 
-        if where_clause:
-            sql = f"SELECT * FROM {TABLE} WHERE {where_clause} LIMIT {top_n}"
-        else:
-            sql = f"SELECT * FROM {TABLE} LIMIT {top_n}"
+        sql = text(f"""
+            SELECT document, GROUP_CONCAT("column" || ' (' || rule || ')', ', ') AS errors
+            FROM {ERRORS_TABLE}
+            WHERE document IN ({marks})
+            GROUP BY document
+        """)
 
-        df = pd.read_sql(sql, engine)
-        return df
+        return pd.read_sql(sql, bind, params={f"d{i}": d for i, d in enumerate(documents)})
 
     except Exception as e:
         print("SQL ERROR:", e)
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame(columns=["document", "errors"])
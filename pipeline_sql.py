@@ -1,37 +1,362 @@
-from sqlalchemy import create_engine
-from pathlib import Path
+from sqlalchemy import text
 import pandas as pd
 
+from db import get_engine
+
+from pipeline_search import (
+    VALID_COLUMNS, INDEXED_COLUMNS, FTS_COLUMNS, FTS_TABLE, FUZZY_COLUMNS, FUZZY_TABLE,
+    ocr_normalize, quote_ident, table_columns
+)
+
 
 # ==========================================================
 # SQLITE CONFIG (LOCAL DB)
 # ==========================================================
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "metadata.db"
-
 TABLE = "validation_file"
+ERRORS_TABLE = "validation_errors"
+
+# shared pooled engine, WAL + tuned pragmas on connect (see db.py)
+engine = get_engine()
+
+
+# ==========================================================
+# DECLARED SCHEMA
+# ==========================================================
+# One row per drawing, keyed by DOC_KEY (Image without "_stamp.png", the
+# same key step6 joins on). Every field is TEXT; a label the model learns
+# later is added as an extra TEXT column instead of rebuilding the table.
+#
+# The explicit id INTEGER PRIMARY KEY is the rowid the FTS and trigram
+# indexes point at: unlike an implicit rowid it is never renumbered by
+# VACUUM.
+KEY = "DOC_KEY"
+ROW_ID = "id"
+
+SCHEMA_COLUMNS = VALID_COLUMNS + ["BLAD_STATUS", "REV_STATUS"]
+
+def doc_key(image: pd.Series) -> pd.Series:
+    return image.fillna("").astype(str).str.replace("_stamp.png", "", regex=False).str.strip()
+
+def create_table_sql(table=TABLE):
+
+    cols = ",\n    ".join(f"{quote_ident(c)} TEXT" for c in SCHEMA_COLUMNS)
+
+    return f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    {ROW_ID} INTEGER PRIMARY KEY,
+    {KEY} TEXT NOT NULL UNIQUE,
+    {cols}
+)"""
+
+ERRORS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {ERRORS_TABLE} (
+    document TEXT NOT NULL,
+    "column" TEXT NOT NULL,
+    rule     TEXT NOT NULL
+)"""
+
+
+# ==========================================================
+# SCHEMA SETUP / LEGACY MIGRATION
+# ==========================================================
+def ensure_schema(conn):
+
+    existing = table_columns(conn)
+
+    # tables written by the old to_sql(if_exists="replace") have no key,
+    # earlier keyed tables no explicit id: copy their rows into the
+    # declared table once
+    if existing and (KEY not in existing or ROW_ID not in existing):
+        migrate_legacy_table(conn, existing)
+    else:
+        conn.execute(text(create_table_sql()))
+
+    conn.execute(text(ERRORS_SCHEMA))
+
+def migrate_legacy_table(conn, legacy_cols):
+
+    legacy = f"{TABLE}_legacy"
+
+    print(f"Migrating legacy table '{TABLE}' to the keyed schema")
+
+    # the search indexes are rebuilt against the new ids afterwards
+    for trigger in ("fts_insert", "fts_delete", "fts_update"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {TABLE}_{trigger}"))
+
+    conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {FUZZY_TABLE}"))
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    conn.execute(text(create_table_sql()))
+
+    legacy_cols = [c for c in legacy_cols if c not in (KEY, ROW_ID)]
+
+    extra = [c for c in legacy_cols if c not in SCHEMA_COLUMNS]
+    for col in extra:
+        conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN {quote_ident(col)} TEXT"))
+
+    cols = ", ".join(quote_ident(c) for c in legacy_cols)
+    key = KEY if KEY in table_columns(conn, legacy) else "TRIM(REPLACE(COALESCE(Image, ''), '_stamp.png', ''))"
+
+    # later rows win, like the upsert
+    conn.execute(text(f"""
+        INSERT OR REPLACE INTO {TABLE} ({KEY}, {cols})
+        SELECT {key}, {cols}
+        FROM {legacy}
+        ORDER BY rowid
+    """))
+
+    conn.execute(text(f"DROP TABLE {legacy}"))
+
+def add_missing_columns(conn, columns):
+
+    existing = set(table_columns(conn))
+
+    for col in columns:
+        if col not in existing:
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN {quote_ident(col)} TEXT"))
+
+
+# ==========================================================
+# SEARCH INDEXES (B-TREE + FTS5 + TRIGRAM)
+# ==========================================================
+def create_search_indexes(conn):
+
+    existing = set(table_columns(conn))
+
+    # equality / prefix filters of the Search page
+    for col in INDEXED_COLUMNS:
+        if col in existing:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {quote_ident('idx_' + TABLE + '_' + col)} "
+                f"ON {TABLE} ({quote_ident(col)})"
+            ))
+
+    # word / prefix search over the free-text fields (external content on
+    # ROW_ID, kept in sync by triggers; built once when the index is created)
+    fts_cols = [c for c in FTS_COLUMNS if c in existing]
+
+    if fts_cols:
+        create_fts_index(conn, fts_cols)
+
+    fuzzy_cols = [c for c in FUZZY_COLUMNS if c in existing]
+
+    if fuzzy_cols:
+        create_fuzzy_index(conn, fuzzy_cols)
+
+def table_exists(conn, name):
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE name = :name"
+    ), {"name": name}).first() is not None
+
+def create_fts_index(conn, fts_cols):
+
+    created = not table_exists(conn, FTS_TABLE)
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{', '.join(fts_cols)}, content='{TABLE}', content_rowid='{ROW_ID}', "
+        f"tokenize='unicode61 remove_diacritics 2')"
+    ))
+
+    cols     = ", ".join(fts_cols)
+    new_vals = ", ".join(f"new.{c}" for c in fts_cols)
+    old_vals = ", ".join(f"old.{c}" for c in fts_cols)
+
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_fts_insert AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.{ROW_ID}, {new_vals});
+        END"""))
+
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_fts_delete AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.{ROW_ID}, {old_vals});
+        END"""))
+
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLE}_fts_update AFTER UPDATE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.{ROW_ID}, {old_vals});
+            INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.{ROW_ID}, {new_vals});
+        END"""))
+
+    if created:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+def create_fuzzy_index(conn, fuzzy_cols):
+
+    # trigram index over the OCR-folded values; its own copy (rowid = table
+    # ROW_ID), since the indexed text differs from the table. Filled once
+    # here, then per batch by refresh_fuzzy_index()
+    if table_exists(conn, FUZZY_TABLE):
+        return
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {FUZZY_TABLE} USING fts5("
+        f"{', '.join(fuzzy_cols)}, tokenize='trigram')"
+    ))
 
-engine = create_engine(f"sqlite:///{DB_PATH}")
+    rows = conn.exec_driver_sql(f"SELECT {ROW_ID}, {', '.join(fuzzy_cols)} FROM {TABLE}").fetchall()
+
+    insert_fuzzy_rows(conn, fuzzy_cols, rows)
+
+def insert_fuzzy_rows(conn, fuzzy_cols, rows):
+
+    if not rows:
+        return
+
+    marks = ", ".join("?" * (len(fuzzy_cols) + 1))
+
+    conn.exec_driver_sql(
+        f"INSERT INTO {FUZZY_TABLE}(rowid, {', '.join(fuzzy_cols)}) VALUES ({marks})",
+        [(r[0], *(None if v is None else ocr_normalize(v) for v in r[1:])) for r in rows]
+    )
+
+def refresh_fuzzy_index(conn, keys):
+
+    # re-index the documents of this batch
+    if not table_exists(conn, FUZZY_TABLE):
+        return
+
+    fuzzy_cols = [c for c in FUZZY_COLUMNS if c in set(table_columns(conn))]
+    rows = []
+
+    # stay well below SQLite's bound-parameter limit
+    for i in range(0, len(keys), 500):
+
+        chunk = tuple(keys[i:i + 500])
+        marks = ",".join("?" * len(chunk))
+
+        rows += conn.exec_driver_sql(
+            f"SELECT {ROW_ID}, {', '.join(fuzzy_cols)} FROM {TABLE} WHERE {KEY} IN ({marks})", chunk
+        ).fetchall()
+
+    if rows:
+        conn.exec_driver_sql(f"DELETE FROM {FUZZY_TABLE} WHERE rowid = ?", [(r[0],) for r in rows])
+
+    insert_fuzzy_rows(conn, fuzzy_cols, rows)
 
 
 # ==========================================================
-# UPDATE TABLE
+# UPDATE TABLE (UPSERT BY DOC_KEY)
 # ==========================================================
-def update_sql_table(df: pd.DataFrame):
+def upsert_sql(columns):
+
+    cols = ", ".join(quote_ident(c) for c in [KEY] + columns)
+    marks = ", ".join("?" * (len(columns) + 1))
+    updates = ", ".join(f"{quote_ident(c)} = excluded.{quote_ident(c)}" for c in columns)
 
+    return (
+        f"INSERT INTO {TABLE} ({cols}) VALUES ({marks}) "
+        f"ON CONFLICT({KEY}) DO UPDATE SET {updates}"
+    )
+
+def write_validation_rows(conn, df: pd.DataFrame):
+
+    # upsert of the validation rows on an open transaction
     if df is None or df.empty:
         raise ValueError("DataFrame is empty. SQL update aborted.")
 
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df = df.drop(columns=[KEY], errors="ignore")
+
+    columns = list(df.columns)
+
+    # None for missing values, everything else as text
+    values = df.astype(object).where(df.notna(), None)
+    values = values.apply(lambda s: s.map(lambda v: v if v is None else str(v)))
+    values.insert(0, KEY, doc_key(df["Image"]))
+
+    rows = list(values.itertuples(index=False, name=None))
+
+    ensure_schema(conn)
+    add_missing_columns(conn, columns)
+    create_search_indexes(conn)
+
+    conn.exec_driver_sql(upsert_sql(columns), rows)
+
+    refresh_fuzzy_index(conn, list(pd.unique(values[KEY])))
+
+    return len(rows)
+
+def update_sql_table(df: pd.DataFrame, bind=None):
+
+    bind = bind or engine
+
     try:
-        df.to_sql(
-            TABLE,
-            engine,
-            if_exists="replace",
-            index=False
+        with bind.begin() as conn:
+            n_rows = write_validation_rows(conn, df)
+
+        print(f"SQLite table '{TABLE}' upserted {n_rows} documents.")
+
+    except Exception as e:
+        print("SQLite update failed:", e)
+        raise e
+
+
+# ==========================================================
+# VALIDATION ERRORS (ONE ROW PER FAILING CELL)
+# ==========================================================
+ERRORS_INDEXES = [
+    f'CREATE INDEX IF NOT EXISTS idx_{ERRORS_TABLE}_column_rule ON {ERRORS_TABLE} ("column", rule, document)',
+    f'CREATE INDEX IF NOT EXISTS idx_{ERRORS_TABLE}_document ON {ERRORS_TABLE} (document)',
+]
+
+def write_errors(conn, errors: pd.DataFrame, documents):
+
+    # replaces the errors of the documents in this batch on an open
+    # transaction; documents without errors simply end up with none
+    if errors is None:
+        raise ValueError("Errors DataFrame is missing. SQL update aborted.")
+
+    errors = errors[["document", "column", "rule"]].astype(str)
+    documents = [(d,) for d in pd.unique(pd.Series(list(documents), dtype=object).astype(str))]
+
+    conn.execute(text(ERRORS_SCHEMA))
+
+    for ddl in ERRORS_INDEXES:
+        conn.execute(text(ddl))
+
+    if documents:
+        conn.exec_driver_sql(f"DELETE FROM {ERRORS_TABLE} WHERE document = ?", documents)
+
+    if len(errors):
+        conn.exec_driver_sql(
+            f'INSERT INTO {ERRORS_TABLE} (document, "column", rule) VALUES (?, ?, ?)',
+            list(errors.itertuples(index=False, name=None))
         )
 
-        print(f"SQLite table '{TABLE}' updated successfully.")
+    return len(errors)
+
+def update_errors_table(errors: pd.DataFrame, documents, bind=None):
+
+    bind = bind or engine
+
+    try:
+        with bind.begin() as conn:
+            n_errors = write_errors(conn, errors, documents)
+
+        print(f"SQLite table '{ERRORS_TABLE}' updated successfully ({n_errors} rows).")
+
+    except Exception as e:
+        print("SQLite update failed:", e)
+        raise e
+
+# ==========================================================
+# VALIDATION ROWS + ERRORS (ONE TRANSACTION)
+# ==========================================================
+def update_validation_tables(df: pd.DataFrame, errors: pd.DataFrame, bind=None):
+
+    # the pipeline's load: rows and their errors commit together, so a
+    # failure can't leave updated rows with the previous run's errors
+    bind = bind or engine
+
+    try:
+        with bind.begin() as conn:
+            n_rows = write_validation_rows(conn, df)
+            n_errors = write_errors(conn, errors, documents=df["Image"])
+
+        print(f"SQLite tables '{TABLE}' / '{ERRORS_TABLE}' updated: {n_rows} documents, {n_errors} errors.")
 
     except Exception as e:
         print("SQLite update failed:", e)
-        raise e
\ No newline at end of file
+        raise e
@@ -1,13 +1,25 @@
+import os
 import subprocess
 import sys
+from functools import partial
 from pathlib import Path
 import pandas as pd
 
+from handoff import (
+    handoff_path, read_frame, write_frame,
+    RAW_EXTRACTION, CLEANING_FILE, REVISION_EXTRACTION, RAW_VALIDATED, VALIDATION_FILE, VALIDATION_ERRORS
+)
+from checkpoint import (
+    load_manifest, stage_done, mark_stage, complete_manifest, checkpoint_path, drop_rows, RESUME_RUN
+)
+from metrics import span
+import metrics
+
 
 # ==========================================================
 # RUN EXTERNAL SCRIPT SAFELY (FORCE WORKING DIRECTORY)
 # ==========================================================
-def run_script(script_path: Path, project_dir: Path):
+def run_script(script_path: Path, project_dir: Path, env=None):
 
     if not script_path.exists():
         raise FileNotFoundError(f"Script not found: {script_path}")
@@ -15,22 +27,126 @@ def run_script(script_path: Path, project_dir: Path):
     subprocess.run(
         [sys.executable, str(script_path)],
         check=True,
-        cwd=str(project_dir)
+        cwd=str(project_dir),
+        env=env
     )
 
 
 # ==========================================================
-# MAIN FULL VALIDATION PIPELINE
+# STEP 6 OUTPUT CHECK
 # ==========================================================
-def run_full_validation_pipeline(PROJECT_DIR: Path, auto_clean=False):
+def check_raw_validated(PROJECT_DIR: Path):
 
-    # 🔥 import moved here (break circular import)
-    from pipeline_sql import update_sql_table
+    RAW_VALIDATED_FILE = handoff_path(RAW_VALIDATED, PROJECT_DIR / "intermediate")
 
-    PROJECT_DIR = PROJECT_DIR.resolve()
+    if not RAW_VALIDATED_FILE.exists():
+        raise FileNotFoundError(
+            f"Step 6 failed. File not created: {RAW_VALIDATED_FILE}"
+        )
 
-    print("\nFULL VALIDATION PIPELINE STARTED")
-    print("PROJECT_DIR:", PROJECT_DIR)
+
+# ==========================================================
+# RESUME HELPERS
+# ==========================================================
+def list_pdfs(PROJECT_DIR: Path):
+    return sorted(f for f in os.listdir(PROJECT_DIR / "pdf_input") if f.lower().endswith(".pdf"))
+
+def no_progress(stage, done, total):
+    pass
+
+def skip_stage(manifest, stage, output: Path, resume):
+
+    # whole-table stages are skipped only if their output is still there
+    if resume and stage_done(manifest, stage) and output.exists():
+        print(f"RESUME: skipping {stage} (already done)")
+        return True
+
+    return False
+
+def invalidate_documents(PROJECT_DIR: Path, changed):
+
+    # PDFs replaced under the same name since the interrupted run: remove
+    # their stamp / revision images and checkpoint rows so resume redoes them
+    HANDOFF_DIR = PROJECT_DIR / "intermediate"
+
+    for f in changed:
+        stem = Path(f).stem
+        (PROJECT_DIR / "images_stamp" / f"{stem}_stamp.png").unlink(missing_ok=True)
+        (PROJECT_DIR / "rev_crops" / f"{stem}_p001.png").unlink(missing_ok=True)
+
+    stems = [Path(f).stem for f in changed]
+
+    drop_rows(checkpoint_path(handoff_path(RAW_EXTRACTION, HANDOFF_DIR)), "Image", [f"{s}_stamp.png" for s in stems])
+    drop_rows(checkpoint_path(handoff_path(REVISION_EXTRACTION, HANDOFF_DIR)), "FILE", [f"{s}_p001.png" for s in stems])
+
+
+# ==========================================================
+# STEP 1 + STEP 4: ONE RENDER PER DOCUMENT
+# ==========================================================
+def render_documents(PDF_FOLDER: Path, STAMP_DIR: Path, REV_DIR: Path, pdf_files, clip_gray=False, resume=False, progress=no_progress):
+
+    # the stamp and the revision page are cut from the same full-page render
+    # before the next PDF is opened, so a page is rasterized once no matter
+    # how large the batch (render_cache keeps only the current page)
+    import step1_pdf_2_image
+    import step4_pdf_2_img
+    from render_cache import release_page
+
+    STAMP_DIR.mkdir(parents=True, exist_ok=True)
+    REV_DIR.mkdir(parents=True, exist_ok=True)
+
+    total = len(pdf_files)
+
+    for i, pdf_file in enumerate(pdf_files):
+
+        progress("step1", i, total)
+        progress("step4", i, total)
+
+        pdf_path = PDF_FOLDER / pdf_file
+        stem = Path(pdf_file).stem
+
+        outputs = [
+            (STAMP_DIR / f"{stem}_stamp.png", step1_pdf_2_image.save_stamp),
+            (REV_DIR / f"{stem}_p001.png", step4_pdf_2_img.save_rev_page),
+        ]
+
+        print(f"Processing: {pdf_file}")
+
+        for out_path, save in outputs:
+
+            # resume: images are written atomically, so an existing one is complete
+            if resume and out_path.exists():
+                continue
+
+            try:
+                save(pdf_path, out_path, clip_gray=clip_gray)
+            except Exception as e:
+                print(f"ERROR processing {pdf_file}: {e}")
+
+    release_page()
+
+    progress("step1", total, total)
+    progress("step4", total, total)
+
+
+# ==========================================================
+# RUN EACH STEP AS A SEPARATE PYTHON PROCESS (LEGACY MODE)
+# ==========================================================
+def run_steps_as_subprocesses(PROJECT_DIR: Path, clip_gray=False, workers=1, resume=False, progress=no_progress):
+
+    HANDOFF_DIR = PROJECT_DIR / "intermediate"
+
+    manifest, resume, changed = load_manifest(HANDOFF_DIR, list_pdfs(PROJECT_DIR), PROJECT_DIR / "pdf_input", resume)
+    invalidate_documents(PROJECT_DIR, changed)
+
+    # step scripts read their render mode, worker count and resume flag
+    # from the environment
+    env = {
+        **os.environ,
+        "CLIP_GRAY_RENDER": "1" if clip_gray else "0",
+        "EXTRACT_WORKERS": str(workers),
+        "RESUME_RUN": "1" if resume else "0",
+    }
 
     # ------------------------------------------------------
     # Script Paths (UPDATED TO YOUR NEW STRUCTURE)
@@ -45,39 +161,304 @@ def run_full_validation_pipeline(PROJECT_DIR: Path, auto_clean=False):
 
     MASTER_VALIDATE_SCRIPT  = PROJECT_DIR / "step7_validate_against_master.py"
 
-    # Expected files (KEEP YOUR ORIGINAL OUTPUT STRUCTURE)
-    RAW_VALIDATED_FILE = PROJECT_DIR / "raw_validated.xlsx"
-    FINAL_EXCEL        = PROJECT_DIR / "validation_file.xlsx"
+    steps = [
+        ("step1", "Step 1: PDF → Stamp Images",         PDF_TO_STAMP_SCRIPT,     PROJECT_DIR / "images_stamp"),
+        ("step2", "Step 2: 28 Label Extraction",         EXTRACT_28_SCRIPT,       handoff_path(RAW_EXTRACTION, HANDOFF_DIR)),
+        ("step3", "Step 3: Cleaning",                    CLEAN_SCRIPT,            handoff_path(CLEANING_FILE, HANDOFF_DIR)),
+        ("step4", "Step 4: Convert PDFs for Revision",   PDF_TO_IMAGE_REV_SCRIPT, PROJECT_DIR / "rev_crops"),
+        ("step5", "Step 5: Revision Extraction",         REV_EXTRACT_SCRIPT,      handoff_path(REVISION_EXTRACTION, HANDOFF_DIR)),
+        ("step6", "Step 6: Compare Revision vs Main",    COMPARE_SCRIPT,          handoff_path(RAW_VALIDATED, HANDOFF_DIR)),
+        ("step7", "Step 7: Master Validation",           MASTER_VALIDATE_SCRIPT,  handoff_path(VALIDATION_FILE, HANDOFF_DIR)),
+    ]
 
-    try:
+    for stage, title, script, output in steps:
 
-        print("\nStep 1: PDF → Stamp Images")
-        run_script(PDF_TO_STAMP_SCRIPT, PROJECT_DIR)
+        print(f"\n{title}")
 
-        print("\nStep 2: 28 Label Extraction")
-        run_script(EXTRACT_28_SCRIPT, PROJECT_DIR)
+        # separate processes: progress per stage only
+        progress(stage, 0, 1)
+
+        if not skip_stage(manifest, stage, output, resume):
+            with span("stage", label=stage):
+                run_script(script, PROJECT_DIR, env)
+            mark_stage(HANDOFF_DIR, manifest, stage)
+
+        progress(stage, 1, 1)
+
+        if stage == "step6":
+            check_raw_validated(PROJECT_DIR)
+
+
+# ==========================================================
+# RUN ALL STEPS IN THIS PROCESS (MODELS STAY LOADED)
+# ==========================================================
+def run_steps_in_process(PROJECT_DIR: Path, clip_gray=False, incremental=True, workers=1, resume=False, progress=no_progress):
+
+    # Step modules are imported lazily and cached in sys.modules, so YOLO
+    # and the EasyOCR readers are loaded on the first run only.
+    import step2_extract
+    import step3_cleaning
+    import step5_andr_ext
+    import step6_comparerev
+    import step7_validate_against_master
+    import doc_catalog
+
+    PDF_FOLDER = PROJECT_DIR / "pdf_input"
+
+    STAMP_DIR  = PROJECT_DIR / "images_stamp"
+    REV_DIR    = PROJECT_DIR / "rev_crops"
+
+    # intermediate tables are Parquet hand-offs, not Excel files
+    HANDOFF_DIR   = PROJECT_DIR / "intermediate"
+    RAW_PATH      = handoff_path(RAW_EXTRACTION, HANDOFF_DIR)
+    CLEAN_PATH    = handoff_path(CLEANING_FILE, HANDOFF_DIR)
+    REV_PATH      = handoff_path(REVISION_EXTRACTION, HANDOFF_DIR)
+    VALIDATED_PATH = handoff_path(RAW_VALIDATED, HANDOFF_DIR)
+
+    pdf_files = list_pdfs(PROJECT_DIR)
+
+    # content hashes through the catalog's stat shortcut: unchanged files
+    # are not read again
+    hashes = None
 
-        print("\nStep 3: Cleaning")
-        run_script(CLEAN_SCRIPT, PROJECT_DIR)
+    if incremental:
+        catalog = doc_catalog.open_catalog(PROJECT_DIR / "doc_catalog.db")
+        hashes = {f: doc_catalog.hash_pdf(catalog, PDF_FOLDER / f) for f in pdf_files}
 
-        print("\nStep 4: Convert PDFs for Revision")
-        run_script(PDF_TO_IMAGE_REV_SCRIPT, PROJECT_DIR)
+    # resume: extraction stages continue from their checkpoint logs, whole
+    # stages already recorded in the run manifest are skipped
+    manifest, resume, changed = load_manifest(HANDOFF_DIR, pdf_files, PDF_FOLDER, resume, hashes=hashes)
+    invalidate_documents(PROJECT_DIR, changed)
+
+    # ------------------------------------------------------
+    # Which PDFs actually need extraction?
+    # ------------------------------------------------------
+    if incremental:
+        # outputs of another model / code version are misses
+        versions = {
+            doc_catalog.STAGE_EXTRACT:  doc_catalog.stage_version(step2_extract.CATALOG_VERSION, step2_extract.model_path),
+            doc_catalog.STAGE_REVISION: doc_catalog.stage_version(step5_andr_ext.CATALOG_VERSION),
+        }
+
+        cached_28  = doc_catalog.load_outputs(catalog, doc_catalog.STAGE_EXTRACT, hashes.values(), versions[doc_catalog.STAGE_EXTRACT])
+        cached_rev = doc_catalog.load_outputs(catalog, doc_catalog.STAGE_REVISION, hashes.values(), versions[doc_catalog.STAGE_REVISION])
+
+        todo = [
+            f for f in pdf_files
+            if hashes[f] not in cached_28 or hashes[f] not in cached_rev
+        ]
+
+        print(f"\nIncremental: {len(pdf_files) - len(todo)} unchanged, {len(todo)} to extract")
+    else:
+        todo = pdf_files
+
+    stems = {f: Path(f).stem for f in pdf_files}
+
+    rows_28 = []
+    rows_rev = []
+
+    if todo:
+        print("\nStep 1 + 4: PDF → Stamp and Revision Images")
+        with span("stage", label="step1", docs=len(todo)):
+            render_documents(
+                PDF_FOLDER, STAMP_DIR, REV_DIR, todo,
+                clip_gray=clip_gray,
+                resume=resume,
+                progress=progress
+            )
+        mark_stage(HANDOFF_DIR, manifest, "step1")
+        mark_stage(HANDOFF_DIR, manifest, "step4")
+
+        print("\nStep 2: 28 Label Extraction")
+        stamp_paths = [STAMP_DIR / f"{stems[f]}_stamp.png" for f in todo]
+        with span("stage", label="step2", docs=len(stamp_paths)):
+            rows_28 = step2_extract.process_folder(
+                image_dir=STAMP_DIR,
+                out_path=RAW_PATH,
+                image_paths=[p for p in stamp_paths if p.exists()],
+                workers=workers,
+                resume=resume,
+                on_progress=partial(progress, "step2"),
+                doc_hashes={f"{stems[f]}_stamp.png": hashes[f] for f in todo} if hashes else None
+            )
+        mark_stage(HANDOFF_DIR, manifest, "step2")
 
         print("\nStep 5: Revision Extraction")
-        run_script(REV_EXTRACT_SCRIPT, PROJECT_DIR)
+        rev_files = [f"{stems[f]}_p001.png" for f in todo]
+        with span("stage", label="step5", docs=len(rev_files)):
+            rows_rev = step5_andr_ext.process_folder(
+                image_dir=REV_DIR,
+                out_path=REV_PATH,
+                clip_gray=clip_gray,
+                image_files=[f for f in rev_files if (REV_DIR / f).exists()],
+                workers=workers,
+                resume=resume,
+                on_progress=partial(progress, "step5"),
+                doc_hashes={f"{stems[f]}_p001.png": hashes[f] for f in todo} if hashes else None
+            )
+        mark_stage(HANDOFF_DIR, manifest, "step5")
 
-        print("\nStep 6: Compare Revision vs Main")
-        run_script(COMPARE_SCRIPT, PROJECT_DIR)
+    else:
+        # everything came from the catalog
+        for stage in ("step1", "step2", "step4", "step5"):
+            progress(stage, 0, 0)
 
-        if not RAW_VALIDATED_FILE.exists():
-            raise FileNotFoundError(
-                f"Step 6 failed. File not created: {RAW_VALIDATED_FILE}"
+    # ------------------------------------------------------
+    # Merge fresh rows with cached ones (incremental mode)
+    # ------------------------------------------------------
+    if incremental:
+        merge_with_catalog(
+            catalog, pdf_files, hashes, stems,
+            rows_28, rows_rev, cached_28, cached_rev,
+            RAW_PATH, REV_PATH, versions
+        )
+        catalog.close()
+
+    print("\nStep 3: Cleaning")
+    progress("step3", 0, 1)
+    if not skip_stage(manifest, "step3", CLEAN_PATH, resume):
+        with span("stage", label="step3"):
+            step3_cleaning.main(
+                input_path=RAW_PATH,
+                output_path=CLEAN_PATH
+            )
+        mark_stage(HANDOFF_DIR, manifest, "step3")
+    progress("step3", 1, 1)
+
+    print("\nStep 6: Compare Revision vs Main")
+    progress("step6", 0, 1)
+    if not skip_stage(manifest, "step6", VALIDATED_PATH, resume):
+        with span("stage", label="step6"):
+            step6_comparerev.compare_revisions(
+                path_28=CLEAN_PATH,
+                path_rev=REV_PATH,
+                out_path=VALIDATED_PATH
             )
+        mark_stage(HANDOFF_DIR, manifest, "step6")
+    progress("step6", 1, 1)
+
+    check_raw_validated(PROJECT_DIR)
+
+    print("\nStep 7: Master Validation")
+    FINAL_HANDOFF = handoff_path(VALIDATION_FILE, HANDOFF_DIR)
+    progress("step7", 0, 1)
+    if not skip_stage(manifest, "step7", FINAL_HANDOFF, resume):
+        with span("stage", label="step7"):
+            step7_validate_against_master.validate_against_master(
+                data_file=VALIDATED_PATH,
+                master_file=PROJECT_DIR / "mastercopy_labels.xlsx",
+                output_file=PROJECT_DIR / "validation_file.xlsx",
+                output_handoff=FINAL_HANDOFF,
+                errors_handoff=handoff_path(VALIDATION_ERRORS, HANDOFF_DIR)
+            )
+        mark_stage(HANDOFF_DIR, manifest, "step7")
+    progress("step7", 1, 1)
+
+
+# ==========================================================
+# INCREMENTAL MERGE (CATALOG ROWS + FRESH ROWS)
+# ==========================================================
+def merge_with_catalog(catalog, pdf_files, hashes, stems,
+                       rows_28, rows_rev, cached_28, cached_rev,
+                       raw_path, rev_path, versions):
+
+    import doc_catalog
+    from step2_extract import autosave
+
+    fresh_28  = {row["Image"]: row for row in rows_28}
+    fresh_rev = {row["FILE"]: row for row in rows_rev}
+
+    pdf_names = {hashes[f]: f for f in pdf_files}
+
+    new_28 = {}
+    new_rev = {}
+
+    merged_28 = []
+    merged_rev = []
+
+    for f in pdf_files:
+
+        sha = hashes[f]
+        image_name = f"{stems[f]}_stamp.png"
+        rev_name   = f"{stems[f]}_p001.png"
+
+        if image_name in fresh_28:
+            row = fresh_28[image_name]
+            new_28[sha] = row
+        elif sha in cached_28:
+            # same content may have been uploaded under another name
+            row = {**cached_28[sha], "Image": image_name}
+        else:
+            row = None
+
+        if row is not None:
+            merged_28.append(row)
+
+        if rev_name in fresh_rev:
+            rev = fresh_rev[rev_name]
+            new_rev[sha] = rev
+        elif sha in cached_rev:
+            rev = {**cached_rev[sha], "FILE": rev_name}
+        else:
+            rev = None
+
+        if rev is not None:
+            merged_rev.append(rev)
+
+    doc_catalog.save_outputs(catalog, doc_catalog.STAGE_EXTRACT, new_28, pdf_names, versions[doc_catalog.STAGE_EXTRACT])
+    doc_catalog.save_outputs(catalog, doc_catalog.STAGE_REVISION, new_rev, pdf_names, versions[doc_catalog.STAGE_REVISION])
 
-        print("\nStep 7: Master Validation")
-        run_script(MASTER_VALIDATE_SCRIPT, PROJECT_DIR)
+    autosave(merged_28, raw_path)
+    write_frame(pd.DataFrame(merged_rev), rev_path)
 
-        if not FINAL_EXCEL.exists():
+    print(f"Merged {len(merged_28)} documents ({len(new_28)} newly extracted)")
+
+
+# ==========================================================
+# MAIN FULL VALIDATION PIPELINE
+# ==========================================================
+def run_full_validation_pipeline(PROJECT_DIR: Path, auto_clean=False, use_subprocess=False, clip_gray=None, incremental=True, workers=None, resume=None,
+                                 progress=no_progress, bind=None):
+
+    # progress(stage, done, total) is called as the run advances (see jobs.py);
+    # bind: engine for the SQLite load (default: the app's metadata.db)
+
+    # 🔥 import moved here (break circular import)
+    from pipeline_sql import update_validation_tables
+    from db import delete_database
+    from render_cache import CLIP_GRAY_RENDER
+    from worker_pool import EXTRACT_WORKERS
+
+    if clip_gray is None:
+        clip_gray = CLIP_GRAY_RENDER
+
+    if workers is None:
+        workers = EXTRACT_WORKERS
+
+    if resume is None:
+        resume = RESUME_RUN
+
+    PROJECT_DIR = PROJECT_DIR.resolve()
+
+    print("\nFULL VALIDATION PIPELINE STARTED")
+    print("PROJECT_DIR:", PROJECT_DIR)
+
+    # PIPELINE_METRICS=1: timing spans of this run → intermediate/metrics.jsonl
+    if metrics.METRICS_ENABLED:
+        metrics.start_run(PROJECT_DIR / "intermediate" / "metrics.jsonl")
+
+    # Expected files (KEEP YOUR ORIGINAL OUTPUT STRUCTURE)
+    FINAL_EXCEL        = PROJECT_DIR / "validation_file.xlsx"
+    FINAL_HANDOFF      = handoff_path(VALIDATION_FILE, PROJECT_DIR / "intermediate")
+
+    try:
+
+        if use_subprocess:
+            run_steps_as_subprocesses(PROJECT_DIR, clip_gray=clip_gray, workers=workers, resume=resume, progress=progress)
+        else:
+            run_steps_in_process(PROJECT_DIR, clip_gray=clip_gray, incremental=incremental, workers=workers, resume=resume, progress=progress)
+
+        if not FINAL_EXCEL.exists() or not FINAL_HANDOFF.exists():
             raise FileNotFoundError(
                 f"Final validation file not created: {FINAL_EXCEL}"
             )
@@ -88,20 +469,32 @@ def run_full_validation_pipeline(PROJECT_DIR: Path, auto_clean=False):
         # --------------------------------------------------
         # Update SQLite
         # --------------------------------------------------
-        df = pd.read_excel(FINAL_EXCEL, dtype=str, keep_default_na=False)
-        update_sql_table(df)
+        progress("sql", 0, 1)
+
+        with span("stage", label="sql"):
+            df = read_frame(FINAL_HANDOFF)
+            errors = read_frame(handoff_path(VALIDATION_ERRORS, PROJECT_DIR / "intermediate"))
+
+            update_validation_tables(df, errors, bind=bind)
+
+        progress("sql", 1, 1)
 
         print("SQLite table updated successfully")
 
+        # finished: a later "resume" starts a fresh run
+        complete_manifest(PROJECT_DIR / "intermediate")
+
+        if metrics.METRICS_ENABLED:
+            metrics.report()
+
         # --------------------------------------------------
         # Optional cleanup
         # --------------------------------------------------
         if auto_clean:
             print("\nAUTO CLEANUP STARTED")
 
-            db_file = PROJECT_DIR / "metadata.db"
-            if db_file.exists():
-                db_file.unlink()
+            # closes the pooled connections first, then removes the WAL files too
+            delete_database(PROJECT_DIR / "metadata.db")
 
             print("Workspace Reset Complete")
 
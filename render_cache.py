@@ -0,0 +1,240 @@
+# SHARED PDF RENDER CACHE
+#
+# Every stage that needs page pixels (stamp crop, revision crop, stamp viewer)
+# goes through render_page(). Renders are keyed by
+# (PDF content hash, page, DPI, clip, colorspace) and handed out read-only,
+# so crops are zero-copy slices.
+#
+# Full pages (~200 MB for an A1 sheet at 300 DPI) are never written to disk:
+# the last one is kept in memory, and callers cut all their crops from it
+# before moving to the next document (pipeline_validation.render_documents,
+# pipeline_images). Clipped renders are small and are stored as raw .npy
+# buffers, memory-mapped on a hit.
+#
+# With clip + gray, PyMuPDF only produces the title-block pixels, in a single
+# 8-bit channel, instead of the whole A1 sheet in RGB.
+
+import os
+import shutil
+import hashlib
+import numpy as np
+import fitz
+from pathlib import Path
+
+# ==========================================================
+# BASE PATH (STREAMLIT SAFE)
+# ==========================================================
+BASE_DIR = Path(__file__).resolve().parent
+
+CACHE_DIR = BASE_DIR / "render_cache"
+
+DPI = 300
+
+# Clip-and-grayscale mode for the extraction steps (CLIP_GRAY_RENDER=1).
+# Read from the environment so the subprocess runner picks it up as well.
+CLIP_GRAY_RENDER = os.environ.get("CLIP_GRAY_RENDER", "0") == "1"
+
+# Size cap of the cache folder (clipped renders only): least recently used
+# renders are deleted once it is exceeded
+CACHE_MAX_BYTES = int(float(os.environ.get("RENDER_CACHE_MAX_GB", "10")) * 1024 ** 3)
+
+# ==========================================================
+# FRACTIONAL PAGE REGIONS (x0, y0, x1, y1)
+# ==========================================================
+STAMP_28_RECT  = (0.76, 0.88, 1.00, 0.97)
+STAMP_REV_RECT = (0.70, 0.80, 0.90, 0.93)
+
+# Union of the FIXED and LOGO search windows used by step5
+REV_SEARCH_RECT = (0.72, 0.79, 0.86, 0.885)
+
+FULL_PAGE_RECT = (0.0, 0.0, 1.0, 1.0)
+
+# (path, size, mtime_ns) -> sha256, so a PDF is hashed once per process
+_hash_memo = {}
+
+# (cache key, image) of the last full-page render
+_last_page = None
+
+# ==========================================================
+# CONTENT HASH
+# ==========================================================
+def file_sha256(path, chunk_size=1 << 20):
+
+    path = Path(path)
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+
+    if memo_key in _hash_memo:
+        return _hash_memo[memo_key]
+
+    h = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+
+    digest = h.hexdigest()
+    _hash_memo[memo_key] = digest
+
+    return digest
+
+# ==========================================================
+# CACHE KEY
+# ==========================================================
+def cache_key(pdf_hash, page=0, dpi=DPI, clip=None, gray=False):
+
+    # clip is a fractional page rectangle (x0, y0, x1, y1) or None
+    clip_tag = "full" if clip is None else "-".join(f"{v:.4f}" for v in clip)
+    cs_tag = "gray" if gray else "rgb"
+
+    return f"{pdf_hash}_p{page}_d{dpi}_{clip_tag}_{cs_tag}"
+
+# ==========================================================
+# RASTERIZE (NO CACHE)
+# ==========================================================
+def fractional_rect(page_rect, clip):
+
+    x0, y0, x1, y1 = clip
+    w, h = page_rect.width, page_rect.height
+
+    return fitz.Rect(
+        page_rect.x0 + w * x0,
+        page_rect.y0 + h * y0,
+        page_rect.x0 + w * x1,
+        page_rect.y0 + h * y1,
+    )
+
+def rasterize(pdf_path, page=0, dpi=DPI, clip=None, gray=False):
+
+    doc = fitz.open(pdf_path)
+
+    try:
+        pg = doc.load_page(page)
+
+        kwargs = {"dpi": dpi}
+
+        if clip is not None:
+            kwargs["clip"] = fractional_rect(pg.rect, clip)
+
+        if gray:
+            kwargs["colorspace"] = fitz.csGRAY
+            kwargs["alpha"] = False
+
+        pix = pg.get_pixmap(**kwargs)
+
+        img = np.frombuffer(pix.samples, dtype=np.uint8)
+        img = img.reshape(pix.height, pix.width, pix.n)
+
+        # single channel → 2-D array, like cv2 grayscale images
+        if pix.n == 1:
+            img = img[:, :, 0]
+
+        # RGBA → RGB
+        if pix.n == 4:
+            img = img[:, :, :3]
+
+        return np.ascontiguousarray(img)
+
+    finally:
+        doc.close()
+
+# ==========================================================
+# RENDER WITH CACHE
+# ==========================================================
+def render_page(pdf_path, page=0, dpi=DPI, clip=None, gray=False, cache_dir=CACHE_DIR):
+
+    global _last_page
+
+    key = cache_key(file_sha256(pdf_path), page, dpi, clip, gray)
+
+    # full page: in memory only, shared by the consumers of this document
+    if clip is None:
+
+        if _last_page is None or _last_page[0] != key:
+            _last_page = None   # free the previous page before rendering
+            img = rasterize(str(pdf_path), page, dpi, clip, gray)
+            img.flags.writeable = False
+            _last_page = (key, img)
+
+        return _last_page[1]
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    npy_path = cache_dir / f"{key}.npy"
+
+    if not npy_path.exists():
+
+        img = rasterize(str(pdf_path), page, dpi, clip, gray)
+
+        # write under a temporary name first so a half-written buffer is
+        # never picked up by another stage
+        tmp_path = cache_dir / f"{key}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, img)
+        os.replace(tmp_path, npy_path)
+
+        evict_lru(cache_dir, keep=npy_path)
+
+    else:
+        # mtime is the LRU clock (atime is often disabled)
+        os.utime(npy_path)
+
+    return np.load(npy_path, mmap_mode="r")
+
+# ==========================================================
+# SIZE CAP (LRU EVICTION)
+# ==========================================================
+def evict_lru(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, keep=None):
+
+    # oldest-used renders first until the folder fits; `keep` (the render
+    # just written) always stays, and files still mapped elsewhere on
+    # Windows are skipped
+    entries = []
+
+    for p in Path(cache_dir).glob("*.npy"):
+        if p.name.endswith(".tmp.npy") or p == keep:
+            continue
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, p))
+
+    total = sum(size for _, size, _ in entries)
+
+    if keep is not None and keep.exists():
+        total += keep.stat().st_size
+
+    for _, size, p in sorted(entries):
+
+        if total <= max_bytes:
+            break
+
+        try:
+            p.unlink()
+            total -= size
+        except FileNotFoundError:
+            total -= size
+        except OSError:
+            continue
+
+# ==========================================================
+# RENDER ONLY A REGION (CLIP + GRAYSCALE)
+# ==========================================================
+def render_region(pdf_path, rect, page=0, dpi=DPI, gray=True, cache_dir=CACHE_DIR):
+    return render_page(pdf_path, page=page, dpi=dpi, clip=rect, gray=gray, cache_dir=cache_dir)
+
+# ==========================================================
+# RELEASE / CLEAR
+# ==========================================================
+def release_page():
+
+    # drop the in-memory full page once every consumer has cut its crops
+    global _last_page
+    _last_page = None
+
+def clear_render_cache(cache_dir=CACHE_DIR):
+
+    release_page()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    _hash_memo.clear()
@@ -1,18 +1,15 @@
-from sqlalchemy import create_engine
 import pandas as pd
-from pathlib import Path
+
+from db import read_engine
 
 
 # ==========================================================
 # DATABASE CONFIG (SQLITE)
 # ==========================================================
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "metadata.db"
-
 TABLE = "validation_file"
 
-# Create SQLite engine (file-based DB)
-engine = create_engine(f"sqlite:///{DB_PATH}")
+# Shared read-only SQLite engine (see db.py)
+engine = read_engine()
 
 
 # ==========================================================
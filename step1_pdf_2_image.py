@@ -3,11 +3,12 @@
 # -------------------------------------------------------------
 
 import os
-import cv2
-import numpy as np
-import fitz
 from pathlib import Path
 
+from render_cache import render_page, render_region, release_page, STAMP_28_RECT, CLIP_GRAY_RENDER
+from checkpoint import write_image_atomic, RESUME_RUN
+from metrics import span
+
 # 🔥 BASE DIRECTORY (DEPLOYMENT SAFE)
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -15,24 +16,12 @@ PDF_FOLDER = BASE_DIR / "pdf_input"
 OUTPUT_BASE = BASE_DIR
 OUTPUT_STAMP = OUTPUT_BASE / "images_stamp"
 
-os.makedirs(OUTPUT_STAMP, exist_ok=True)
-
 # ===================== Function used to convert image to numpy array =====================
 
+# Rendered once per PDF through the shared cache; the returned array is
+# read-only, so crops below are views into the same buffer.
 def pdf_to_image(pdf_path, dpi=300):
-    doc = fitz.open(pdf_path)
-    page = doc.load_page(0)
-    pix = page.get_pixmap(dpi=dpi)
-
-    img = np.frombuffer(pix.samples, dtype=np.uint8)
-    img = img.reshape(pix.height, pix.width, pix.n)
-
-    # RGBA → RGB
-    if pix.n == 4:
-        img = img[:, :, :3]
-
-    doc.close()
-    return img
+    return render_page(pdf_path, page=0, dpi=dpi)
 
 # ===================== Crop stamp dimensions =====================
 
@@ -46,27 +35,78 @@ def crop_stamp(img):
 
     return img[y_start:y_end, x_start:x_end]
 
+# ===================== Stamp only (clip + grayscale) =====================
+
+# Same region as crop_stamp(), but PyMuPDF renders only these pixels, in gray
+def render_stamp(pdf_path, dpi=300):
+    return render_region(pdf_path, STAMP_28_RECT, dpi=dpi, gray=True)
+
+# ===================== One document =====================
+
+def save_stamp(pdf_path, stamp_out, clip_gray=CLIP_GRAY_RENDER):
+
+    pdf_path = Path(pdf_path)
+
+    with span("render_stamp", doc=pdf_path.name, clip_gray=clip_gray) as s:
+
+        if clip_gray:
+            stamp = render_stamp(str(pdf_path))
+        else:
+            img = pdf_to_image(str(pdf_path))
+            stamp = crop_stamp(img)
+
+        write_image_atomic(stamp_out, stamp)
+
+        s["height"], s["width"] = stamp.shape[:2]
+
 # ===================== Process all images =====================
 
-for pdf_file in os.listdir(PDF_FOLDER):
-    if not pdf_file.lower().endswith(".pdf"):
-        continue
+def convert_pdfs_to_stamps(pdf_folder=PDF_FOLDER, output_dir=OUTPUT_STAMP, clip_gray=CLIP_GRAY_RENDER, pdf_files=None, resume=RESUME_RUN,
+                           on_progress=None):
+
+    pdf_folder = Path(pdf_folder)
+    output_dir = Path(output_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # pdf_files limits the run to a subset (incremental mode)
+    if pdf_files is None:
+        pdf_files = os.listdir(pdf_folder)
+
+    pdf_files = [f for f in pdf_files if f.lower().endswith(".pdf")]
+
+    for i, pdf_file in enumerate(pdf_files):
+
+        # on_progress(done, total): per-document progress for the job view
+        if on_progress:
+            on_progress(i, len(pdf_files))
+
+        pdf_path = pdf_folder / pdf_file
+        base = os.path.splitext(pdf_file)[0]
+        stamp_out = output_dir / f"{base}_stamp.png"
+
+        # resume: stamps are written atomically, so an existing one is complete
+        if resume and stamp_out.exists():
+            continue
+
+        print(f"Processing: {pdf_file}")
+
+        try:
+            save_stamp(pdf_path, stamp_out, clip_gray)
+            print(f"   Stamp crop saved: {stamp_out}")
 
-    pdf_path = PDF_FOLDER / pdf_file
-    base = os.path.splitext(pdf_file)[0]
+        except Exception as e:
+            print(f"ERROR processing {pdf_file}: {e}")
 
-    print(f"Processing: {pdf_file}")
+    release_page()
 
-    try:
-        img = pdf_to_image(str(pdf_path))
-        stamp = crop_stamp(img)
+    if on_progress:
+        on_progress(len(pdf_files), len(pdf_files))
 
-        stamp_out = OUTPUT_STAMP / f"{base}_stamp.png"
-        cv2.imwrite(str(stamp_out), stamp)
+    print("\n ALL PDFs processed — ONLY stamp crops saved")
 
-        print(f"   Stamp crop saved: {stamp_out}")
+    return output_dir
 
-    except Exception as e:
-        print(f"ERROR processing {pdf_file}: {e}")
 
-print("\n ALL PDFs processed — ONLY stamp crops saved")
\ No newline at end of file
+if __name__ == "__main__":
+    convert_pdfs_to_stamps()
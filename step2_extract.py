@@ -9,6 +9,13 @@ import easyocr
 from ultralytics import YOLO
 import cv2
 import re
+import time
+
+from handoff import handoff_path, write_frame, RAW_EXTRACTION
+from checkpoint import checkpoint_path, open_checkpoint, append_row, finished_rows, RESUME_RUN
+from worker_pool import map_ordered, limit_threads, EXTRACT_WORKERS
+from metrics import span, record
+from layout_cache import LAYOUT_CACHE, layout_fingerprint, cached_boxes, store_boxes
 
 # ==========================================================
 # BASE PATH (STREAMLIT SAFE)
@@ -17,17 +24,38 @@ BASE_DIR = Path(__file__).resolve().parent
 
 model_path = BASE_DIR / "best.pt"
 image_dir  = BASE_DIR / "images_stamp"
-raw_excel_out  = BASE_DIR / "raw_extraction.xlsx"
+raw_out    = handoff_path(RAW_EXTRACTION)
 
 SAVE_DEBUG_CROPS = True
 DEBUG_DIR = BASE_DIR / "debug_crops"
-os.makedirs(DEBUG_DIR, exist_ok=True)
 
-reader = easyocr.Reader(["sv", "en"], gpu=False)
-model = YOLO(str(model_path))
-names = model.names
+# document catalog: bump when a change alters the extracted rows, so
+# cached outputs of earlier versions are extracted again (doc_catalog.py)
+CATALOG_VERSION = 1
+
+# ==========================================================
+# MODELS (LOADED ONCE PER PROCESS, KEPT RESIDENT)
+# ==========================================================
+_reader = None
+_model = None
+
+def get_reader():
+
+    global _reader
+
+    if _reader is None:
+        _reader = easyocr.Reader(["sv", "en"], gpu=False)
+
+    return _reader
+
+def get_model():
 
-LABELS = list(names.values())
+    global _model
+
+    if _model is None:
+        _model = YOLO(str(model_path))
+
+    return _model
 
 # LABEL CONFIGARATION
 
@@ -162,129 +190,438 @@ def list_images(folder: Path):
     exts = {".png",".jpg",".jpeg",".tif",".tiff",".bmp"}
     return [p for p in folder.iterdir() if p.suffix.lower() in exts]
 
-def autosave(rows):
+def autosave(rows, out_path=raw_out):
 
     df = pd.DataFrame(rows)
     df = df.fillna("").astype(str)
 
-    raw_excel_out.parent.mkdir(parents=True, exist_ok=True)
-    df.to_excel(raw_excel_out, index=False)
+    write_frame(df, out_path)
 
     print(f"Autosaved ({len(rows)} rows)")
 
 # ==========================================================
-# MAIN
+# WORKER SETUP (LOAD MODELS ONCE PER PROCESS)
 # ==========================================================
 
-def process_folder():
+def init_worker(n_threads=None):
 
-    rows = []
-    image_paths = list_images(image_dir)
+    if n_threads is not None:
+        limit_threads(n_threads)
+
+    os.makedirs(DEBUG_DIR, exist_ok=True)
+
+    get_model()
+    get_reader()
+
+# ==========================================================
+# DETECTION (BATCHED YOLO)
+# ==========================================================
+
+YOLO_CONF = 0.07
+YOLO_BATCH_SIZE = int(os.environ.get("YOLO_BATCH_SIZE", "8"))
+
+def load_stamp(img_path):
+
+    # decode once: BGR array for YOLO (what ultralytics' own loader
+    # produces from a path) and an RGB PIL view for the label crops
+    bgr = cv2.imread(str(img_path))
+    if bgr is None:
+        raise FileNotFoundError(f"Cannot read image: {img_path}")
+
+    pil_img = Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+
+    return bgr, pil_img
+
+def boxes_from_result(result, names):
+
+    # [(box index, label, x1, y1, x2, y2)] in YOLO's box order
+    boxes = []
+
+    if result.boxes is None:
+        return boxes
+
+    for i, box in enumerate(result.boxes):
+
+        cls_id = int(box.cls[0])
+        label_name = names.get(cls_id, str(cls_id))
+
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        boxes.append((i, label_name, x1, y1, x2, y2))
+
+    return boxes
+
+def detect_batch(images, verbose=True):
+
+    # one forward pass for the whole list; results come back in input order
+    model = get_model()
+    results = model(list(images), conf=YOLO_CONF, verbose=verbose)
+
+    return [boxes_from_result(r, model.names) for r in results]
 
-    for idx, img_path in enumerate(image_paths, start=1):
+# ==========================================================
+# DETECTION WITH THE LAYOUT CACHE (LAYOUT_CACHE=1)
+# ==========================================================
+
+def detect_with_layouts(img_paths, loaded):
+
+    # stamps of a known template reuse its cached boxes; new templates and
+    # spot checks go through YOLO together, in one batch
+    with span("layout_lookup", images=len(img_paths)) as s:
+
+        fps, all_boxes, to_detect = [], [], []
+
+        for i, (bgr, _) in enumerate(loaded):
+
+            h, w = bgr.shape[:2]
+            fp = layout_fingerprint(bgr)
+            boxes, spot_check = cached_boxes(fp, w, h, model_path)
+
+            fps.append(fp)
+            all_boxes.append(boxes)
+
+            if boxes is None or spot_check:
+                to_detect.append(i)
 
-        pil_img = Image.open(img_path).convert("RGB")
-        img_w, img_h = pil_img.size
+        s["hits"] = len(img_paths) - len(to_detect)
 
-        row = {label: "" for label in LABELS}
-        row["Image"] = img_path.name
+    if to_detect:
 
-        best_blad = ""
+        with span("yolo", images=len(to_detect)) as s:
+            detected = detect_batch([loaded[i][0] for i in to_detect])
+            s["boxes"] = sum(len(b) for b in detected)
+
+        for i, boxes in zip(to_detect, detected):
+
+            h, w = loaded[i][0].shape[:2]
+
+            if not store_boxes(fps[i], boxes, w, h, model_path):
+                print(f"LAYOUT DRIFT - {img_paths[i].name}: cached boxes replaced")
+
+            all_boxes[i] = boxes
+
+    return all_boxes
+
+# ==========================================================
+# ONE STAMP (IMAGE + BOXES) → OCR JOBS
+# ==========================================================
 
-        results = model(str(img_path), conf=0.07)[0]
+LEVERANS_ALLOWLIST = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
 
-        if results.boxes is not None:
+def collect_crops(img_path, pil_img, boxes, LABELS):
 
-            for i, box in enumerate(results.boxes):
+    # one job per YOLO box, in box order: padded + preprocessed crop and the
+    # OCR options it needs. The per-label rules run later in assemble_row().
+    img_w, img_h = pil_img.size
 
-                cls_id = int(box.cls[0])
-                label_name = names.get(cls_id, str(cls_id))
+    jobs = []
 
-                if label_name not in LABELS:
-                    continue
+    for i, label_name, x1, y1, x2, y2 in boxes:
 
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
+        if label_name not in LABELS:
+            continue
 
-                if label_name == RNP_LABEL:
+        allowlist = None
 
-                    x1, y1, x2, y2 = apply_padding_rnp(x1, y1, x2, y2, img_w, img_h)
-                    crop = pil_img.crop((x1, y1, x2, y2))
+        if label_name == RNP_LABEL:
 
-                    if SAVE_DEBUG_CROPS:
-                        crop.save(DEBUG_DIR / f"{img_path.stem}_RNP_{i}.png")
+            x1, y1, x2, y2 = apply_padding_rnp(x1, y1, x2, y2, img_w, img_h)
+            crop = pil_img.crop((x1, y1, x2, y2))
 
-                    processed = pp_rnp_lite(crop)
-                    text_list = reader.readtext(processed, detail=0, paragraph=True)
-                    text = " ".join(text_list)
+            if SAVE_DEBUG_CROPS:
+                crop.save(DEBUG_DIR / f"{img_path.stem}_RNP_{i}.png")
 
-                    if not row[label_name]:
-                        row[label_name] = text
+            processed = pp_rnp_lite(crop)
 
-                elif label_name == BLAD_LABEL:
+        elif label_name == BLAD_LABEL:
+
+            x1, y1, x2, y2 = apply_padding_blad(x1, y1, x2, y2, img_w, img_h)
+            crop = pil_img.crop((x1, y1, x2, y2))
+
+            if SAVE_DEBUG_CROPS:
+                crop.save(DEBUG_DIR / f"{img_path.stem}_BLAD_{i}.png")
+
+            processed = pp_blad(crop)
+
+        elif label_name == LEVERANS_LABEL:
+
+            crop = pil_img.crop((x1, y1, x2, y2))
+
+            if SAVE_DEBUG_CROPS:
+                crop.save(DEBUG_DIR / f"{img_path.stem}_LEV_{i}.png")
+
+            processed = pp_leverans(crop)
+            allowlist = LEVERANS_ALLOWLIST
+
+        else:
+
+            x1, x2 = apply_padding_standard(x1, x2, img_w, label_name)
+            crop = pil_img.crop((x1, y1, x2, y2))
+
+            if SAVE_DEBUG_CROPS:
+                crop.save(DEBUG_DIR / f"{img_path.stem}_{label_name}_{i}.png")
+
+            processed = pp_light_soft(crop) if label_name in RAW_OCR_LABELS else pp_light(crop)
+
+        jobs.append({"label": label_name, "image": processed, "allowlist": allowlist})
+
+    return jobs
+
+# ==========================================================
+# OCR JOBS → TEXT (BATCHED)
+# ==========================================================
 
-                    x1, y1, x2, y2 = apply_padding_blad(x1, y1, x2, y2, img_w, img_h)
-                    crop = pil_img.crop((x1, y1, x2, y2))
+# the batched path pads every crop with a white right/bottom border up to the
+# size bucket, so EasyOCR's detector sees a slightly larger canvas than with
+# per-crop readtext(). BATCHED_OCR=0 is the reference path;
+# benchmarks/ocr_batch.py runs both on the same stamps and reports every
+# field that differs.
+BATCHED_OCR    = os.environ.get("BATCHED_OCR", "1") == "1"
+OCR_BATCH_SIZE = int(os.environ.get("OCR_BATCH_SIZE", "16"))
+OCR_SIZE_BUCKET = 64   # crops are padded up to a multiple of this
 
-                    if SAVE_DEBUG_CROPS:
-                        crop.save(DEBUG_DIR / f"{img_path.stem}_BLAD_{i}.png")
+def ocr_single(job):
 
-                    processed = pp_blad(crop)
-                    text_list = reader.readtext(processed, detail=0, paragraph=True)
-                    detected_text = " ".join(text_list).strip()
+    h, w = job["image"].shape[:2]
+
+    with span("ocr", label=job["label"], crop_h=h, crop_w=w):
+        text_list = get_reader().readtext(
+            job["image"],
+            detail=0,
+            paragraph=True,
+            allowlist=job["allowlist"]
+        )
+
+    return " ".join(text_list)
+
+def pad_to(img, h, w):
+
+    # white border on the right/bottom only, so text keeps its position
+    ph, pw = img.shape[:2]
+
+    return cv2.copyMakeBorder(
+        img, 0, h - ph, 0, w - pw,
+        cv2.BORDER_CONSTANT, value=255
+    )
+
+def bucket(v):
+    return -(-v // OCR_SIZE_BUCKET) * OCR_SIZE_BUCKET
+
+def ocr_batched(jobs):
+
+    reader = get_reader()
+    texts = [""] * len(jobs)
+
+    # group by OCR options and padded size; readtext_batched needs one size
+    groups = {}
+
+    for idx, job in enumerate(jobs):
+        h, w = job["image"].shape[:2]
+        key = (job["allowlist"], bucket(h), bucket(w))
+        groups.setdefault(key, []).append(idx)
+
+    for (allowlist, bh, bw), idxs in groups.items():
+
+        for start in range(0, len(idxs), OCR_BATCH_SIZE):
+
+            chunk = idxs[start:start + OCR_BATCH_SIZE]
+            images = [pad_to(jobs[i]["image"], bh, bw) for i in chunk]
+
+            t0 = time.perf_counter()
+
+            results = reader.readtext_batched(
+                images,
+                n_width=bw,
+                n_height=bh,
+                detail=0,
+                paragraph=True,
+                batch_size=OCR_BATCH_SIZE,
+                allowlist=allowlist
+            )
+
+            # the batch's time split evenly over its crops, per label
+            share = (time.perf_counter() - t0) / len(chunk)
+
+            for i, text_list in zip(chunk, results):
+                texts[i] = " ".join(text_list)
+                record("ocr", share, label=jobs[i]["label"], crop_h=bh, crop_w=bw, batch=len(chunk))
+
+    return texts
+
+def ocr_jobs(jobs, batched=BATCHED_OCR):
+
+    if not jobs:
+        return []
+
+    if not batched:
+        return [ocr_single(job) for job in jobs]
+
+    return ocr_batched(jobs)
+
+# ==========================================================
+# OCR TEXT → ROW (PER-LABEL RULES)
+# ==========================================================
+
+def assemble_row(img_path, jobs, texts, LABELS):
+
+    row = {label: "" for label in LABELS}
+    row["Image"] = img_path.name
+
+    best_blad = ""
+
+    for job, text in zip(jobs, texts):
+
+        label_name = job["label"]
+
+        if label_name == BLAD_LABEL:
+
+            detected_text = text.strip()
+
+            if is_valid_blad(detected_text):
+
+                if not best_blad:
+                    best_blad = detected_text
+                elif len(detected_text) < len(best_blad):
+                    best_blad = detected_text
+
+            continue
+
+        if label_name == LEVERANS_LABEL:
+            text = text.strip()
+
+        # first non-empty hit wins
+        if not row[label_name]:
+            row[label_name] = text
+
+    row["BLAD"] = best_blad
+
+    print("Processed:", img_path.name)
+
+    return row
+
+def ocr_rows(img_paths, per_stamp, LABELS, batched=BATCHED_OCR):
+
+    # OCR the crops of all stamps in one go, then split the texts back per
+    # stamp (also used by benchmarks/ocr_batch.py to compare both paths)
+    flat = [job for jobs in per_stamp for job in jobs]
+
+    with span("ocr_total", images=len(img_paths), crops=len(flat)):
+        flat_texts = ocr_jobs(flat, batched=batched)
+
+    rows = []
+    pos = 0
+
+    for img_path, jobs in zip(img_paths, per_stamp):
+        texts = flat_texts[pos:pos + len(jobs)]
+        pos += len(jobs)
+        rows.append(assemble_row(img_path, jobs, texts, LABELS))
+
+    return rows
+
+# ==========================================================
+# BATCH OF STAMP IMAGES → ROWS
+# ==========================================================
+
+def extract_batch(img_paths):
+
+    img_paths = [Path(p) for p in img_paths]
+    t0 = time.perf_counter()
+
+    with span("load_stamps", images=len(img_paths)):
+        loaded = [load_stamp(p) for p in img_paths]
+
+    if LAYOUT_CACHE:
+        all_boxes = detect_with_layouts(img_paths, loaded)
+    else:
+        with span("yolo", images=len(img_paths)) as s:
+            all_boxes = detect_batch([bgr for bgr, _ in loaded])
+            s["boxes"] = sum(len(b) for b in all_boxes)
+
+    LABELS = list(get_model().names.values())
+
+    # crops of every stamp in the batch go through OCR together
+    with span("crops", images=len(img_paths)):
+        per_stamp = [
+            collect_crops(img_path, pil_img, boxes, LABELS)
+            for img_path, (_, pil_img), boxes in zip(img_paths, loaded, all_boxes)
+        ]
+
+    rows = ocr_rows(img_paths, per_stamp, LABELS)
+
+    # per-document cost: the batch's time split over its stamps
+    share = (time.perf_counter() - t0) / max(1, len(img_paths))
+    for img_path, jobs in zip(img_paths, per_stamp):
+        record("extract_doc", share, doc=img_path.name, crops=len(jobs), batch=len(img_paths))
+
+    return rows
+
+def extract_image(img_path):
+    return extract_batch([img_path])[0]
+
+def make_batches(items, batch_size):
+    batch_size = max(1, int(batch_size))
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+# ==========================================================
+# MAIN
+# ==========================================================
 
-                    if is_valid_blad(detected_text):
+def process_folder(image_dir=image_dir, out_path=raw_out, image_paths=None, workers=EXTRACT_WORKERS, batch_size=YOLO_BATCH_SIZE,
+                   resume=RESUME_RUN, on_progress=None, doc_hashes=None):
 
-                        if not best_blad:
-                            best_blad = detected_text
-                        elif len(detected_text) < len(best_blad):
-                            best_blad = detected_text
+    image_dir = Path(image_dir)
+    out_path = Path(out_path)
 
-                elif label_name == LEVERANS_LABEL:
+    log_path = checkpoint_path(out_path)
 
-                    crop = pil_img.crop((x1, y1, x2, y2))
+    # image_paths limits the run to a subset (incremental mode)
+    if image_paths is None:
+        image_paths = list_images(image_dir)
 
-                    if SAVE_DEBUG_CROPS:
-                        crop.save(DEBUG_DIR / f"{img_path.stem}_LEV_{i}.png")
+    image_paths = list(image_paths)
+    names = [p.name for p in image_paths]
 
-                    processed = pp_leverans(crop)
-                    text_list = reader.readtext(
-                        processed,
-                        detail=0,
-                        paragraph=True,
-                        allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
-                    )
+    # resume: images already in the checkpoint log are not extracted again
+    # (doc_hashes: image name -> source PDF sha256, see checkpoint.finished_rows)
+    done = finished_rows(log_path, "Image", names, hashes=doc_hashes) if resume else {}
+    todo = [p for p in image_paths if p.name not in done]
 
-                    text = " ".join(text_list).strip()
+    if resume:
+        print(f"RESUME step2: {len(done)} done, {len(todo)} remaining")
 
-                    if not row[label_name]:
-                        row[label_name] = text
+    # each work item is one YOLO batch; workers take batches from the queue
+    results = map_ordered(
+        extract_batch,
+        make_batches(todo, batch_size),
+        workers=workers,
+        initializer=init_worker
+    )
 
-                else:
+    # on_progress(done, total): per-document progress for the job view
+    processed = len(names) - len(todo)
 
-                    x1, x2 = apply_padding_standard(x1, x2, img_w, label_name)
-                    crop = pil_img.crop((x1, y1, x2, y2))
+    if on_progress:
+        on_progress(processed, len(names))
 
-                    if SAVE_DEBUG_CROPS:
-                        crop.save(DEBUG_DIR / f"{img_path.stem}_{label_name}_{i}.png")
+    # one JSON line per finished image; the table is written once at the end
+    with open_checkpoint(log_path, fresh=not resume) as log:
 
-                    processed = pp_light_soft(crop) if label_name in RAW_OCR_LABELS else pp_light(crop)
+        for batch_rows in results:
 
-                    text_list = reader.readtext(processed, detail=0, paragraph=True)
-                    text = " ".join(text_list)
+            for row in batch_rows:
+                done[row["Image"]] = row
+                append_row(log, row, (doc_hashes or {}).get(row["Image"]))
 
-                    if not row[label_name]:
-                        row[label_name] = text
+            processed += len(batch_rows)
 
-        row["BLAD"] = best_blad
-        rows.append(row)
+            if on_progress:
+                on_progress(processed, len(names))
 
-        print("Processed:", img_path.name)
+    rows = [done[n] for n in names if n in done]
 
-        if idx % 10 == 0:
-            autosave(rows)
+    autosave(rows, out_path)
+    print("\nRAW extraction saved:", out_path)
 
-    autosave(rows)
-    print("\nRAW extraction saved:", raw_excel_out)
+    return rows
 
 # ==========================================================
 # RUN
@@ -1,23 +1,41 @@
 # ALL RAW DATA FROM EXTRACTION IS CLEANED IN THIS STEP
 
+import os
+import numpy as np
 import pandas as pd
 import re
+from collections import OrderedDict
 from pathlib import Path
 
+from handoff import handoff_path, read_frame, write_frame, RAW_EXTRACTION, CLEANING_FILE
+from metrics import span
+
 # ==========================================================
 # BASE PATH (STREAMLIT / DEPLOYMENT SAFE)
 # ==========================================================
 BASE_DIR = Path(__file__).resolve().parent
 
-INPUT_EXCEL = BASE_DIR / "raw_extraction.xlsx"
-OUTPUT_EXCEL = BASE_DIR / "cleaning_file.xlsx"
+INPUT_PATH  = handoff_path(RAW_EXTRACTION)
+OUTPUT_PATH = handoff_path(CLEANING_FILE)
+
+# max (column, raw value) entries kept by the cleaner memo
+CLEANER_CACHE_SIZE = int(os.environ.get("CLEANER_CACHE_SIZE", "50000"))
 # NORMALIZATION
 
+# Patterns are compiled once at import; sequences of substitutions are kept
+# as (pattern, replacement) rule tables and run with apply_rules().
+WS_PATTERN = re.compile(r"\s+")
+
+def apply_rules(t: str, rules) -> str:
+    for pattern, repl in rules:
+        t = pattern.sub(repl, t)
+    return t
+
 def normalize_text(s: str) -> str:
     if not isinstance(s, str):
         return ""
     s = s.replace("\n", " ")
-    s = re.sub(r"\s+", " ", s)
+    s = WS_PATTERN.sub(" ", s)
     return s.strip()
 
 def clean_default(text):
@@ -51,19 +69,36 @@ def normalize_company(text):
     return t
 
 # LOGIC FOR PERSON NAME
+LETTER_PATTERN      = re.compile(r"[A-ZÅÄÖ]")
+PERSON_JOINED       = re.compile(r"[A-ZÅÄÖ]{4,}")
+PERSON_INITIAL_NAME = re.compile(r"[A-ZÅÄÖ]\s+[A-ZÅÄÖ]{3,}")
+LEADING_NON_LETTER  = re.compile(r"^[^A-ZÅÄÖ]+")
+
 def dot_person(name: str) -> str:
     name = name.strip()
     if "." in name:
         return name
-    letters = re.findall(r"[A-ZÅÄÖ]", name)
+    letters = LETTER_PATTERN.findall(name)
     if len(letters) <= 3:
         return name
-    if re.fullmatch(r"[A-ZÅÄÖ]{4,}", name):
+    if PERSON_JOINED.fullmatch(name):
         return name[0] + "." + name[1:]
-    if re.fullmatch(r"[A-ZÅÄÖ]\s+[A-ZÅÄÖ]{3,}", name):
+    if PERSON_INITIAL_NAME.fullmatch(name):
         return name[0] + "." + name.split()[1]
     return name
 
+PERSON_RULES_BEFORE_COMMA = [
+    (re.compile(r"^I(?=[A-ZÅÄÖ])"), ""),
+    (LEADING_NON_LETTER, ""),
+    (re.compile(r"\b([A-Z])\s+([A-ZÅÄÖ]{3,})"), r"\1.\2"),
+]
+
+PERSON_RULES_AFTER_COMMA = [
+    (re.compile(r"([A-ZÅÄÖ])\s*[/|]\s*([A-ZÅÄÖ])"), r"\1 / \2"),
+    (re.compile(r"(TYRÉNS)\s+(JEB|JEK|FBE|PHN|MBM|THO)"), r"\1 / \2"),
+    (re.compile(r"(TYRÉNS)[I]"), r"\1 / "),
+]
+
 def clean_PERSON_LABEL(text):
 
     if not isinstance(text, str):
@@ -71,15 +106,11 @@ def clean_PERSON_LABEL(text):
 
     t = normalize_text(text).upper()
 
-    t = re.sub(r"^I(?=[A-ZÅÄÖ])", "", t)
-    t = re.sub(r"^[^A-ZÅÄÖ]+", "", t)
-    t = re.sub(r"\b([A-Z])\s+([A-ZÅÄÖ]{3,})", r"\1.\2", t)
+    t = apply_rules(t, PERSON_RULES_BEFORE_COMMA)
 
     t = t.replace(",", " / ")
 
-    t = re.sub(r"([A-ZÅÄÖ])\s*[/|]\s*([A-ZÅÄÖ])", r"\1 / \2", t)
-    t = re.sub(r"(TYRÉNS)\s+(JEB|JEK|FBE|PHN|MBM|THO)", r"\1 / \2", t)
-    t = re.sub(r"(TYRÉNS)[I]", r"\1 / ", t)
+    t = apply_rules(t, PERSON_RULES_AFTER_COMMA)
 
     parts = [p.strip() for p in t.split("/") if p.strip()]
 
@@ -97,6 +128,8 @@ def clean_PERSON_LABEL(text):
     return " / ".join(cleaned)
 
 # SYMBOL REMOVER
+SYMBOLS_KEEP_SLASH = re.compile(r"[^A-ZÅÄÖ0-9\s/]")
+SYMBOLS            = re.compile(r"[^A-ZÅÄÖ0-9\s]")
 
 def remove_symbols(text: str, keep_slash=False) -> str:
 
@@ -106,15 +139,21 @@ def remove_symbols(text: str, keep_slash=False) -> str:
     t = normalize_text(text).upper()
 
     if keep_slash:
-        t = re.sub(r"[^A-ZÅÄÖ0-9\s/]", " ", t)
+        t = SYMBOLS_KEEP_SLASH.sub(" ", t)
     else:
-        t = re.sub(r"[^A-ZÅÄÖ0-9\s]", " ", t)
+        t = SYMBOLS.sub(" ", t)
 
-    t = re.sub(r"\s+", " ", t)
+    t = WS_PATTERN.sub(" ", t)
 
     return t.strip()
 
 # COLUMN CLEANERS
+LEVERANTOR_PREFIX_RULES = [
+    (re.compile(r"^LEVERANTÖR\s*"), ""),
+    (re.compile(r"^LEVERANTOR\s*"), ""),
+    (re.compile(r"^VERANTOR\s*"), ""),
+    (re.compile(r"^EVERANTOR\s*"), ""),
+]
 
 def clean_LEVERANTOR_1(text):
 
@@ -126,10 +165,7 @@ def clean_LEVERANTOR_1(text):
     # --------------------------------------------------
     #  FIX OCR DAMAGE
     # --------------------------------------------------
-    t = re.sub(r"^LEVERANTÖR\s*", "", t)
-    t = re.sub(r"^LEVERANTOR\s*", "", t)
-    t = re.sub(r"^VERANTOR\s*", "", t)
-    t = re.sub(r"^EVERANTOR\s*", "", t)
+    t = apply_rules(t, LEVERANTOR_PREFIX_RULES)
 
     return normalize_company(t)
 
@@ -138,26 +174,32 @@ def clean_LEVERANTOR_2(text):
     if not isinstance(text, str):
         return ""
     t = normalize_text(text).upper()
-    t = re.sub(r"^[^A-ZÅÄÖ]+", "", t)
+    t = LEADING_NON_LETTER.sub("", t)
     return normalize_company(t)
 
+TITLE_RULES = [
+    (re.compile(r"VASTLANKEN"), "VÄSTLÄNKEN"),
+    (re.compile(r"VÄSTLANKEN"), "VÄSTLÄNKEN"),
+    (LEADING_NON_LETTER, ""),
+]
+
 def clean_TITLE(text: str) -> str:
     if not isinstance(text, str):
         return ""
     t = normalize_text(text).upper()
-    t = re.sub(r"VASTLANKEN", "VÄSTLÄNKEN", t)
-    t = re.sub(r"VÄSTLANKEN", "VÄSTLÄNKEN", t)
-    t = re.sub(r"^[^A-ZÅÄÖ]+", "", t)
+    t = apply_rules(t, TITLE_RULES)
     return t
 
 # ============================================================
 # TEKNIKOMRADE (UNCHANGED)
 # ============================================================
+NON_LETTER = re.compile(r"[^A-ZÅÄÖ]")
+
 def clean_TEKNIKOMRADE(text):
     if not isinstance(text, str):
         return ""
     t = normalize_text(text).upper()
-    t = re.sub(r"[^A-ZÅÄÖ]", "", t)
+    t = NON_LETTER.sub("", t)
     return t
 
 # ============================================================
@@ -175,7 +217,7 @@ def clean_GRANSKNINGSSTATUS_SYFTE(text):
          .replace("Ö", "O")
     )
 
-    compact = re.sub(r"\s+", "", t_norm)
+    compact = WS_PATTERN.sub("", t_norm)
 
     if "GODKAND" in compact:
         return "GODKÄND"
@@ -210,6 +252,8 @@ def clean_ANLAGGNINGSTYP(text):
 KM_PATTERN = re.compile(
     r"(\d{1,4})\s*([+/])?\s*(\d{1,3}(?:[.,]\d+)?)"
 )
+KM_PREFIX     = re.compile(r"^\s*([~≈])\s*")
+KM_BROKEN_SEP = re.compile(r"(\d{3})\s+4\s+(\d{3})")
 
 def trim_km(km):
     km = str(km)
@@ -228,14 +272,14 @@ def clean_KILOMETER_METER(text):
 
     # keep starting symbol if present
     prefix = ""
-    m_pref = re.match(r"^\s*([~≈])\s*", text)
+    m_pref = KM_PREFIX.match(text)
     if m_pref:
         prefix = m_pref.group(1)
 
     t = normalize_text(text)
 
     # Fix broken "+"
-    t = re.sub(r"(\d{3})\s+4\s+(\d{3})", r"\1+\2", t)
+    t = KM_BROKEN_SEP.sub(r"\1+\2", t)
 
     matches = KM_PATTERN.findall(t)
 
@@ -258,33 +302,42 @@ def clean_KILOMETER_METER(text):
 # ============================================================
 # SKALA 
 # ============================================================
+SCALE_TRAILING_COLON = re.compile(r":+$")
+SCALE_JOINED_PAIR    = re.compile(r"1:(\d{2,4})(\d{2,4})")
+SCALE_LONG_DIGITS    = re.compile(r"1:?(\d{5,8})")
+SCALE_RATIO          = re.compile(r"1:\d+")
+SCALE_DIGITS         = re.compile(r"\d{2,5}")
+SCALE_SLASH          = re.compile(r"\s*/\s*")
+SCALE_SPLIT          = re.compile(r"\s+|/")
+DIGIT_PATTERN        = re.compile(r"\d")
+
 def normalize_single_scale(val: str) -> str:
 
     val = val.strip()
     val = val.replace("-", ":")
     val = val.replace(".", ":")
-    val = re.sub(r":+$", "", val)
+    val = SCALE_TRAILING_COLON.sub("", val)
 
     # ---------CRITICAL FIX → 1:1001500-----------------------
     
-    m = re.fullmatch(r"1:(\d{2,4})(\d{2,4})", val)
+    m = SCALE_JOINED_PAIR.fullmatch(val)
     if m:
         return f"1:{m.group(1)} / 1:{m.group(2)}"
 
     # --------------------------------------------------
     # FIX → 11001500 / 1001500 STYLE DAMAGE
     # --------------------------------------------------
-    m2 = re.fullmatch(r"1:?(\d{5,8})", val)
+    m2 = SCALE_LONG_DIGITS.fullmatch(val)
     if m2:
         digits = m2.group(1)
 
         if len(digits) >= 6:
             return f"1:{digits[:len(digits)//2]} / 1:{digits[len(digits)//2:]}"
     
-    if re.fullmatch(r"1:\d+", val):
+    if SCALE_RATIO.fullmatch(val):
         return val
 
-    if re.fullmatch(r"\d{2,5}", val):
+    if SCALE_DIGITS.fullmatch(val):
 
         if len(val) == 4 and val.startswith("1"):
             val = val[1:]
@@ -307,7 +360,7 @@ def clean_LEVERANS_ANDRINGS_PM(text):
         return ""
     if len(t) <= 4:
         return ""
-    if not re.search(r"\d", t):
+    if not DIGIT_PATTERN.search(t):
         return ""
 
     return t
@@ -322,9 +375,9 @@ def clean_SKALA(text):
     t = t.replace(",", " / ")
     t = t.replace(";", " / ")
     t = t.replace("\\", " / ")
-    t = re.sub(r"\s*/\s*", " / ", t)
+    t = SCALE_SLASH.sub(" / ", t)
 
-    parts = re.split(r"\s+|/", t)
+    parts = SCALE_SPLIT.split(t)
 
     cleaned = [
         normalize_single_scale(p)
@@ -339,6 +392,12 @@ def clean_SKALA(text):
 # ============================================================
 # FORMAT
 # ============================================================
+FORMAT_RULES = [
+    (re.compile(r"^A[I|L]$"), "A1"),
+    (re.compile(r"^4(?=\d)"), "A"),
+    (re.compile(r"[^A-Z0-9]"), ""),
+]
+
 def clean_FORMAT(text):
     if not isinstance(text, str):
         return ""
@@ -349,9 +408,7 @@ def clean_FORMAT(text):
         return "A1"
 
     # A I → A1
-    t = re.sub(r"^A[I|L]$", "A1", t)
-    t = re.sub(r"^4(?=\d)", "A", t)
-    t = re.sub(r"[^A-Z0-9]", "", t)
+    t = apply_rules(t, FORMAT_RULES)
 
     return t
 
@@ -370,6 +427,14 @@ def clean_BESKRIVNING_ROW_3(text):
 def clean_BESKRIVNING_ROW_4(text):
     return remove_symbols(text, keep_slash=True)
 
+ANDR_REVISION   = re.compile(r"[A-Z]\.\d+")
+NON_ALNUM       = re.compile(r"[^A-Z0-9]")
+ANDR_FOUR_DIGIT = re.compile(r"4(\d)")
+HAS_ONE         = re.compile(r".*1.*")
+HAS_TWO         = re.compile(r".*2.*")
+STARTS_LETTER   = re.compile(r"[A-Z].*")
+SINGLE_LETTER   = re.compile(r"[A-Z]")
+
 def clean_ANDR(text):
 
     if not isinstance(text, str):
@@ -380,26 +445,26 @@ def clean_ANDR(text):
     if not t:
         return "_"
 
-    if re.fullmatch(r"[A-Z]\.\d+", t):
+    if ANDR_REVISION.fullmatch(t):
         return t
 
-    compact = re.sub(r"[^A-Z0-9]", "", t)
+    compact = NON_ALNUM.sub("", t)
 
-    m = re.fullmatch(r"4(\d)", compact)
+    m = ANDR_FOUR_DIGIT.fullmatch(compact)
     if m:
         return f"A.{m.group(1)}"
 
     if "4" in compact:
         return "A"
 
-    if re.fullmatch(r".*1.*", compact):
-        if not re.fullmatch(r"[A-Z].*", compact):
+    if HAS_ONE.fullmatch(compact):
+        if not STARTS_LETTER.fullmatch(compact):
             return "_.1"
 
-    if re.fullmatch(r".*2.*", compact):
-        if not re.fullmatch(r"[A-Z].*", compact):
+    if HAS_TWO.fullmatch(compact):
+        if not STARTS_LETTER.fullmatch(compact):
             return "_.2"
-    if re.fullmatch(r"[A-Z]", compact):
+    if SINGLE_LETTER.fullmatch(compact):
         return compact
 
     return "_"
@@ -433,40 +498,46 @@ def correct_rnp_using_image(ocr_val, image_val):
 
     return ocr_val
 
-def clean_ritningsnummer_projekt(text: str) -> str:
+RNP_OCR_MAP = str.maketrans({
+    "O": "0",
+    "Q": "0",
+})
 
-    if not isinstance(text, str):
-        return ""
+# applied in this order
+RNP_RULES = [
+    (re.compile(r"BBP[0OQ]S"), "BBP05"),
+    (re.compile(r"(?<=\d)S(?=\d)"), "5"),
+    (re.compile(r"^[IJ1|/\\`']+(?=[A-Z0-9])"), ""),
 
-    t = text.strip().upper()
+    (re.compile(r"RITNINGSNUMMER[_\s-]*PROJEKT"), " "),
+    (re.compile(r"^[^A-Z0-9]+"), ""),
 
-    OCR_MAP = str.maketrans({
-        "O": "0",
-        "Q": "0",
-        
-    })
+    (re.compile(r"BBPO5"), "BBP05"),
+    (re.compile(r"BBPOS"), "BBP05"),
+    (re.compile(r"IBBPO5"), "BBP05"),
 
-    t = t.translate(OCR_MAP)
-    t = re.sub(r"BBP[0OQ]S", "BBP05", t)
-    t = re.sub(r"(?<=\d)S(?=\d)", "5", t)
-    t = re.sub(r"^[IJ1|/\\`']+(?=[A-Z0-9])", "", t)
+    (re.compile(r"0\s+0"), "0_0"),
+    (re.compile(r"-00-"), "-0_0-"),
 
-    t = re.sub(r"RITNINGSNUMMER[_\s-]*PROJEKT", " ", t)
-    t = re.sub(r"^[^A-Z0-9]+", "", t)
+    (re.compile(r"[/'`]+$"), ""),
 
-    t = re.sub(r"BBPO5", "BBP05", t)
-    t = re.sub(r"BBPOS", "BBP05", t)
-    t = re.sub(r"IBBPO5", "BBP05", t)
+    (re.compile(r"\s*-\s*"), "-"),
+    (WS_PATTERN, ""),
+]
 
-    t = re.sub(r"0\s+0", "0_0", t)
-    t = re.sub(r"-00-", "-0_0-", t)
+RNP_FULL = re.compile(r"\b([A-Z0-9]+-\d{2}-\d{3}-\d{4}-0_0-[A-Z0-9]+)\b")
 
-    t = re.sub(r"[/'`]+$", "", t)
+def clean_ritningsnummer_projekt(text: str) -> str:
 
-    t = re.sub(r"\s*-\s*", "-", t)
-    t = re.sub(r"\s+", "", t)
+    if not isinstance(text, str):
+        return ""
 
-    m = re.search(r"\b([A-Z0-9]+-\d{2}-\d{3}-\d{4}-0_0-[A-Z0-9]+)\b", t)
+    t = text.strip().upper()
+
+    t = t.translate(RNP_OCR_MAP)
+    t = apply_rules(t, RNP_RULES)
+
+    m = RNP_FULL.search(t)
 
     if not m:
         return t
@@ -508,6 +579,10 @@ def clean_blad(value):
         return value
 
     return value   # return anyway → validation decides error
+# note: matches a literal backslash + "d" run (kept as-is, see step7 for the
+# digits check that is actually enforced)
+BLAD_IMAGE_SUFFIX = re.compile(r"(\\d+)$")
+
 def extract_blad_from_image(image_name):
 
     if not image_name:
@@ -522,7 +597,7 @@ def extract_blad_from_image(image_name):
         .replace(".png", "")
     )
 
-    m = re.search(r"(\\d+)$", image_name)
+    m = BLAD_IMAGE_SUFFIX.search(image_name)
 
     if not m:
         return ""
@@ -572,11 +647,204 @@ CLEANERS = {
 }
 
 # ============================================================
-# RUN
+# CLEANER MEMO (BOUNDED LRU)
 # ============================================================
-def main():
+# Supplier names, initials, formats etc. repeat across thousands of
+# drawings and across runs of the resident pipeline, so cleaned values are
+# memoized per (column, raw value). Only strings are cached.
+
+class CleanerCache:
+
+    def __init__(self, maxsize=CLEANER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, col, value, fn):
+
+        if not isinstance(value, str):
+            return fn(value)
+
+        key = (col, value)
+
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        result = fn(value)
+
+        self.entries[key] = result
+
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        return result
+
+    def stats(self):
+
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+CLEANER_CACHE = CleanerCache()
+
+def cached(col, fn, cache=CLEANER_CACHE):
+    return lambda value: cache.get(col, value, fn)
+
+# ============================================================
+# COLUMN-WISE ENGINE
+# ============================================================
+# Each cleaner runs over a whole column: plain text columns use pandas .str
+# operations, the rule-heavy cleaners run once per distinct raw value and
+# the result is broadcast back (OCR output repeats a lot across drawings).
+
+def map_unique(fn, s: pd.Series) -> pd.Series:
+
+    codes, uniques = pd.factorize(s)
+
+    out = np.empty(len(uniques), dtype=object)
+    out[:] = [fn(u) for u in uniques]
+
+    result = np.empty(len(s), dtype=object)
+    has_value = codes >= 0
+    result[has_value] = out[codes[has_value]]
+
+    # NaN / None are not factorized; clean them one by one like the
+    # row-wise loop did (extract_rnp_from_image gives "NAN" vs "NONE")
+    result[~has_value] = [fn(v) for v in s.to_numpy()[~has_value]]
+
+    return pd.Series(result, index=s.index, dtype=object)
+
+def text_series(s: pd.Series) -> pd.Series:
 
-    df = pd.read_excel(INPUT_EXCEL, dtype=str, keep_default_na=False)
+    # vectorized normalize_text(); non-strings become "" like the scalar version
+    is_str = s.map(lambda v: isinstance(v, str)).astype(bool)
+    t = s.where(is_str, "").astype(object)
+
+    return (
+        t.str.replace("\n", " ", regex=False)
+         .str.replace(r"\s+", " ", regex=True)
+         .str.strip()
+    )
+
+def vec_default(s):
+    return text_series(s)
+
+def vec_upper(s):
+    return text_series(s).str.upper()
+
+def vec_TEKNIKOMRADE(s):
+    return vec_upper(s).str.replace(r"[^A-ZÅÄÖ]", "", regex=True)
+
+def vec_remove_symbols(s, keep_slash=False):
+
+    t = vec_upper(s)
+
+    if keep_slash:
+        t = t.str.replace(r"[^A-ZÅÄÖ0-9\s/]", " ", regex=True)
+    else:
+        t = t.str.replace(r"[^A-ZÅÄÖ0-9\s]", " ", regex=True)
+
+    return t.str.replace(r"\s+", " ", regex=True).str.strip()
+
+# column → vectorized cleaner; the other CLEANERS go through map_unique()
+VECTOR_CLEANERS = {
+    "TEKNIKOMRADE": vec_TEKNIKOMRADE,
+    "HANDLINGSTYP": vec_upper,
+    "ANLAGGNINGSTYP": vec_upper,
+    "BESKRIVNING_ROW_1": vec_remove_symbols,
+    "BESKRIVNING_ROW_2": vec_remove_symbols,
+    "BESKRIVNING_ROW_3": vec_remove_symbols,
+    "BESKRIVNING_ROW_4": lambda s: vec_remove_symbols(s, keep_slash=True),
+}
+
+def clean_column(col, s):
+
+    if col in VECTOR_CLEANERS:
+        return VECTOR_CLEANERS[col](s)
+
+    if col in CLEANERS:
+        return map_unique(cached(col, CLEANERS[col]), s)
+
+    return vec_default(s)
+
+def single_char_difference_cols(a: pd.Series, b: pd.Series) -> pd.Series:
+
+    # vectorized single_char_difference(); only equal-length, non-empty
+    # pairs need the character comparison
+    candidate = a.str.len().eq(b.str.len()) & a.ne("") & b.ne("")
+
+    result = pd.Series(False, index=a.index)
+    result[candidate] = [
+        sum(c1 != c2 for c1, c2 in zip(x, y)) == 1
+        for x, y in zip(a[candidate], b[candidate])
+    ]
+
+    return result
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    if "BLAD_STATUS" not in df.columns:
+        df["BLAD_STATUS"] = ""
+
+    raw = df.copy()
+    cols = list(df.columns)
+
+    for col in cols:
+        with span("clean_column", label=col, rows=len(raw)):
+            df[col] = clean_column(col, raw[col])
+
+    # --------------------------------------------------------
+    # BLAD vs Image (cleaned BLAD is the digit-normalized raw value)
+    # --------------------------------------------------------
+    if "BLAD" in cols:
+
+        ocr_blad   = map_unique(cached("BLAD/normalize", normalize_blad), raw["BLAD"])
+        image_blad = map_unique(cached("Image/blad", extract_blad_from_image), raw["Image"])
+
+        df["BLAD"] = ocr_blad
+
+        # the row-wise loop flagged ERROR while visiting BLAD, so it only
+        # survives if BLAD_STATUS had already been cleaned by then
+        if cols.index("BLAD_STATUS") < cols.index("BLAD"):
+            mismatch = image_blad.ne("") & ocr_blad.ne(image_blad)
+            df.loc[mismatch, "BLAD_STATUS"] = "ERROR"
+
+    # --------------------------------------------------------
+    # RITNINGSNUMMER_PROJEKT vs Image (one-character OCR slips)
+    # --------------------------------------------------------
+    if "RITNINGSNUMMER_PROJEKT" in cols:
+
+        ocr_val   = df["RITNINGSNUMMER_PROJEKT"].astype(str).str.strip().str.upper()
+        image_val = map_unique(cached("Image/rnp", extract_rnp_from_image), raw["Image"]).astype(str).str.strip().str.upper()
+
+        use_image = single_char_difference_cols(ocr_val, image_val)
+
+        df["RITNINGSNUMMER_PROJEKT"] = ocr_val.where(~use_image, image_val)
+
+    return df
+
+# ============================================================
+# ROW-WISE REFERENCE (previous engine, kept for the benchmark)
+# ============================================================
+def clean_frame_rowwise(df: pd.DataFrame) -> pd.DataFrame:
+
+    df = df.copy()
     df.columns = df.columns.str.strip()
     if "BLAD_STATUS" not in df.columns:
         df["BLAD_STATUS"] = ""
@@ -615,9 +883,26 @@ def main():
 
             df.at[idx, col] = cleaned_value
 
-    df.to_excel(OUTPUT_EXCEL, index=False)
+    return df
+
+# ============================================================
+# RUN
+# ============================================================
+def main(input_path=INPUT_PATH, output_path=OUTPUT_PATH):
+
+    df = clean_frame(read_frame(input_path))
+
+    write_frame(df, output_path)
+
+    stats = CLEANER_CACHE.stats()
+    print(
+        f"CLEANER CACHE: {stats['hits']} hits, {stats['misses']} misses, "
+        f"hit rate {stats['hit_rate']:.1%}, {stats['size']} entries"
+    )
+
+    print(" CLEANING COMPLETE:", output_path)
 
-    print(" CLEANING COMPLETE:", OUTPUT_EXCEL)
+    return output_path
 
 if __name__ == "__main__":
     main()
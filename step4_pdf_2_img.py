@@ -1,9 +1,10 @@
 import os
-import fitz  # PyMuPDF
-import numpy as np
-import cv2
 from pathlib import Path
 
+from render_cache import render_page, render_region, release_page, REV_SEARCH_RECT, CLIP_GRAY_RENDER
+from checkpoint import write_image_atomic, RESUME_RUN
+from metrics import span
+
 # ==========================================================
 # BASE PATH (STREAMLIT SAFE)
 # ==========================================================
@@ -14,47 +15,91 @@ OUT_DIR    = BASE_DIR / "rev_crops"
 
 DPI = 300
 
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-# PDF TO IMAGE 
+# PDF TO IMAGE (SHARED RENDER CACHE, FIRST PAGE ONLY)
 
 def pdf_to_image(pdf_path, dpi=300):
+    return render_page(pdf_path, page=0, dpi=dpi)
+
+
+# ONLY THE REVISION SEARCH WINDOW (CLIP + GRAYSCALE)
+# step5 must be told the image covers REV_SEARCH_RECT (page_region argument)
+
+def pdf_to_rev_region(pdf_path, dpi=300):
+    return render_region(pdf_path, REV_SEARCH_RECT, dpi=dpi, gray=True)
+
+
+# ==========================================================
+# ONE DOCUMENT
+# ==========================================================
+
+def save_rev_page(pdf_path, out_path, dpi=DPI, clip_gray=CLIP_GRAY_RENDER):
+
+    pdf_path = Path(pdf_path)
+
+    with span("render_rev", doc=pdf_path.name, clip_gray=clip_gray) as s:
+
+        if clip_gray:
+            img = pdf_to_rev_region(str(pdf_path), dpi)
+        else:
+            img = pdf_to_image(str(pdf_path), dpi)
+
+        write_image_atomic(out_path, img)
+
+        s["height"], s["width"] = img.shape[:2]
+
+
+# ==========================================================
+# CONVERT ALL PDFS
+# ==========================================================
+
+def convert_pdfs_for_revision(pdf_folder=PDF_FOLDER, out_dir=OUT_DIR, dpi=DPI, clip_gray=CLIP_GRAY_RENDER, pdf_files=None, resume=RESUME_RUN,
+                              on_progress=None):
+
+    pdf_folder = Path(pdf_folder)
+    out_dir = Path(out_dir)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
 
-    doc = fitz.open(pdf_path)
-    page = doc.load_page(0)  # first page only
+    # pdf_files limits the run to a subset (incremental mode)
+    if pdf_files is None:
+        pdf_files = os.listdir(pdf_folder)
 
-    pix = page.get_pixmap(dpi=dpi)
+    pdf_files = [f for f in pdf_files if f.lower().endswith(".pdf")]
 
-    img = np.frombuffer(pix.samples, dtype=np.uint8)
-    img = img.reshape(pix.height, pix.width, pix.n)
+    print(f"Found {len(pdf_files)} PDFs")
 
-    if pix.n == 4:  # RGBA → RGB
-        img = img[:, :, :3]
+    for i, pdf_file in enumerate(pdf_files):
 
-    doc.close()
-    return img
+        # on_progress(done, total): per-document progress for the job view
+        if on_progress:
+            on_progress(i, len(pdf_files))
 
+        pdf_path = pdf_folder / pdf_file
+        base = Path(pdf_file).stem
+        out_path = out_dir / f"{base}_p001.png"
 
-pdf_files = [f for f in os.listdir(PDF_FOLDER) if f.lower().endswith(".pdf")]
+        # resume: pages are written atomically, so an existing one is complete
+        if resume and out_path.exists():
+            continue
 
-print(f"Found {len(pdf_files)} PDFs")
+        print(f"Converting - {pdf_file}")
 
-for pdf_file in pdf_files:
+        try:
+            save_rev_page(pdf_path, out_path, dpi, clip_gray)
+            print(f"   Saved - {out_path}")
 
-    pdf_path = PDF_FOLDER / pdf_file
-    base = Path(pdf_file).stem
+        except Exception as e:
+            print(f"ERROR - {pdf_file} - {e}")
 
-    print(f"Converting - {pdf_file}")
+    release_page()
 
-    try:
-        img = pdf_to_image(str(pdf_path), DPI)
+    if on_progress:
+        on_progress(len(pdf_files), len(pdf_files))
 
-        out_path = OUT_DIR / f"{base}_p001.png"
-        cv2.imwrite(str(out_path), img)
+    print("\nDONE")
 
-        print(f"   Saved - {out_path}")
+    return out_dir
 
-    except Exception as e:
-        print(f"ERROR - {pdf_file} - {e}")
 
-print("\nDONE")
\ No newline at end of file
+if __name__ == "__main__":
+    convert_pdfs_for_revision()
@@ -1,11 +1,21 @@
 import os
 import re
+import hashlib
 import cv2
 import numpy as np
 import pandas as pd
 from datetime import datetime
 import easyocr
 from pathlib import Path
+from functools import partial
+
+from render_cache import FULL_PAGE_RECT, REV_SEARCH_RECT, CLIP_GRAY_RENDER
+from handoff import handoff_path, write_frame, REVISION_EXTRACTION
+from checkpoint import checkpoint_path, open_checkpoint, append_row, finished_rows, RESUME_RUN
+from worker_pool import map_ordered, limit_threads, EXTRACT_WORKERS
+from metrics import span
+from db import connect
+from contextlib import closing
 
 # ==========================================================
 # BASE PATH (STREAMLIT SAFE ONLY CHANGE)
@@ -13,11 +23,9 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 
 IMAGE_DIR = BASE_DIR / "rev_crops"
-OUT_EXCEL = BASE_DIR / "revision_extraction.xlsx"
+OUT_PATH  = handoff_path(REVISION_EXTRACTION)
 DEBUG_DIR = BASE_DIR / "revision_extraction"
 
-os.makedirs(DEBUG_DIR, exist_ok=True)
-
 LEFT_FRACTION_DEFAULT   = 0.72
 TOP_FRACTION_DEFAULT    = 0.79
 RIGHT_FRACTION_DEFAULT  = 0.86
@@ -28,7 +36,23 @@ BOTTOM_FRACTION_LOGO = 0.885
 
 MAX_DIM = 2200
 
-reader = easyocr.Reader(["en"], gpu=False)
+# document catalog: bump when a change alters the extracted rows, so
+# cached outputs of earlier versions are extracted again (doc_catalog.py)
+CATALOG_VERSION = 1
+
+# ==========================================================
+# OCR READER (LOADED ONCE PER PROCESS, KEPT RESIDENT)
+# ==========================================================
+_reader = None
+
+def get_reader():
+
+    global _reader
+
+    if _reader is None:
+        _reader = easyocr.Reader(["en"], gpu=False)
+
+    return _reader
 
 # ==========================================================
 # REGEX
@@ -122,6 +146,119 @@ PREPROCESSORS = [
     ("LIGHT", preprocess_light_text),
 ]
 
+# ==========================================================
+# ADAPTIVE PREPROCESSOR ORDER (ADAPTIVE_REV_OCR=1, OFF BY DEFAULT)
+# ==========================================================
+# Crops try the preprocessors best-first and stop at the first confident
+# pick from a detected table, usually after one OCR pass instead of three.
+# Each pass that ran is scored on its own: a hit if its candidates alone
+# give such a pick. Drawings whose name hashes to 0 mod EXPLORE_EVERY run
+# all passes, so passes that early exits keep skipping still get measured.
+#
+# The order is taken from rev_ocr_stats.db once per run (preprocessor_order)
+# and handed to every document, so within a run the result does not depend
+# on document order or on the worker count. It can still differ from the
+# full pass: an early exit keeps the first confident pick, not the topmost
+# one across all three passes. Hence off by default.
+#
+# Counts are kept in memory and added to rev_ocr_stats.db once per drawing
+# (flush_preprocessor_stats). ADAPTIVE_REV_OCR=0 runs every pass in the
+# fixed order and records nothing.
+
+ADAPTIVE_REV_OCR = os.environ.get("ADAPTIVE_REV_OCR", "0") == "1"
+EARLY_EXIT_CONF = 0.60
+EXPLORE_EVERY = int(os.environ.get("ADAPTIVE_EXPLORE_EVERY", "10"))
+
+if EXPLORE_EVERY < 1:
+    raise ValueError(f"ADAPTIVE_EXPLORE_EVERY must be >= 1, got {EXPLORE_EVERY}")
+
+REGIONS = ("FIXED", "LOGO")
+
+STATS_DB = BASE_DIR / "rev_ocr_stats.db"
+
+STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS preprocessor_stats (
+    region       TEXT NOT NULL,
+    preprocessor TEXT NOT NULL,
+    tries        INTEGER NOT NULL,
+    hits         INTEGER NOT NULL,
+    PRIMARY KEY (region, preprocessor)
+)
+"""
+
+# this process's counts not yet written to STATS_DB:
+# (region, preprocessor) -> [tries, hits]
+_pending = {}
+
+def open_stats(db_path=STATS_DB):
+
+    conn = connect(db_path)
+    conn.execute(STATS_SCHEMA)
+
+    return conn
+
+def load_preprocessor_stats():
+
+    with closing(open_stats()) as conn:
+        rows = conn.execute("SELECT region, preprocessor, tries, hits FROM preprocessor_stats").fetchall()
+
+    return {(r, p): (t, h) for r, p, t, h in rows}
+
+def success_rate(stats, region, ptag):
+
+    # Laplace-smoothed: untried preprocessors start at 0.5
+    tries, hits = stats.get((region, ptag), (0, 0))
+    return (hits + 1) / (tries + 2)
+
+def preprocessor_order(stats=None):
+
+    # {region: [preprocessor, ...]} for the whole run, None when adaptive
+    # mode is off; stable sort, so ties keep the PREPROCESSORS order
+    if not ADAPTIVE_REV_OCR:
+        return None
+
+    if stats is None:
+        stats = load_preprocessor_stats()
+
+    return {
+        region: [p for p, _ in sorted(PREPROCESSORS, key=lambda p: -success_rate(stats, region, p[0]))]
+        for region in REGIONS
+    }
+
+def is_explore_crop(name):
+
+    # by document name: the same drawings explore in every run and worker
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return int(digest, 16) % EXPLORE_EVERY == 0
+
+def is_confident(candidate):
+    return candidate is not None and candidate[0] >= EARLY_EXIT_CONF
+
+def record_preprocessor_stats(region, results):
+
+    # results: [(preprocessor, hit)] for the passes this crop ran; only
+    # written to STATS_DB, the running order stays the run's snapshot
+    for ptag, hit in results:
+        entry = _pending.setdefault((region, ptag), [0, 0])
+        entry[0] += 1
+        entry[1] += int(hit)
+
+def flush_preprocessor_stats():
+
+    # increments, so worker processes can all add to the same rows
+    if not _pending:
+        return
+
+    rows = [(r, p, t, h) for (r, p), (t, h) in _pending.items()]
+    _pending.clear()
+
+    with closing(open_stats()) as conn, conn:
+        conn.executemany("""
+            INSERT INTO preprocessor_stats (region, preprocessor, tries, hits) VALUES (?, ?, ?, ?)
+            ON CONFLICT(region, preprocessor) DO UPDATE SET
+                tries = tries + excluded.tries, hits = hits + excluded.hits
+        """, rows)
+
 # ==========================================================
 # HELPERS
 # ==========================================================
@@ -208,8 +345,86 @@ def extract_rev_from_text_safely(txt: str):
 # OCR ENGINE
 # ==========================================================
 
-def run_ocr_on_crop(gray_crop, name, tag):
+def collect_candidates(ocr, ptag, all_candidates, rev_row_candidates):
+
+    # entries: (conf, y_center, rev, date, preprocessor)
+    for bbox, txt, conf in ocr:
+
+        if conf < 0.30:
+            continue
+
+        print(f"Detected - '{txt}' | CONF = {conf:.3f}")
+
+        txt_raw = txt
+        txt_clean = txt.strip().upper()
+
+        date = parse_date(txt_clean)
+
+        ys = [p[1] for p in bbox]
+        y_center = sum(ys) / 4
+
+        rev_from_word = extract_revision_from_word(txt_clean)
+        if rev_from_word:
+            entry = (conf, y_center, rev_from_word, date, ptag)
+            all_candidates.append(entry)
+            if is_rev_row(txt_raw):
+                rev_row_candidates.append(entry)
+
+        if txt_clean in OCR_REV_MAP:
+            rev = OCR_REV_MAP[txt_clean]
+            entry = (conf, y_center, rev, None, ptag)
+            all_candidates.append(entry)
+            if is_rev_row(txt_raw):
+                rev_row_candidates.append(entry)
+
+        token = repair_ocr_token(txt_clean)
+        width = bbox_width(bbox)
+
+        if width <= 120:
+            m = re.match(r"^([A-G])(?:\.([1-9]))?$", token)
+            if m:
+                rev = normalize_revision(m.group(1), m.group(2))
+                entry = (conf, y_center, rev, date, ptag)
+                all_candidates.append(entry)
+                if is_rev_row(txt_raw):
+                    rev_row_candidates.append(entry)
+
+        rev_long = extract_rev_from_text_safely(txt_raw)
+        if rev_long:
+            entry = (conf, y_center, rev_long, date, ptag)
+            all_candidates.append(entry)
+            if is_rev_row(txt_raw):
+                rev_row_candidates.append(entry)
+
+def select_candidate(all_candidates, rev_row_candidates, verbose=True):
+
+    # topmost REV-row candidate, else topmost candidate; None without a table
+    if not (rev_row_candidates or all_candidates):
+        if verbose:
+            print("No revision candidates found")
+        return None
+
+    if not has_table_structure(all_candidates):
+        if verbose:
+            print("NO TABLE DETECTED - RETURN EMPTY")
+        return None
+
+    if verbose:
+        print("TABLE DETECTED")
+
+    if rev_row_candidates:
+        if verbose:
+            print("USING REV ROW PRIORITY")
+        return min(rev_row_candidates, key=lambda x: x[1])
+
+    if verbose:
+        print("FALLBACK - ORIGINAL LOGIC")
+    return min(all_candidates, key=lambda x: x[1])
+
+def run_ocr_on_crop(gray_crop, name, tag, order=None):
 
+    # order: {region: [preprocessor, ...]} from preprocessor_order() turns
+    # on the adaptive mode; None runs all passes in the fixed order
     if gray_crop is None or gray_crop.size == 0:
         return None, None
 
@@ -217,92 +432,62 @@ def run_ocr_on_crop(gray_crop, name, tag):
 
     all_candidates = []
     rev_row_candidates = []
+    results = []
 
-    for ptag, fn in PREPROCESSORS:
-
-        proc = fn(gray_crop)
-        if proc is None:
-            continue
+    adaptive = order is not None
+    explore = adaptive and is_explore_crop(name)
 
-        cv2.imwrite(str(DEBUG_DIR / f"{name}_{tag}_{ptag}.png"), proc)
+    preprocessors = PREPROCESSORS
+    if adaptive:
+        fns = dict(PREPROCESSORS)
+        preprocessors = [(ptag, fns[ptag]) for ptag in order[tag]]
 
-        ocr = reader.readtext(proc, detail=1)
+    for ptag, fn in preprocessors:
 
-        print("\n==============================")
-        print(f"OCR RAW - {name} [{tag}-{ptag}]")
-        print("==============================")
+        with span("rev_ocr", doc=name, label=f"{tag}-{ptag}") as s:
 
-        for bbox, txt, conf in ocr:
-
-            if conf < 0.30:
+            proc = fn(gray_crop)
+            if proc is None:
                 continue
 
-            print(f"Detected - '{txt}' | CONF = {conf:.3f}")
+            cv2.imwrite(str(DEBUG_DIR / f"{name}_{tag}_{ptag}.png"), proc)
 
-            txt_raw = txt
-            txt_clean = txt.strip().upper()
+            ocr = get_reader().readtext(proc, detail=1)
 
-            date = parse_date(txt_clean)
+            s["crop_h"], s["crop_w"] = proc.shape[:2]
+            s["hits"] = len(ocr)
 
-            ys = [p[1] for p in bbox]
-            y_center = sum(ys) / 4
+        print("\n==============================")
+        print(f"OCR RAW - {name} [{tag}-{ptag}]")
+        print("==============================")
 
-            rev_from_word = extract_revision_from_word(txt_clean)
-            if rev_from_word:
-                entry = (conf, y_center, rev_from_word, date)
-                all_candidates.append(entry)
-                if is_rev_row(txt_raw):
-                    rev_row_candidates.append(entry)
+        pass_all, pass_rev = [], []
+        collect_candidates(ocr, ptag, pass_all, pass_rev)
 
-            if txt_clean in OCR_REV_MAP:
-                rev = OCR_REV_MAP[txt_clean]
-                entry = (conf, y_center, rev, None)
-                all_candidates.append(entry)
-                if is_rev_row(txt_raw):
-                    rev_row_candidates.append(entry)
+        all_candidates += pass_all
+        rev_row_candidates += pass_rev
 
-            token = repair_ocr_token(txt_clean)
-            width = bbox_width(bbox)
-
-            if width <= 120:
-                m = re.match(r"^([A-G])(?:\.([1-9]))?$", token)
-                if m:
-                    rev = normalize_revision(m.group(1), m.group(2))
-                    entry = (conf, y_center, rev, date)
-                    all_candidates.append(entry)
-                    if is_rev_row(txt_raw):
-                        rev_row_candidates.append(entry)
-
-            rev_long = extract_rev_from_text_safely(txt_raw)
-            if rev_long:
-                entry = (conf, y_center, rev_long, date)
-                all_candidates.append(entry)
-                if is_rev_row(txt_raw):
-                    rev_row_candidates.append(entry)
+        results.append((ptag, is_confident(select_candidate(pass_all, pass_rev, verbose=False))))
 
-    candidates = rev_row_candidates if rev_row_candidates else all_candidates
+        # adaptive: a confident pick from a real table ends the crop here
+        # (except on exploration crops)
+        if adaptive and not explore:
+            if is_confident(select_candidate(all_candidates, rev_row_candidates, verbose=False)):
+                print(f"EARLY EXIT after {ptag}")
+                break
 
-    if not candidates:
-        print("No revision candidates found")
-        return None, None
+    best = select_candidate(all_candidates, rev_row_candidates)
 
-    if not has_table_structure(all_candidates):
-        print("NO TABLE DETECTED - RETURN EMPTY")
+    if adaptive:
+        record_preprocessor_stats(tag, results)
+
+    if best is None:
         return None, None
 
-    print("TABLE DETECTED")
-
-    if rev_row_candidates:
-        print("USING REV ROW PRIORITY")
-        rev_row_candidates.sort(key=lambda x: x[1])
-        conf, y, rev, date = rev_row_candidates[0]
-    else:
-        print("FALLBACK - ORIGINAL LOGIC")
-        all_candidates.sort(key=lambda x: x[1])
-        conf, y, rev, date = all_candidates[0]
+    conf, y, rev, date, ptag = best
 
     print("FINAL SELECTION")
-    print(f"Selected REV - {rev}")
+    print(f"Selected REV - {rev} [{ptag}]")
     print(f"Confidence   - {conf:.3f}")
     print(f"Y Position   - {y:.2f}")
 
@@ -312,67 +497,152 @@ def run_ocr_on_crop(gray_crop, name, tag):
 # IMAGE EXTRACTION
 # ==========================================================
 
-def extract_revision_from_image(gray, name):
+def to_region_fraction(frac, lo, hi):
+    # page fraction → fraction of an image that only covers [lo, hi]
+    return (frac - lo) / (hi - lo)
+
+def extract_revision_from_image(gray, name, page_region=FULL_PAGE_RECT, order=None):
 
     h, w = gray.shape
 
-    x1 = clamp(int(w * LEFT_FRACTION_DEFAULT), 0, w)
-    x2 = clamp(int(w * RIGHT_FRACTION_DEFAULT), 0, w)
+    rx0, ry0, rx1, ry1 = page_region
+
+    def fx(frac):
+        return to_region_fraction(frac, rx0, rx1)
 
-    y1 = clamp(int(h * TOP_FRACTION_DEFAULT), 0, h)
-    y2 = clamp(int(h * BOTTOM_FRACTION_DEFAULT), 0, h)
+    def fy(frac):
+        return to_region_fraction(frac, ry0, ry1)
+
+    x1 = clamp(int(w * fx(LEFT_FRACTION_DEFAULT)), 0, w)
+    x2 = clamp(int(w * fx(RIGHT_FRACTION_DEFAULT)), 0, w)
+
+    y1 = clamp(int(h * fy(TOP_FRACTION_DEFAULT)), 0, h)
+    y2 = clamp(int(h * fy(BOTTOM_FRACTION_DEFAULT)), 0, h)
 
     if y2 > y1:
         print(f"TRY FIXED REGION - {name}")
-        rev, d = run_ocr_on_crop(gray[y1:y2, x1:x2], name, "FIXED")
+        rev, d = run_ocr_on_crop(gray[y1:y2, x1:x2], name, "FIXED", order)
         if rev:
             return rev, d
 
-    y1 = clamp(int(h * TOP_FRACTION_LOGO), 0, h)
-    y2 = clamp(int(h * BOTTOM_FRACTION_LOGO), 0, h)
+    y1 = clamp(int(h * fy(TOP_FRACTION_LOGO)), 0, h)
+    y2 = clamp(int(h * fy(BOTTOM_FRACTION_LOGO)), 0, h)
 
     if y2 > y1:
         print(f"TRY LOGO REGION - {name}")
-        rev, d = run_ocr_on_crop(gray[y1:y2, x1:x2], name, "LOGO")
+        rev, d = run_ocr_on_crop(gray[y1:y2, x1:x2], name, "LOGO", order)
         if rev:
             return rev, d
 
     return None, None
 
 # ==========================================================
-# RUN
+# WORKER SETUP (LOAD READER ONCE PER PROCESS)
 # ==========================================================
 
-rows = []
-image_files = [f for f in os.listdir(IMAGE_DIR) if f.lower().endswith(".png")]
+def init_worker(n_threads=None):
+
+    if n_threads is not None:
+        limit_threads(n_threads)
+
+    os.makedirs(DEBUG_DIR, exist_ok=True)
 
-SAVE_INTERVAL = 10
+    get_reader()
 
-for idx, f in enumerate(image_files, start=1):
+# ==========================================================
+# ONE PAGE IMAGE → ONE ROW
+# ==========================================================
+
+def extract_file(f, image_dir=IMAGE_DIR, page_region=FULL_PAGE_RECT, order=None):
 
     print("\n======================================")
     print(f"PROCESSING - {f}")
     print("======================================")
 
-    img = cv2.imread(str(IMAGE_DIR / f))
-    if img is None:
-        continue
+    with span("rev_doc", doc=f):
+
+        img = cv2.imread(str(Path(image_dir) / f), cv2.IMREAD_UNCHANGED)
+        if img is None:
+            return None
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # clip-mode renders are already single channel
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
 
-    rev, date = extract_revision_from_image(gray, Path(f).stem)
+        rev, date = extract_revision_from_image(gray, Path(f).stem, page_region, order)
+
+    # one stats write per drawing, not per crop
+    flush_preprocessor_stats()
 
     print(f"RESULT - {f} - {rev}")
 
-    rows.append({
+    return {
         "FILE": f,
         "FINAL_REV": rev if rev else "_",
         "REV_DATE": date if date else ""
-    })
+    }
+
+def process_folder(image_dir=IMAGE_DIR, out_path=OUT_PATH, clip_gray=CLIP_GRAY_RENDER, image_files=None, workers=EXTRACT_WORKERS,
+                   resume=RESUME_RUN, on_progress=None, doc_hashes=None):
+
+    image_dir = Path(image_dir)
+    out_path = Path(out_path)
+
+    # step4 in clip mode only renders the revision search window
+    page_region = REV_SEARCH_RECT if clip_gray else FULL_PAGE_RECT
+
+    log_path = checkpoint_path(out_path)
+
+    # image_files limits the run to a subset (incremental mode)
+    if image_files is None:
+        image_files = [f for f in os.listdir(image_dir) if f.lower().endswith(".png")]
+
+    image_files = list(image_files)
+
+    # resume: images already in the checkpoint log are not OCR'd again
+    # (doc_hashes: image name -> source PDF sha256, see checkpoint.finished_rows)
+    done = finished_rows(log_path, "FILE", image_files, hashes=doc_hashes) if resume else {}
+    todo = [f for f in image_files if f not in done]
+
+    if resume:
+        print(f"RESUME step5: {len(done)} done, {len(todo)} remaining")
+
+    # adaptive order snapshot: the same for every document and worker
+    order = preprocessor_order()
+
+    results = map_ordered(
+        partial(extract_file, image_dir=image_dir, page_region=page_region, order=order),
+        todo,
+        workers=workers,
+        initializer=init_worker
+    )
+
+    # on_progress(done, total): per-document progress for the job view
+    processed = len(image_files) - len(todo)
+
+    if on_progress:
+        on_progress(processed, len(image_files))
+
+    # one JSON line per finished image; the table is written once at the end
+    with open_checkpoint(log_path, fresh=not resume) as log:
+
+        for row in results:
+
+            if row is not None:
+                done[row["FILE"]] = row
+                append_row(log, row, (doc_hashes or {}).get(row["FILE"]))
+
+            processed += 1
+
+            if on_progress:
+                on_progress(processed, len(image_files))
+
+    rows = [done[f] for f in image_files if f in done]
+
+    write_frame(pd.DataFrame(rows), out_path)
+    print("DONE")
+
+    return rows
 
-    if idx % SAVE_INTERVAL == 0:
-        pd.DataFrame(rows).to_excel(OUT_EXCEL, index=False)
-        print(f"AUTOSAVED AFTER {idx} IMAGES")
 
-pd.DataFrame(rows).to_excel(OUT_EXCEL, index=False)
-print("DONE")
\ No newline at end of file
+if __name__ == "__main__":
+    process_folder()
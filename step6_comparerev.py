@@ -1,145 +1,154 @@
 import pandas as pd
 import re
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
 from pathlib import Path
 
+from handoff import handoff_path, read_frame, write_frame, CLEANING_FILE, REVISION_EXTRACTION, RAW_VALIDATED
+from excel_writer import write_styled_excel
+
 # ==========================================================
 # BASE PATH (ONLY CHANGE)
 # ==========================================================
 BASE_DIR = Path(__file__).resolve().parent
 
-PATH_28  = BASE_DIR / "cleaning_file.xlsx"
-PATH_REV = BASE_DIR / "revision_extraction.xlsx"
-OUT_PATH = BASE_DIR / "raw_validated.xlsx"
+PATH_28  = handoff_path(CLEANING_FILE)
+PATH_REV = handoff_path(REVISION_EXTRACTION)
+OUT_PATH = handoff_path(RAW_VALIDATED)
+
+# styled copy for manual review (not needed by the pipeline)
+EXPORT_EXCEL = BASE_DIR / "raw_validated.xlsx"
 
 # ==========================================================
-# LOAD EXCELS
+# HELPERS
 # ==========================================================
 
-df_28  = pd.read_excel(PATH_28, dtype=str, keep_default_na=False)
-df_rev = pd.read_excel(PATH_REV, dtype=str, keep_default_na=False)
+def normalize_revision(val: str) -> str:
+    if not val:
+        return ""
+    return val.strip().upper()
 
-# ==========================================================
-# BLAD FIXING
-# ==========================================================
+def is_valid_revision(val: str) -> bool:
+    return bool(re.fullmatch(r"[A-Z](?:\.\d+)?", val))
 
-df_28["BLAD"] = (
-    df_28["BLAD"]
-    .astype(str)
-    .str.strip()
-    .str.zfill(3)
-)
+def is_pure_number(val: str) -> bool:
+    return bool(val and val.strip().isdigit())
 
 # ==========================================================
-# CREATING COMMON KEY
+# COMPARE REVISION VS MAIN
 # ==========================================================
 
-df_28["DOC_KEY"] = (
-    df_28["Image"]
-    .str.replace("_stamp.png", "", regex=False)
-    .str.strip()
-)
+def compare_revisions(path_28=PATH_28, path_rev=PATH_REV, out_path=OUT_PATH, export_excel=None):
 
-df_rev["DOC_KEY"] = (
-    df_rev["FILE"]
-    .str.replace(r"_p\d+", "", regex=True)
-    .str.replace(r"\.(png|pdf)$", "", regex=True, case=False)
-    .str.strip()
-)
+    # ======================================================
+    # LOAD HAND-OFFS
+    # ======================================================
 
-# ==========================================================
-# MERGE
-# ==========================================================
+    df_28  = read_frame(path_28)
+    df_rev = read_frame(path_rev)
 
-df_final = df_28.merge(
-    df_rev[["DOC_KEY", "FINAL_REV"]],
-    on="DOC_KEY",
-    how="left"
-)
+    # ======================================================
+    # BLAD FIXING
+    # ======================================================
 
-df_final.drop(columns=["DOC_KEY"], inplace=True)
+    df_28["BLAD"] = (
+        df_28["BLAD"]
+        .astype(str)
+        .str.strip()
+        .str.zfill(3)
+    )
 
-df_final["REV_STATUS"] = "OK"
+    # ======================================================
+    # CREATING COMMON KEY
+    # ======================================================
 
-# ==========================================================
-# HELPERS
-# ==========================================================
+    df_28["DOC_KEY"] = (
+        df_28["Image"]
+        .str.replace("_stamp.png", "", regex=False)
+        .str.strip()
+    )
 
-def normalize_revision(val: str) -> str:
-    if not val:
-        return ""
-    return val.strip().upper()
+    df_rev["DOC_KEY"] = (
+        df_rev["FILE"]
+        .str.replace(r"_p\d+", "", regex=True)
+        .str.replace(r"\.(png|pdf)$", "", regex=True, case=False)
+        .str.strip()
+    )
 
-def is_valid_revision(val: str) -> bool:
-    return bool(re.fullmatch(r"[A-Z](?:\.\d+)?", val))
+    # ======================================================
+    # MERGE
+    # ======================================================
 
-def is_pure_number(val: str) -> bool:
-    return bool(val and val.strip().isdigit())
+    df_final = df_28.merge(
+        df_rev[["DOC_KEY", "FINAL_REV"]],
+        on="DOC_KEY",
+        how="left"
+    )
 
-# ==========================================================
-# REVISION LOGIC
-# ==========================================================
+    df_final.drop(columns=["DOC_KEY"], inplace=True)
 
-for idx, row in df_final.iterrows():
+    df_final["REV_STATUS"] = "OK"
 
-    andr = normalize_revision(str(row["ANDR"])) if row["ANDR"] else ""
-    rev  = normalize_revision(str(row["FINAL_REV"])) if row["FINAL_REV"] else ""
+    # ======================================================
+    # REVISION LOGIC
+    # ======================================================
 
-    andr_valid = is_valid_revision(andr)
-    rev_valid  = is_valid_revision(rev)
+    for idx, row in df_final.iterrows():
 
-    if is_pure_number(andr):
-        continue
+        andr = normalize_revision(str(row["ANDR"])) if row["ANDR"] else ""
+        rev  = normalize_revision(str(row["FINAL_REV"])) if row["FINAL_REV"] else ""
 
-    if andr_valid and rev_valid and andr != rev:
-        df_final.at[idx, "REV_STATUS"] = "ERROR"
+        andr_valid = is_valid_revision(andr)
+        rev_valid  = is_valid_revision(rev)
 
-    elif andr_valid and not rev_valid:
-        df_final.at[idx, "REV_STATUS"] = "ERROR"
+        if is_pure_number(andr):
+            continue
 
-    elif rev_valid and not andr_valid:
-        df_final.at[idx, "REV_STATUS"] = "ERROR"
+        if andr_valid and rev_valid and andr != rev:
+            df_final.at[idx, "REV_STATUS"] = "ERROR"
 
-# ==========================================================
-# SAVE TO EXCEL
-# ==========================================================
+        elif andr_valid and not rev_valid:
+            df_final.at[idx, "REV_STATUS"] = "ERROR"
+
+        elif rev_valid and not andr_valid:
+            df_final.at[idx, "REV_STATUS"] = "ERROR"
+
+    # ======================================================
+    # SAVE HAND-OFF
+    # ======================================================
 
-df_final.to_excel(OUT_PATH, index=False)
+    # unmatched revisions are empty strings, as after an Excel round trip
+    df_final = df_final.fillna("")
 
-wb = load_workbook(OUT_PATH)
-ws = wb.active
+    write_frame(df_final, out_path)
 
-red_fill = PatternFill(
-    start_color="FFFF0000",
-    end_color="FFFF0000",
-    fill_type="solid"
-)
+    if export_excel:
+        export_styled(df_final, export_excel)
 
-headers = {
-    str(cell.value).strip(): idx + 1
-    for idx, cell in enumerate(ws[1])
-}
+    print("=" * 60)
+    print("DONE ")
+    print("REV_STATUS column added")
+    print("• Errors stored in DATA (not colors)")
+    print("• Stable multi-step pipeline")
+    print("• ANDR vs FINAL_REV mismatches marked")
+    print(out_path)
+    print("=" * 60)
+
+    return out_path
+
+# ==========================================================
+# OPTIONAL STYLED EXPORT
+# ==========================================================
 
-andr_col   = headers["ANDR"]
-rev_col    = headers["FINAL_REV"]
-status_col = headers["REV_STATUS"]
+def export_styled(df_final, out_path=EXPORT_EXCEL):
 
-for row in range(2, ws.max_row + 1):
+    # ANDR and FINAL_REV red on rows with a revision mismatch
+    is_error = df_final["REV_STATUS"].eq("ERROR").to_numpy()
 
-    status = ws.cell(row=row, column=status_col).value
+    mask = pd.DataFrame(False, index=range(len(df_final)), columns=df_final.columns)
+    mask["ANDR"] = is_error
+    mask["FINAL_REV"] = is_error
 
-    if status == "ERROR":
-        ws.cell(row=row, column=andr_col).fill = red_fill
-        ws.cell(row=row, column=rev_col).fill  = red_fill
+    return write_styled_excel(df_final, out_path, mask)
 
-wb.save(OUT_PATH)
 
-print("=" * 60)
-print("DONE ")
-print("REV_STATUS column added")
-print("• Errors stored in DATA (not colors)")
-print("• Stable multi-step pipeline")
-print("• ANDR vs FINAL_REV mismatches marked")
-print(OUT_PATH)
-print("=" * 60)
\ No newline at end of file
+if __name__ == "__main__":
+    compare_revisions(export_excel=EXPORT_EXCEL)
@@ -1,26 +1,31 @@
+import numpy as np
 import pandas as pd
 import re
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
 from pathlib import Path
 
+from handoff import handoff_path, read_frame, write_frame, RAW_VALIDATED, VALIDATION_FILE, VALIDATION_ERRORS
+from excel_writer import write_styled_excel
+
 # ============================================================
 # BASE PATH (ONLY CHANGE)
 # ============================================================
 BASE_DIR = Path(__file__).resolve().parent
 
-DATA_FILE   = BASE_DIR / "raw_validated.xlsx"
+DATA_FILE   = handoff_path(RAW_VALIDATED)
 MASTER_FILE = BASE_DIR / "mastercopy_labels.xlsx"
 OUTPUT_FILE = BASE_DIR / "validation_file.xlsx"
 
-# ============================================================
-# LOAD DATA
-# ============================================================
-df = pd.read_excel(DATA_FILE, dtype=str, keep_default_na=False)
+# same rows as OUTPUT_FILE, for the SQL load / app (no styling)
+OUTPUT_HANDOFF = handoff_path(VALIDATION_FILE)
 
-master_value    = pd.read_excel(MASTER_FILE, sheet_name="VALUE",    dtype=str, keep_default_na=False)
-master_pattern  = pd.read_excel(MASTER_FILE, sheet_name="PATTERN",  dtype=str, keep_default_na=False)
-master_freetext = pd.read_excel(MASTER_FILE, sheet_name="FREETEXT", dtype=str, keep_default_na=False)
+# failing cells in long format (document, column, rule) for SQLite
+ERRORS_HANDOFF = handoff_path(VALIDATION_ERRORS)
+
+EMPTY_ALLOWED = {
+    "BANDEL","BLAD","NASTA_BLAD","KILOMETER_METER","ANDR",
+    "ANLAGGNINGSTYP","GRANSKNINGSSTATUS_SYFTE","HANDLINGSTYP",
+    "SKALA","FORMAT","DATUM","TEKNIKOMRADE"
+}
 
 # ============================================================
 # CLEAN MASTER TABLES
@@ -31,187 +36,292 @@ def clean_master(df):
         df["VALUE"] = df["VALUE"].astype(str).str.strip()
     return df
 
-master_value    = clean_master(master_value)
-master_pattern  = clean_master(master_pattern)
-master_freetext = clean_master(master_freetext)
-
 # ============================================================
 # RULE LOOKUPS
 # ============================================================
-value_rules   = master_value.groupby("LABEL")["VALUE"].apply(set).to_dict()
-pattern_rules = master_pattern.groupby("LABEL")["VALUE"].apply(list).to_dict()
-freetext_labels = set(master_freetext["LABEL"])
+def load_master_rules(master_file=MASTER_FILE):
 
-EMPTY_ALLOWED = {
-    "BANDEL","BLAD","NASTA_BLAD","KILOMETER_METER","ANDR",
-    "ANLAGGNINGSTYP","GRANSKNINGSSTATUS_SYFTE","HANDLINGSTYP",
-    "SKALA","FORMAT","DATUM","TEKNIKOMRADE"
-}
+    master_value    = pd.read_excel(master_file, sheet_name="VALUE",    dtype=str, keep_default_na=False)
+    master_pattern  = pd.read_excel(master_file, sheet_name="PATTERN",  dtype=str, keep_default_na=False)
+    master_freetext = pd.read_excel(master_file, sheet_name="FREETEXT", dtype=str, keep_default_na=False)
+
+    master_value    = clean_master(master_value)
+    master_pattern  = clean_master(master_pattern)
+    master_freetext = clean_master(master_freetext)
+
+    value_rules   = master_value.groupby("LABEL")["VALUE"].apply(set).to_dict()
+    pattern_rules = master_pattern.groupby("LABEL")["VALUE"].apply(list).to_dict()
+    freetext_labels = set(master_freetext["LABEL"])
+
+    return value_rules, pattern_rules, freetext_labels
 
 # ============================================================
-# WRITE DATA FIRST
+# BLAD vs IMAGE HELPER
 # ============================================================
-df.to_excel(OUTPUT_FILE, index=False)
 
-wb = load_workbook(OUTPUT_FILE)
-ws = wb.active
+def extract_digits_from_image(image_name):
+
+    if not image_name:
+        return ""
+
+    name = str(image_name).upper()
 
-RED = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
+    name = name.replace("_PDF_STAMP.PNG", "")
+    name = name.replace("_STAMP.PNG", "")
+    name = name.replace(".PNG", "")
 
-headers = {str(cell.value).strip(): idx + 1 for idx, cell in enumerate(ws[1])}
+    m = re.search(r"-([0-9]{2,4})$", name)
 
-andr_col   = headers["ANDR"]
-rev_col    = headers["FINAL_REV"]
-status_col = headers["REV_STATUS"]
+    return m.group(1) if m else ""
 
 # ============================================================
-# REVISION ERRORS
+# COMPILED PATTERN RULES
 # ============================================================
-for row_idx in range(2, len(df) + 2):
+WS_PATTERN = re.compile(r"\s+")
 
-    status = ws.cell(row=row_idx, column=status_col).value
+# \1 or (?P<name>...) / (?P=name): group numbers and names are per pattern,
+# joining such a pattern into an alternation would change what it matches
+GROUP_REF = re.compile(r"\\[1-9]|\(\?P[<=]")
 
-    if status == "ERROR":
-        ws.cell(row=row_idx, column=andr_col).fill = RED
-        ws.cell(row=row_idx, column=rev_col).fill  = RED
+def compile_pattern_rules(pattern_rules):
 
-# ============================================================
-# RNP SUBSET OF IMAGE
-# ============================================================
-image_col = headers["Image"]
-rnp_col   = headers["RITNINGSNUMMER_PROJEKT"]
+    # one alternation per label: fullmatch(a|b|c) == any(fullmatch(a), ...);
+    # patterns with backreferences or named groups are checked on their own
+    compiled = {}
 
-for row_idx in range(2, len(df) + 2):
+    for label, pats in pattern_rules.items():
 
-    if ws.cell(row=row_idx, column=status_col).value == "ERROR":
-        continue
+        pats = [p for p in pats if p]
 
-    image_name = str(ws.cell(row=row_idx, column=image_col).value).strip()
-    rnp_value  = str(ws.cell(row=row_idx, column=rnp_col).value).strip()
+        if not pats:
+            compiled[label] = None
+            continue
 
-    if not image_name or not rnp_value:
-        continue
+        alone  = [p for p in pats if GROUP_REF.search(p)]
+        joined = [p for p in pats if not GROUP_REF.search(p)]
 
-    image_base = (
-        image_name
-        .replace("_stamp.png", "")
-        .replace(".png", "")
-        .strip()
-    )
+        try:
+            compiled[label] = [re.compile("|".join(f"(?:{p})" for p in joined))] if joined else []
+        except re.error:
+            # e.g. inline flags that are only legal at the start of a pattern
+            compiled[label] = [re.compile(p) for p in joined]
+
+        compiled[label] += [re.compile(p) for p in alone]
+
+    return compiled
+
+def fullmatch_any(patterns, value):
+    return patterns is not None and any(p.fullmatch(value) for p in patterns)
 
-    if rnp_value not in image_base:
-        ws.cell(row=row_idx, column=rnp_col).fill = RED
-        
 # ============================================================
-# BLAD vs IMAGE VALIDATION
+# COLUMN HELPERS
 # ============================================================
+def map_unique(fn, s: pd.Series) -> pd.Series:
 
-def extract_digits_from_image(image_name):
+    # OCR values repeat a lot; evaluate each distinct value once
+    lookup = {u: fn(u) for u in pd.unique(s)}
+    return pd.Series([lookup[v] for v in s], index=s.index, dtype=object)
 
-    if not image_name:
-        return ""
+def has_value(s: pd.Series) -> pd.Series:
 
-    name = str(image_name).upper()
+    # "" and NaN come back from the xlsx as empty (None) cells
+    return s.notna() & s.astype(str).ne("")
 
-    name = name.replace("_PDF_STAMP.PNG", "")
-    name = name.replace("_STAMP.PNG", "")
-    name = name.replace(".PNG", "")
+def as_cell_text(s: pd.Series) -> pd.Series:
 
-    m = re.search(r"-([0-9]{2,4})$", name)
+    # str(cell.value) of the reloaded workbook: empty cells read "None"
+    return s.where(has_value(s), "None").astype(str)
 
-    return m.group(1) if m else ""
+def as_value(s: pd.Series) -> pd.Series:
 
+    # str(cell.value).strip() if cell.value else ""
+    return s.where(has_value(s), "").astype(str).str.strip()
 
-blad_col = headers["BLAD"]
-image_col = headers["Image"]
+def blad_mismatch(blad_value, image_digits):
 
-for row_idx in range(2, len(df) + 2):
+    try:
+        return int(blad_value) != int(image_digits)
+    except:
+        return True
 
-    if ws.cell(row=row_idx, column=status_col).value == "ERROR":
-        continue
+# ============================================================
+# VALIDATION ENGINE (ERRORS AS DATA)
+# ============================================================
+# Returns one row per failing cell: (row, column, rule), with row the
+# 0-based position in df. Rule types:
+#   REV_STATUS  ANDR / FINAL_REV of a row flagged by step6
+#   RNP_IMAGE   RITNINGSNUMMER_PROJEKT not part of the image name
+#   BLAD_IMAGE  BLAD differs from the sheet number in the image name
+#   EMPTY       empty where the master requires a value
+#   VALUE       not one of the master VALUE entries
+#   PATTERN     matches none of the master PATTERN entries
+ERROR_COLUMNS = ["row", "column", "rule"]
 
-    blad_raw = ws.cell(row=row_idx, column=blad_col).value
-    blad_value = str(blad_raw).strip() if blad_raw else ""
+def find_errors(df, value_rules, pattern_rules, freetext_labels):
 
-    image_name = ws.cell(row=row_idx, column=image_col).value
+    df = df.reset_index(drop=True)
+    df.columns = df.columns.str.strip()
 
-    if blad_value in ("", "0", "00", "000", "0000"):
-        continue
+    compiled = compile_pattern_rules(pattern_rules)
 
-    if not image_name:
-        continue
+    found = []
 
-    image_digits = extract_digits_from_image(image_name)
+    def add(mask, col, rule):
+        rows = np.flatnonzero(mask.to_numpy(dtype=bool))
+        if len(rows):
+            found.append(pd.DataFrame({"row": rows, "column": col, "rule": rule}))
 
-    if not image_digits:
-        continue
+    rev_error = df["REV_STATUS"].eq("ERROR")
+    checked   = ~rev_error
 
-    try:
-        if int(blad_value) != int(image_digits):
-            ws.cell(row=row_idx, column=blad_col).fill = RED
-    except:
-        ws.cell(row=row_idx, column=blad_col).fill = RED
+    # --------------------------------------------------------
+    # REVISION ERRORS
+    # --------------------------------------------------------
+    add(rev_error, "ANDR", "REV_STATUS")
+    add(rev_error, "FINAL_REV", "REV_STATUS")
 
-# ============================================================
-# MASTER VALIDATION LOOP
-# ============================================================
-for col_idx, col_name in enumerate(df.columns, start=1):
+    # --------------------------------------------------------
+    # RNP SUBSET OF IMAGE
+    # --------------------------------------------------------
+    image_name = as_cell_text(df["Image"]).str.strip()
+    rnp_value  = as_cell_text(df["RITNINGSNUMMER_PROJEKT"]).str.strip()
 
-    col_name = col_name.strip()
+    image_base = (
+        image_name
+        .str.replace("_stamp.png", "", regex=False)
+        .str.replace(".png", "", regex=False)
+        .str.strip()
+    )
 
-    if col_name in ("ANDR", "FINAL_REV", "REV_STATUS"):
-        continue
+    rnp_candidate = checked & image_name.ne("") & rnp_value.ne("")
+    rnp_missing = pd.Series(False, index=df.index)
+    rnp_missing[rnp_candidate] = [
+        r not in b for r, b in zip(rnp_value[rnp_candidate], image_base[rnp_candidate])
+    ]
+
+    add(rnp_missing, "RITNINGSNUMMER_PROJEKT", "RNP_IMAGE")
+
+    # --------------------------------------------------------
+    # BLAD vs IMAGE VALIDATION
+    # --------------------------------------------------------
+    blad_value   = as_value(df["BLAD"])
+    image_digits = map_unique(extract_digits_from_image, df["Image"].where(has_value(df["Image"]), ""))
+
+    blad_candidate = (
+        checked
+        & ~blad_value.isin(["", "0", "00", "000", "0000"])
+        & has_value(df["Image"])
+        & image_digits.ne("")
+    )
 
-    for row_idx in range(2, len(df) + 2):
+    pairs = pd.Series(list(zip(blad_value, image_digits)), index=df.index)
+    blad_wrong = pd.Series(False, index=df.index)
+    blad_wrong[blad_candidate] = map_unique(lambda p: blad_mismatch(*p), pairs[blad_candidate]).astype(bool)
 
-        if ws.cell(row=row_idx, column=status_col).value == "ERROR":
-            continue
+    add(blad_wrong, "BLAD", "BLAD_IMAGE")
 
-        cell = ws.cell(row=row_idx, column=col_idx)
-        value = str(cell.value).strip() if cell.value else ""
+    # --------------------------------------------------------
+    # MASTER RULES
+    # --------------------------------------------------------
+    for col_name in df.columns:
 
-        if col_name in freetext_labels:
+        if col_name in ("ANDR", "FINAL_REV", "REV_STATUS"):
             continue
 
-        if col_name in value_rules:
-            if value == "":
-                if col_name not in EMPTY_ALLOWED:
-                    cell.fill = RED
-                continue
+        if col_name in freetext_labels:
+            continue
 
-            if value not in value_rules[col_name]:
-                cell.fill = RED
+        if col_name not in value_rules and col_name not in pattern_rules:
             continue
 
-        if col_name in pattern_rules:
-            if value == "":
-                if col_name not in EMPTY_ALLOWED:
-                    cell.fill = RED
-                continue
+        value = as_value(df[col_name])
+        empty = value.eq("")
 
-            value_nospace = re.sub(r"\s+", "", value)
+        if col_name not in EMPTY_ALLOWED:
+            add(checked & empty, col_name, "EMPTY")
 
-            if not any(
-                re.fullmatch(pat, value_nospace)
-                for pat in pattern_rules[col_name]
-                if pat
-            ):
-                cell.fill = RED
+        if col_name in value_rules:
+            allowed = value_rules[col_name]
+            add(checked & ~empty & ~value.isin(allowed), col_name, "VALUE")
             continue
 
-# ============================================================
-# SAVE EXCEL
-# ============================================================
-wb.save(OUTPUT_FILE)
+        patterns = compiled[col_name]
+        matched = map_unique(lambda v: fullmatch_any(patterns, WS_PATTERN.sub("", v)), value).astype(bool)
+
+        add(checked & ~empty & ~matched, col_name, "PATTERN")
+
+    if not found:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+
+    return pd.concat(found, ignore_index=True)
+
+def error_table(errors, df):
+
+    # (row, column, rule) → (document, column, rule); document is the
+    # Image name, the drawing key used by validation_file
+    images = df["Image"].reset_index(drop=True).fillna("").astype(str).str.strip()
+
+    return pd.DataFrame({
+        "document": images.iloc[errors["row"].to_numpy(dtype=int)].to_numpy(),
+        "column": errors["column"].to_numpy(),
+        "rule": errors["rule"].to_numpy(),
+    }, columns=["document", "column", "rule"])
+
+def error_mask(errors, df):
+
+    # boolean frame shaped like df, True where a cell failed any rule
+    mask = pd.DataFrame(False, index=range(len(df)), columns=df.columns.str.strip())
+
+    for col, rows in errors.groupby("column")["row"]:
+        mask.iloc[rows.to_numpy(), mask.columns.get_loc(col)] = True
+
+    return mask
 
 # ============================================================
-# CSV EXPORT
+# MASTER VALIDATION
 # ============================================================
-csv_file = str(OUTPUT_FILE).replace(".xlsx", ".csv")
+def validate_against_master(data_file=DATA_FILE, master_file=MASTER_FILE, output_file=OUTPUT_FILE,
+                            output_handoff=OUTPUT_HANDOFF, errors_handoff=ERRORS_HANDOFF):
+
+    # ========================================================
+    # LOAD DATA
+    # ========================================================
+    df = read_frame(data_file)
+
+    value_rules, pattern_rules, freetext_labels = load_master_rules(master_file)
+
+    # ========================================================
+    # VALIDATE (DATA ONLY)
+    # ========================================================
+    errors = find_errors(df, value_rules, pattern_rules, freetext_labels)
+
+    print(f"Validation errors: {len(errors)} cells in {errors['row'].nunique()} rows")
+
+    # ========================================================
+    # STYLED EXCEL (FILLS APPLIED WHILE WRITING)
+    # ========================================================
+    write_styled_excel(df, output_file, error_mask(errors, df))
+
+    # ========================================================
+    # HAND-OFF FOR SQL / APP
+    # ========================================================
+    write_frame(df, output_handoff)
+    write_frame(error_table(errors, df), errors_handoff)
+
+    # ========================================================
+    # CSV EXPORT
+    # ========================================================
+    csv_file = str(output_file).replace(".xlsx", ".csv")
+
+    # straight from the frame; empty cells stay "" as before
+    df.fillna("").to_csv(csv_file, index=False, encoding="utf-8-sig")
+
+    print("\nSTEP-3 VALIDATION COMPLETE")
+    print("Excel Output:", output_file)
+    print("CSV Output:", csv_file)
+
+    return output_file
 
-df_csv = pd.read_excel(OUTPUT_FILE, dtype=str, keep_default_na=False)
-df_csv.to_csv(csv_file, index=False, encoding="utf-8-sig")
 
-print("\nSTEP-3 VALIDATION COMPLETE")
-print("Excel Output:", OUTPUT_FILE)
-print("CSV Output:", csv_file)
\ No newline at end of file
+if __name__ == "__main__":
+    validate_against_master()
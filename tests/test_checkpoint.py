@@ -0,0 +1,104 @@
+import io
+import os
+
+import checkpoint
+from checkpoint import (
+    load_manifest, mark_stage, complete_manifest,
+    open_checkpoint, append_row, finished_rows
+)
+
+
+def make_inputs(tmp_path, names=("A.pdf", "B.pdf")):
+
+    pdf_dir = tmp_path / "pdf_input"
+    pdf_dir.mkdir()
+
+    for name in names:
+        (pdf_dir / name).write_bytes(f"%PDF {name}".encode())
+
+    return pdf_dir, sorted(names)
+
+
+def test_fresh_run_does_not_read_the_pdfs(tmp_path, monkeypatch):
+
+    pdf_dir, names = make_inputs(tmp_path)
+
+    real_open = io.open
+
+    def no_pdf_reads(file, *args, **kwargs):
+        assert not str(file).endswith(".pdf"), "PDF read on a fresh run"
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(io, "open", no_pdf_reads)
+    monkeypatch.setattr("builtins.open", no_pdf_reads)
+
+    manifest, resumed, changed = load_manifest(tmp_path / "run", names, pdf_dir, resume=False)
+
+    assert not resumed and changed == []
+    assert set(manifest["pdf_stats"]) == set(names)
+
+
+def test_resume_keeps_stages_of_unchanged_pdfs(tmp_path):
+
+    pdf_dir, names = make_inputs(tmp_path)
+    run_dir = tmp_path / "run"
+
+    manifest, _, _ = load_manifest(run_dir, names, pdf_dir, resume=False)
+    mark_stage(run_dir, manifest, "step1")
+
+    manifest, resumed, changed = load_manifest(run_dir, names, pdf_dir, resume=True)
+
+    assert resumed and changed == []
+    assert "step1" in manifest["stages"]
+
+
+def test_resume_redoes_replaced_pdf(tmp_path):
+
+    pdf_dir, names = make_inputs(tmp_path)
+    run_dir = tmp_path / "run"
+
+    manifest, _, _ = load_manifest(run_dir, names, pdf_dir, resume=False, hashes={"A.pdf": "a1", "B.pdf": "b1"})
+    mark_stage(run_dir, manifest, "step1")
+
+    # A replaced, B only touched (same content hash)
+    (pdf_dir / "A.pdf").write_bytes(b"%PDF new content")
+    os.utime(pdf_dir / "A.pdf", ns=(1, 1))
+    os.utime(pdf_dir / "B.pdf", ns=(2, 2))
+
+    manifest, resumed, changed = load_manifest(run_dir, names, pdf_dir, resume=True, hashes={"A.pdf": "a2", "B.pdf": "b1"})
+
+    assert resumed and changed == ["A.pdf"]
+    assert manifest["stages"] == {}
+
+
+def test_resume_after_finished_run_starts_fresh(tmp_path):
+
+    pdf_dir, names = make_inputs(tmp_path)
+    run_dir = tmp_path / "run"
+
+    manifest, _, _ = load_manifest(run_dir, names, pdf_dir, resume=False)
+    mark_stage(run_dir, manifest, "step1")
+    complete_manifest(run_dir)
+
+    manifest, resumed, _ = load_manifest(run_dir, names, pdf_dir, resume=True)
+
+    assert not resumed and manifest["stages"] == {}
+
+
+def test_finished_rows_skip_rows_of_another_pdf_version(tmp_path):
+
+    log = tmp_path / "raw_extraction.jsonl"
+
+    with open_checkpoint(log) as fh:
+        append_row(fh, {"Image": "A_stamp.png", "TITLE": "old"}, sha256="a1")
+        append_row(fh, {"Image": "B_stamp.png", "TITLE": "b"}, sha256="b1")
+
+    # cut-off last line from a crash
+    with open(log, "a", encoding="utf-8") as fh:
+        fh.write('{"Image": "C_st')
+
+    done = finished_rows(log, "Image", ["A_stamp.png", "B_stamp.png", "C_stamp.png"],
+                         hashes={"A_stamp.png": "a2", "B_stamp.png": "b1"})
+
+    assert list(done) == ["B_stamp.png"]
+    assert checkpoint.HASH_FIELD not in done["B_stamp.png"]
@@ -0,0 +1,75 @@
+import sqlite3
+
+import doc_catalog
+from doc_catalog import (
+    open_catalog, clear_catalog, hash_pdf, load_outputs, save_outputs, stage_version, STAGE_EXTRACT
+)
+
+
+def test_outputs_hit_only_for_same_version(tmp_path):
+
+    conn = open_catalog(tmp_path / "doc_catalog.db")
+
+    save_outputs(conn, STAGE_EXTRACT, {"sha-a": {"TITLE": "PLAN"}}, {"sha-a": "A.pdf"}, "v1")
+
+    assert load_outputs(conn, STAGE_EXTRACT, ["sha-a", "sha-b"], "v1") == {"sha-a": {"TITLE": "PLAN"}}
+    assert load_outputs(conn, STAGE_EXTRACT, ["sha-a"], "v2") == {}
+
+    # re-extracted under the new version: the old row is gone
+    save_outputs(conn, STAGE_EXTRACT, {"sha-a": {"TITLE": "SEKTION"}}, {"sha-a": "A.pdf"}, "v2")
+
+    assert load_outputs(conn, STAGE_EXTRACT, ["sha-a"], "v2") == {"sha-a": {"TITLE": "SEKTION"}}
+    assert conn.execute("SELECT COUNT(*) FROM stage_outputs").fetchone()[0] == 1
+
+    conn.close()
+
+
+def test_stage_version_follows_the_model_file(tmp_path):
+
+    model = tmp_path / "best.pt"
+    model.write_bytes(b"weights 1")
+    before = stage_version(1, model)
+
+    model.write_bytes(b"weights 2, retrained")
+
+    assert stage_version(1, model) != before
+    assert stage_version(2, model) != stage_version(1, model)
+    assert stage_version(1) == "v1"
+
+
+def test_hash_pdf_skips_unchanged_files(tmp_path, monkeypatch):
+
+    conn = open_catalog(tmp_path / "doc_catalog.db")
+    pdf = tmp_path / "A.pdf"
+    pdf.write_bytes(b"%PDF a")
+
+    sha = hash_pdf(conn, pdf)
+
+    def no_hashing(path):
+        raise AssertionError("unchanged PDF hashed again")
+
+    monkeypatch.setattr(doc_catalog, "file_sha256", no_hashing)
+
+    assert hash_pdf(conn, pdf) == sha
+
+    conn.close()
+
+
+def test_old_catalog_without_versions_starts_over(tmp_path):
+
+    db_path = tmp_path / "doc_catalog.db"
+
+    old = sqlite3.connect(db_path)
+    old.execute("CREATE TABLE stage_outputs (sha256 TEXT, stage TEXT, payload TEXT, updated_at TEXT, PRIMARY KEY (sha256, stage))")
+    old.execute("INSERT INTO stage_outputs VALUES ('sha-a', ?, '{}', 'x')", (STAGE_EXTRACT,))
+    old.commit()
+    old.close()
+
+    conn = open_catalog(db_path)
+
+    assert load_outputs(conn, STAGE_EXTRACT, ["sha-a"], "v1") == {}
+
+    conn.close()
+    clear_catalog(db_path)
+
+    assert not db_path.exists()
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from db import get_engine, dispose_engines
+from pipeline_search import fuzzy_search, VALID_COLUMNS, FUZZY_CANDIDATES
+from pipeline_sql import update_sql_table
+
+
+def drawing_no(i):
+    # one series: every number folds to the same "88p0510100100000..." prefix
+    return f"BBP05-10-100-1000-0_0-{i:06d}"
+
+def load(engine, n_rows):
+
+    rows = []
+    for i in range(n_rows):
+        row = {c: "" for c in VALID_COLUMNS}
+        row.update({"Image": f"{drawing_no(i)}_stamp.png", "RITNINGSNUMMER_PROJEKT": drawing_no(i)})
+        rows.append(row)
+
+    update_sql_table(pd.DataFrame(rows), bind=engine)
+
+
+def test_best_match_survives_common_prefix(tmp_path):
+
+    engine = get_engine(tmp_path / "metadata.db")
+
+    try:
+        n_rows = FUZZY_CANDIDATES * 2
+        load(engine, n_rows)
+
+        # near the end of the table, OCR'd with O for 0
+        target = drawing_no(n_rows - 7)
+        query = target.replace("0", "O", 2)
+
+        df = fuzzy_search("RITNINGSNUMMER_PROJEKT", query, top_n=5, bind=engine)
+
+        assert df["RITNINGSNUMMER_PROJEKT"].iat[0] == target
+        assert df["SIMILARITY"].iat[0] == 1.0
+
+    finally:
+        dispose_engines()
+
+def test_filters_apply_to_fuzzy_candidates(tmp_path):
+
+    engine = get_engine(tmp_path / "metadata.db")
+
+    try:
+        load(engine, 50)
+
+        df = fuzzy_search(
+            "RITNINGSNUMMER_PROJEKT", drawing_no(7),
+            filters=[("Image", "starts_with", drawing_no(1))], bind=engine
+        )
+
+        assert list(df["Image"]) == [f"{drawing_no(1)}_stamp.png"]
+
+    finally:
+        dispose_engines()
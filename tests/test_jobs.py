@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+import jobs
+import pipeline_validation
+
+
+@pytest.fixture
+def jobs_db(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(jobs, "JOBS_DB", tmp_path / "jobs.db")
+
+    return tmp_path / "jobs.db"
+
+
+def wait_finished(job_id, timeout=10):
+
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        job = jobs.get_job(job_id)
+        if job["status"] not in jobs.ACTIVE:
+            return job
+        time.sleep(0.02)
+
+    raise TimeoutError(f"job {job_id} still {job['status']}")
+
+
+def test_job_runs_to_done_with_stage_progress(jobs_db, tmp_path, monkeypatch):
+
+    def fake_pipeline(PROJECT_DIR, progress, **params):
+        for i in range(50):
+            progress("step2", i, 50)
+        progress("step2", 50, 50)
+        progress("step3", 0, 1)
+        return PROJECT_DIR / "validation_file.xlsx"
+
+    monkeypatch.setattr(pipeline_validation, "run_full_validation_pipeline", fake_pipeline)
+
+    job = wait_finished(jobs.submit_validation(tmp_path, resume=False))
+
+    assert job["status"] == jobs.DONE
+    assert job["result"].endswith("validation_file.xlsx")
+
+    stages = {s["stage"]: s for s in jobs.job_stages(job["id"])}
+
+    assert stages["28 Label Extraction"] == {"stage": "28 Label Extraction", "status": jobs.DONE, "done": 50, "total": 50}
+    assert stages["Cleaning"]["status"] == jobs.RUNNING
+    assert stages["Master Validation"]["status"] == "pending"
+    assert jobs.active_job() is None
+
+
+def test_failed_pipeline_marks_job_failed(jobs_db, tmp_path, monkeypatch):
+
+    def fake_pipeline(PROJECT_DIR, progress, **params):
+        raise FileNotFoundError("no PDFs")
+
+    monkeypatch.setattr(pipeline_validation, "run_full_validation_pipeline", fake_pipeline)
+
+    job = wait_finished(jobs.submit_validation(tmp_path))
+
+    assert job["status"] == jobs.FAILED
+    assert job["error"] == "FileNotFoundError: no PDFs"
+
+
+def test_schema_created_for_every_jobs_db(tmp_path):
+
+    for name in ("a.db", "b.db"):
+        with closing(jobs.open_jobs(tmp_path / name)) as conn:
+            assert conn.execute("SELECT COUNT(*) AS n FROM jobs").fetchone()["n"] == 0
+
+
+def test_heartbeat_survives_a_locked_database(jobs_db, monkeypatch):
+
+    calls = []
+
+    def flaky_execute(sql, params=()):
+        calls.append(sql)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(jobs, "execute", flaky_execute)
+
+    stop = threading.Event()
+    thread = threading.Thread(target=jobs.beat, args=(1, stop), daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 5
+    while len(calls) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stop.set()
+    thread.join(1)
+
+    assert len(calls) >= 3
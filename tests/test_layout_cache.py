@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+import pytest
+
+import layout_cache
+from layout_cache import layout_fingerprint, cached_boxes, store_boxes, clear_layout_cache
+
+
+def stamp(value, rows=(100, 200), cols=(300,)):
+
+    # white stamp with ruling lines and one text value
+    img = np.full((300, 800), 255, np.uint8)
+
+    for y in rows:
+        cv2.line(img, (0, y), (799, y), 0, 2)
+    for x in cols:
+        cv2.line(img, (x, 0), (x, 299), 0, 2)
+
+    cv2.putText(img, value, (20, 160), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+
+    return img
+
+
+# (index, label, x1, y1, x2, y2) like step2's boxes_from_result()
+BOXES = [(0, "TITLE", 10, 110, 290, 190), (1, "BLAD", 310, 110, 790, 190)]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+
+    model = tmp_path / "best.pt"
+    model.write_bytes(b"weights")
+
+    monkeypatch.setattr(layout_cache, "CACHE_FILE", tmp_path / "layout_cache.json")
+    monkeypatch.setattr(layout_cache, "SPOT_CHECK_EVERY", 3)
+    monkeypatch.setattr(layout_cache, "_layouts", None)
+
+    return model
+
+
+def test_fingerprint_ignores_values_not_lines():
+
+    assert layout_fingerprint(stamp("PLAN A")) == layout_fingerprint(stamp("SEKTION 12"))
+    assert layout_fingerprint(stamp("PLAN A")) != layout_fingerprint(stamp("PLAN A", rows=(150,)))
+    assert layout_fingerprint(np.full((300, 800), 255, np.uint8)) is None
+
+
+def test_boxes_reused_with_periodic_spot_check(cache):
+
+    fp = layout_fingerprint(stamp("PLAN A"))
+
+    assert cached_boxes(fp, 800, 300, cache) == (None, False)
+    assert store_boxes(fp, BOXES, 800, 300, cache)
+
+    # same template at twice the resolution: boxes scale with the stamp
+    reuses = [cached_boxes(fp, 1600, 600, cache) for _ in range(3)]
+
+    assert reuses[0][0] == [(i, label, 2 * x1, 2 * y1, 2 * x2, 2 * y2) for i, label, x1, y1, x2, y2 in BOXES]
+    assert [spot for _, spot in reuses] == [False, False, True]
+
+
+def test_spot_check_replaces_drifted_layout(cache):
+
+    fp = layout_fingerprint(stamp("PLAN A"))
+    store_boxes(fp, BOXES, 800, 300, cache)
+
+    drifted = [(0, "TITLE", 10, 10, 290, 90), BOXES[1]]
+
+    assert not store_boxes(fp, drifted, 800, 300, cache)
+    assert cached_boxes(fp, 800, 300, cache)[0][0] == (0, "TITLE", 10, 10, 290, 90)
+
+
+def test_clear_forgets_memory_and_file(cache):
+
+    fp = layout_fingerprint(stamp("PLAN A"))
+    store_boxes(fp, BOXES, 800, 300, cache)
+
+    clear_layout_cache()
+
+    assert not layout_cache.CACHE_FILE.exists()
+    assert cached_boxes(fp, 800, 300, cache) == (None, False)
+
+    # a later save does not bring the cleared template back
+    store_boxes(layout_fingerprint(stamp("X", rows=(150,))), BOXES, 800, 300, cache)
+    layout_cache._layouts = None
+
+    assert cached_boxes(fp, 800, 300, cache) == (None, False)
+
+
+def test_new_model_starts_empty_cache(cache):
+
+    fp = layout_fingerprint(stamp("PLAN A"))
+    store_boxes(fp, BOXES, 800, 300, cache)
+
+    cache.write_bytes(b"retrained weights")
+    layout_cache._layouts = None
+
+    assert cached_boxes(fp, 800, 300, cache) == (None, False)
@@ -0,0 +1,28 @@
+from step7_validate_against_master import compile_pattern_rules, fullmatch_any
+
+
+def test_backreference_keeps_its_own_group_numbers():
+
+    # joined as (?:(A)B)|(?:(\d)\1), the \1 would point at (A)
+    compiled = compile_pattern_rules({"BLAD": [r"(A)B", r"(\d)\1"]})["BLAD"]
+
+    assert fullmatch_any(compiled, "AB")
+    assert fullmatch_any(compiled, "33")
+    assert not fullmatch_any(compiled, "34")
+
+def test_named_groups_in_several_patterns():
+
+    # the same group name twice is not a valid alternation
+    compiled = compile_pattern_rules({"SKALA": [r"1:(?P<n>\d+)", r"(?P<n>\d+)-(?P=n)"]})["SKALA"]
+
+    assert fullmatch_any(compiled, "1:100")
+    assert fullmatch_any(compiled, "50-50")
+    assert not fullmatch_any(compiled, "50-60")
+
+def test_plain_patterns_are_joined():
+
+    compiled = compile_pattern_rules({"FORMAT": [r"A\d", r"B\d", ""]})["FORMAT"]
+
+    assert len(compiled) == 1
+    assert fullmatch_any(compiled, "A1") and fullmatch_any(compiled, "B3")
+    assert not fullmatch_any(compiled, "C1")
@@ -0,0 +1,94 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("easyocr")
+pytest.importorskip("ultralytics")
+
+import step2_extract as step2
+from step2_extract import ocr_rows, pp_light, pp_blad, pp_leverans, LEVERANS_ALLOWLIST
+
+
+LABELS = ["TITLE", "DATUM", "BLAD", "LEVERANS_ANDRINGS_PM"]
+
+
+class FakeReader:
+
+    # the text of a crop is its top-left pixel (kept by the right/bottom
+    # padding) plus the allowlist it was read with
+    def __init__(self):
+        self.batches = []
+
+    def readtext(self, img, detail=0, paragraph=True, allowlist=None):
+        return [str(img[0, 0]), allowlist or ""]
+
+    def readtext_batched(self, images, n_width, n_height, detail=0, paragraph=True, batch_size=1, allowlist=None):
+        assert all(img.shape[:2] == (n_height, n_width) for img in images)
+        self.batches.append(len(images))
+        return [self.readtext(img, allowlist=allowlist) for img in images]
+
+
+def job(label, value, h, w, allowlist=None):
+    img = np.full((h, w), 200, np.uint8)
+    img[0, 0] = value
+    return {"label": label, "image": img, "allowlist": allowlist}
+
+
+def test_batched_rows_match_per_crop_rows(monkeypatch):
+
+    fake = FakeReader()
+    monkeypatch.setattr(step2, "get_reader", lambda: fake)
+    monkeypatch.setattr(step2, "OCR_BATCH_SIZE", 2)
+
+    # mixed sizes and allowlists over two stamps, some buckets split in chunks
+    per_stamp = [
+        [job("TITLE", 1, 70, 300), job("BLAD", 12, 40, 90), job("BLAD", 7, 41, 95), job("DATUM", 3, 70, 310)],
+        [job("LEVERANS_ANDRINGS_PM", 4, 60, 200, LEVERANS_ALLOWLIST), job("TITLE", 5, 130, 300),
+         job("DATUM", 6, 66, 290), job("TITLE", 9, 65, 305)],
+    ]
+    paths = [Path("A_stamp.png"), Path("B_stamp.png")]
+
+    single = ocr_rows(paths, per_stamp, LABELS, batched=False)
+    batched = ocr_rows(paths, per_stamp, LABELS, batched=True)
+
+    assert batched == single
+    assert single[0]["BLAD"] == "7"
+    assert single[1]["LEVERANS_ANDRINGS_PM"] == f"4 {LEVERANS_ALLOWLIST}"
+    assert len(fake.batches) < 8
+
+
+def text_crop(text, pp, scale=1.0):
+
+    # a clean stamp field as collect_crops() would cut it, then preprocessed
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+    img = np.full((th + 24, tw + 24, 3), 255, np.uint8)
+    cv2.putText(img, text, (12, th + 12), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), 2)
+
+    return pp(img)
+
+
+def test_easyocr_batched_matches_per_crop_on_clean_fields(monkeypatch):
+
+    # the real reader; skipped where its weights are not available
+    try:
+        step2.get_reader()
+    except Exception as e:
+        pytest.skip(f"EasyOCR reader unavailable: {e}")
+
+    monkeypatch.setattr(step2, "OCR_BATCH_SIZE", 4)
+
+    per_stamp = [[
+        {"label": "TITLE", "image": text_crop("PLAN TUNNEL", pp_light), "allowlist": None},
+        {"label": "DATUM", "image": text_crop("2021-03-04", pp_light), "allowlist": None},
+        {"label": "BLAD", "image": text_crop("12", pp_blad, 0.8), "allowlist": None},
+        {"label": "LEVERANS_ANDRINGS_PM", "image": text_crop("PM 2021", pp_leverans, 0.8),
+         "allowlist": LEVERANS_ALLOWLIST},
+    ]]
+    paths = [Path("A_stamp.png")]
+
+    single = ocr_rows(paths, per_stamp, LABELS, batched=False)
+    batched = ocr_rows(paths, per_stamp, LABELS, batched=True)
+
+    assert batched == single
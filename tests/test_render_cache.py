@@ -0,0 +1,85 @@
+import os
+
+import fitz
+import numpy as np
+
+import render_cache
+from pipeline_validation import render_documents
+
+
+def make_pdf(path, text):
+
+    doc = fitz.open()
+    page = doc.new_page(width=420, height=297)
+    page.insert_text((300, 270), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+    return path
+
+
+def count_rasterize(monkeypatch):
+
+    calls = []
+    rasterize = render_cache.rasterize
+
+    def counting(pdf_path, *args, **kwargs):
+        calls.append(os.path.basename(pdf_path))
+        return rasterize(pdf_path, *args, **kwargs)
+
+    monkeypatch.setattr(render_cache, "rasterize", counting)
+
+    return calls
+
+
+def test_each_document_rendered_once_for_stamp_and_revision(tmp_path, monkeypatch):
+
+    calls = count_rasterize(monkeypatch)
+
+    pdf_dir = tmp_path / "pdf_input"
+    pdf_dir.mkdir()
+    names = [make_pdf(pdf_dir / f"D{i}.pdf", f"D{i}").name for i in range(3)]
+
+    render_documents(pdf_dir, tmp_path / "images_stamp", tmp_path / "rev_crops", names)
+
+    assert sorted(calls) == sorted(names)
+    assert all((tmp_path / "images_stamp" / f"D{i}_stamp.png").exists() for i in range(3))
+    assert all((tmp_path / "rev_crops" / f"D{i}_p001.png").exists() for i in range(3))
+
+    # full pages stay in memory only
+    for name in names:
+        sha = render_cache.file_sha256(pdf_dir / name)
+        assert not list(render_cache.CACHE_DIR.glob(f"{sha}_*"))
+
+
+def test_clipped_render_cached_on_disk(tmp_path, monkeypatch):
+
+    calls = count_rasterize(monkeypatch)
+    pdf = make_pdf(tmp_path / "A.pdf", "A")
+    cache_dir = tmp_path / "cache"
+
+    first = render_cache.render_region(pdf, render_cache.STAMP_28_RECT, dpi=72, cache_dir=cache_dir)
+    second = render_cache.render_region(pdf, render_cache.STAMP_28_RECT, dpi=72, cache_dir=cache_dir)
+
+    assert calls == ["A.pdf"]
+    assert len(list(cache_dir.glob("*.npy"))) == 1
+    np.testing.assert_array_equal(first, second)
+
+
+def test_evict_lru_keeps_recent_renders(tmp_path):
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+
+    paths = []
+    for i in range(4):
+        p = cache_dir / f"r{i}.npy"
+        np.save(p, np.zeros(1000, dtype=np.uint8))
+        os.utime(p, ns=(i * 10**9, i * 10**9))
+        paths.append(p)
+
+    size = paths[0].stat().st_size
+    render_cache.evict_lru(cache_dir, max_bytes=2 * size, keep=paths[0])
+
+    # the two least recently used (apart from `keep`) are gone
+    assert [p.exists() for p in paths] == [True, False, False, True]
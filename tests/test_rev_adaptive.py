@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("easyocr")
+
+import step5_andr_ext as step5
+
+
+def box(y, x=0):
+    return [[x, y - 5], [x + 20, y - 5], [x + 20, y + 5], [x, y + 5]]
+
+
+# OCR output per preprocessor: every pass finds the same two-column table,
+# LETTER best (highest confidence)
+PASSES = {
+    1: [(box(10), "B", 0.90), (box(12, 40), "REV B", 0.90), (box(60), "A", 0.85), (box(61, 40), "REV A", 0.85)],
+    2: [(box(11), "B", 0.70), (box(13, 40), "REV B", 0.70)],
+    3: [(box(60), "A", 0.50), (box(62, 40), "REV A", 0.50)],
+}
+
+
+class FakeReader:
+
+    def __init__(self):
+        self.calls = 0
+
+    def readtext(self, img, detail=1):
+        self.calls += 1
+        return PASSES[int(img[0, 0])]
+
+
+@pytest.fixture
+def reader(monkeypatch, tmp_path):
+
+    fake = FakeReader()
+
+    monkeypatch.setattr(step5, "get_reader", lambda: fake)
+    monkeypatch.setattr(step5, "DEBUG_DIR", tmp_path)
+    monkeypatch.setattr(step5, "ADAPTIVE_REV_OCR", True)
+    monkeypatch.setattr(step5, "PREPROCESSORS", [
+        ("LETTER", lambda g: np.full((8, 8), 1, np.uint8)),
+        ("MEDIUM", lambda g: np.full((8, 8), 2, np.uint8)),
+        ("LIGHT",  lambda g: np.full((8, 8), 3, np.uint8)),
+    ])
+    monkeypatch.setattr(step5, "_pending", {})
+
+    return fake
+
+
+def non_explore_name():
+    return next(f"DOC-{i}" for i in range(1000) if not step5.is_explore_crop(f"DOC-{i}"))
+
+
+def test_adaptive_selects_same_revision_as_full_pass(reader):
+
+    crop = np.full((40, 40), 255, np.uint8)
+    name = non_explore_name()
+
+    full = step5.run_ocr_on_crop(crop, name, "FIXED")
+    full_calls = reader.calls
+
+    order = step5.preprocessor_order(stats={})
+    adaptive = step5.run_ocr_on_crop(crop, name, "FIXED", order)
+
+    assert adaptive == full
+    assert full[0] == "B"
+    assert full_calls == 3
+    assert reader.calls - full_calls == 1
+
+
+def test_order_is_fixed_for_the_run(reader):
+
+    # stats recorded while the run goes on do not reorder later documents
+    order = step5.preprocessor_order(stats={("FIXED", "LIGHT"): (100, 100)})
+    assert order["FIXED"][0] == "LIGHT"
+
+    crop = np.full((40, 40), 255, np.uint8)
+    names = [f"DOC-{i}" for i in range(20)]
+
+    forward = {n: step5.run_ocr_on_crop(crop, n, "FIXED", order) for n in names}
+    backward = {n: step5.run_ocr_on_crop(crop, n, "FIXED", order) for n in reversed(names)}
+
+    assert forward == backward
+
+
+def test_exploration_chosen_by_document_name(reader):
+
+    names = [f"DOC-{i}" for i in range(200)]
+    explore = [n for n in names if step5.is_explore_crop(n)]
+
+    assert explore == [n for n in names if step5.is_explore_crop(n)]
+    assert 0 < len(explore) < len(names)
+
+    # exploration crops run every pass
+    order = step5.preprocessor_order(stats={})
+    step5.run_ocr_on_crop(np.full((40, 40), 255, np.uint8), explore[0], "FIXED", order)
+
+    assert reader.calls == 3
@@ -0,0 +1,96 @@
+import sqlite3
+
+import pandas as pd
+from sqlalchemy import text
+
+from db import get_engine, dispose_engines
+from pipeline_search import search, search_page, fuzzy_search, VALID_COLUMNS
+from pipeline_sql import update_sql_table, table_columns, TABLE, ROW_ID
+
+
+def frame(titles):
+
+    rows = []
+    for i, title in enumerate(titles):
+        row = {c: "" for c in VALID_COLUMNS}
+        row.update({"Image": f"D{i:03d}_stamp.png", "RITNINGSNUMMER_PROJEKT": f"BBP05-{i:06d}", "TITLE": title})
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+def titles_matching(engine, word):
+    df = search([("TITLE", "match", word)], top_n=100, bind=engine)
+    return sorted(df["Image"])
+
+def vacuum(db_path):
+
+    dispose_engines()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def test_indexes_follow_updates_deletes_and_vacuum(tmp_path):
+
+    db_path = tmp_path / "metadata.db"
+    engine = get_engine(db_path)
+
+    try:
+        update_sql_table(frame(["PLAN TUNNEL"] * 20), bind=engine)
+
+        # upsert one drawing with a new title, delete a few others (gaps in
+        # the ids), then VACUUM
+        update_sql_table(frame(["PLAN TUNNEL"] * 5 + ["SEKTION BRO"]).iloc[5:], bind=engine)
+
+        with engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {TABLE} WHERE DOC_KEY IN ('D001', 'D002', 'D003')"))
+
+        vacuum(db_path)
+        engine = get_engine(db_path)
+
+        assert titles_matching(engine, "sektion") == ["D005_stamp.png"]
+        assert "D005_stamp.png" not in titles_matching(engine, "tunnel")
+        assert len(titles_matching(engine, "tunnel")) == 16
+
+        df = fuzzy_search("RITNINGSNUMMER_PROJEKT", "BBP05-0000l7", top_n=1, bind=engine)
+        assert df["Image"].iat[0] == "D017_stamp.png"
+
+        # keyset pages still cover every drawing once
+        seen, cursor = [], None
+        while True:
+            page, cursor = search_page(after=cursor, page_size=6, bind=engine)
+            seen += list(page["Image"])
+            if cursor is None:
+                break
+
+        assert len(seen) == len(set(seen)) == 17
+
+    finally:
+        dispose_engines()
+
+
+def test_keyed_table_without_id_is_migrated(tmp_path):
+
+    db_path = tmp_path / "metadata.db"
+
+    # the table as the earlier keyed schema left it (implicit rowid)
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"CREATE TABLE {TABLE} (DOC_KEY TEXT PRIMARY KEY, Image TEXT, TITLE TEXT)")
+    conn.execute(f"INSERT INTO {TABLE} VALUES ('OLD', 'OLD_stamp.png', 'FASAD')")
+    conn.commit()
+    conn.close()
+
+    engine = get_engine(db_path)
+
+    try:
+        update_sql_table(frame(["PLAN TUNNEL"]), bind=engine)
+
+        with engine.connect() as conn:
+            assert ROW_ID in table_columns(conn)
+
+        assert titles_matching(engine, "fasad") == ["OLD_stamp.png"]
+        assert titles_matching(engine, "tunnel") == ["D000_stamp.png"]
+
+    finally:
+        dispose_engines()
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from db import get_engine, dispose_engines
+from pipeline_search import VALID_COLUMNS
+from pipeline_sql import update_validation_tables, TABLE, ERRORS_TABLE
+
+
+def frame(title):
+
+    row = {c: "" for c in VALID_COLUMNS}
+    row.update({"Image": "A_stamp.png", "RITNINGSNUMMER_PROJEKT": "A", "TITLE": title})
+
+    return pd.DataFrame([row])
+
+def errors(rule):
+    return pd.DataFrame([{"document": "A_stamp.png", "column": "TITLE", "rule": rule}])
+
+
+def test_rows_and_errors_commit_together(tmp_path):
+
+    engine = get_engine(tmp_path / "metadata.db")
+
+    try:
+        update_validation_tables(frame("OLD"), errors("EMPTY"), bind=engine)
+
+        # the errors write fails: the row update must roll back with it
+        with pytest.raises(KeyError):
+            update_validation_tables(frame("NEW"), errors("VALUE").drop(columns="rule"), bind=engine)
+
+        with engine.connect() as conn:
+            assert conn.execute(text(f"SELECT TITLE FROM {TABLE}")).scalar() == "OLD"
+            assert conn.execute(text(f"SELECT rule FROM {ERRORS_TABLE}")).scalar() == "EMPTY"
+
+        update_validation_tables(frame("NEW"), errors("VALUE"), bind=engine)
+
+        with engine.connect() as conn:
+            assert conn.execute(text(f"SELECT TITLE FROM {TABLE}")).scalar() == "NEW"
+            assert conn.execute(text(f"SELECT rule FROM {ERRORS_TABLE}")).scalar() == "VALUE"
+
+    finally:
+        dispose_engines()
@@ -0,0 +1,68 @@
+# PROCESS POOL FOR THE OCR STEPS
+#
+# Each worker process loads its own YOLO model / EasyOCR reader once (via the
+# step's initializer) and then pulls documents from the executor's shared
+# queue. Results are yielded in input order, so a parallel run writes exactly
+# the same rows as a serial one.
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", "1"))
+
+def threads_per_worker(workers):
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def limit_threads(n_threads):
+
+    # torch and OpenCV each default to one thread per core; with several
+    # workers that oversubscribes the machine
+    import cv2
+    cv2.setNumThreads(n_threads)
+
+    try:
+        import torch
+        torch.set_num_threads(n_threads)
+    except ImportError:
+        pass
+
+# ==========================================================
+# ORDERED MAP
+# ==========================================================
+def map_ordered(fn, items, workers=EXTRACT_WORKERS, initializer=None):
+
+    # initializer(n_threads) loads the models; n_threads is None when running
+    # serially in the calling process (leave its thread settings alone)
+    items = list(items)
+
+    if not items:
+        return
+
+    if workers <= 1 or len(items) <= 1:
+
+        if initializer is not None:
+            initializer(None)
+
+        for item in items:
+            yield fn(item)
+
+        return
+
+    # spawn: forking a process that already holds torch threads is unsafe
+    ctx = multiprocessing.get_context("spawn")
+
+    workers = min(workers, len(items))
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=initializer,
+        initargs=(threads_per_worker(workers),) if initializer is not None else ()
+    ) as pool:
+
+        # chunksize=1 → idle workers take the next document from the queue
+        yield from pool.map(fn, items, chunksize=1)